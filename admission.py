@@ -0,0 +1,129 @@
+"""Admission control for heavy work (chart renders and photo uploads).
+
+``chart_admission`` runs chart jobs in the background with two limits:
+
+* single flight: a request whose key is already in flight joins the
+  running task instead of starting another one. Keys include the data being
+  charted, so only truly identical requests are merged;
+* a global semaphore caps how many renders/uploads run at once
+  (CHART_CONCURRENCY); the rest wait, and their wait times are recorded.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from config import CHART_CONCURRENCY
+from metrics import CHART_WAIT_SECONDS, CHARTS_COALESCED, Gauge, Histogram
+import tracing
+
+logger = logging.getLogger(__name__)
+
+WAIT_SAMPLES = 1000  # recent waits kept for percentiles
+
+
+class WaitStats:
+    """Count, average, max and recent percentiles of queue wait times.
+
+    Waits are also observed in ``histogram`` when one is given, for the
+    metrics endpoint.
+    """
+
+    def __init__(self, samples: int = WAIT_SAMPLES, histogram: Optional[Histogram] = None):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = deque(maxlen=samples)
+        self._histogram = histogram
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self._recent.append(seconds)
+        if self._histogram is not None:
+            self._histogram.observe(seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        recent = sorted(self._recent)
+
+        def pct(p: float) -> float:
+            return recent[min(len(recent) - 1, int(p * len(recent)))] if recent else 0.0
+
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+            "p50": pct(0.50),
+            "p95": pct(0.95),
+            "max": self.max,
+        }
+
+
+class Admission:
+    """Single-flight, concurrency-limited runner for background jobs."""
+
+    def __init__(self, max_concurrent: int, wait_histogram: Optional[Histogram] = None):
+        self.max_concurrent = max_concurrent
+        self._semaphore = None
+        self._loop = None
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.waits = WaitStats(histogram=wait_histogram)
+        self.coalesced = 0
+        self.running = 0
+
+    def submit(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> "asyncio.Task":
+        """Start ``factory()`` under the semaphore, or return the task already running for ``key``.
+
+        The returned task may be awaited for the result or left to run.
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # asyncio primitives belong to one event loop (tests run several)
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._inflight.clear()
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            CHARTS_COALESCED.inc()
+            return task
+        task = asyncio.create_task(self._run(factory))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._done(key, t))
+        return task
+
+    async def _run(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        queued = time.monotonic()
+        span = tracing.start_span("chart_wait")
+        async with self._semaphore:
+            tracing.end_span(span)
+            self.waits.record(time.monotonic() - queued)
+            self.running += 1
+            try:
+                return await factory()
+            finally:
+                self.running -= 1
+
+    def _done(self, key: Hashable, task: "asyncio.Task") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Background job %r failed: %s", key[:2] if isinstance(key, tuple) else key, task.exception())
+
+    def in_flight(self) -> int:
+        """Jobs running or waiting for the semaphore."""
+        return len(self._inflight)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight(),
+            "running": self.running,
+            "coalesced": self.coalesced,
+            "wait": self.waits.snapshot(),
+        }
+
+
+chart_admission = Admission(CHART_CONCURRENCY, wait_histogram=CHART_WAIT_SECONDS)
+Gauge("bot_chart_jobs_in_flight", "Chart jobs running or waiting for a render slot", chart_admission.in_flight)
@@ -0,0 +1,246 @@
+"""Column-oriented snapshot of every daily weight, for cross-user statistics.
+
+Questions about all users (how many log each day, how long their streaks
+are, how many are losing weight) would need one ``get_weights`` per user.
+Instead a ``Snapshot`` holds three NumPy arrays, user id, day (date
+ordinal) and weight, sorted by user and day, and ``overview`` answers them
+with vectorized group-bys in milliseconds.
+
+The snapshot is loaded with ``iter_weight_rows`` (hot and archived
+history). With ANALYTICS_SNAPSHOT on it is kept in memory: the write
+functions of ``database`` call ``record`` / ``drop_user``, the changes wait
+in a small dict and are merged into the arrays before the next query. In
+cluster mode each worker only sees its own writes, so a snapshot older than
+ANALYTICS_MAX_AGE seconds is reloaded. With ANALYTICS_SNAPSHOT off every
+``current()`` call loads a fresh one.
+"""
+
+import datetime as dt
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from config import ANALYTICS_SNAPSHOT, ANALYTICS_MAX_AGE, EXPORT_BATCH_SIZE
+
+_EPOCH_ORDINAL = dt.date(1970, 1, 1).toordinal()
+# Changes kept before they are merged without waiting for a query
+MAX_PENDING = 50000
+ACTIVE_DAYS = 14
+TREND_DAYS = 30
+TREND_MIN_ENTRIES = 4
+STABLE_KG_PER_WEEK = 0.1
+
+
+class Snapshot:
+    """Every daily weight as three arrays sorted by (user, day)."""
+
+    def __init__(self, users: np.ndarray, days: np.ndarray, weights: np.ndarray):
+        self.users = users
+        self.days = days
+        self.weights = weights
+        self.loaded_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    @classmethod
+    def load(cls, user_id: Optional[int] = None, batch_size: int = EXPORT_BATCH_SIZE) -> "Snapshot":
+        """Read every row (or one user's) from the database."""
+        from database import iter_weight_rows
+
+        users, days, weights = [], [], []
+        for batch in iter_weight_rows(user_id, batch_size):
+            uids, dates, values = zip(*batch)
+            users.append(np.array(uids, dtype=np.int64))
+            days.append(np.array(dates, dtype="datetime64[D]").astype(np.int64) + _EPOCH_ORDINAL)
+            weights.append(np.array(values, dtype=np.float64))
+        if not users:
+            return cls(np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float64))
+        return cls(np.concatenate(users), np.concatenate(days), np.concatenate(weights))
+
+    def merged(self, pending: Dict[Tuple[int, int], Optional[float]], reloaded: Dict[int, "Snapshot"]) -> "Snapshot":
+        """A new snapshot with ``pending`` writes (None: deleted day) and whole users replaced by ``reloaded``."""
+        keep = ~np.isin(self.users, np.fromiter(reloaded, np.int64, len(reloaded))) if reloaded else slice(None)
+        parts = [(self.users[keep], self.days[keep], self.weights[keep])]
+        if pending:
+            keys = np.array(list(pending), dtype=np.int64).reshape(-1, 2)
+            values = np.array([np.nan if w is None else w for w in pending.values()], dtype=np.float64)
+            parts.append((keys[:, 0], keys[:, 1], values))
+        # Reloaded users were read after every pending write, so they win
+        parts += [(s.users, s.days, s.weights) for s in reloaded.values()]
+
+        users = np.concatenate([p[0] for p in parts])
+        days = np.concatenate([p[1] for p in parts])
+        weights = np.concatenate([p[2] for p in parts])
+        source = np.concatenate([np.full(len(p[0]), i) for i, p in enumerate(parts)])
+        # Sort by user, day and then source, so the latest source of a day comes last
+        order = np.lexsort((source, days, users))
+        users, days, weights = users[order], days[order], weights[order]
+        last = np.ones(len(users), dtype=bool)
+        last[:-1] = (users[1:] != users[:-1]) | (days[1:] != days[:-1])
+        last &= ~np.isnan(weights)
+        return Snapshot(users[last], days[last], weights[last])
+
+
+@dataclass
+class Overview:
+    users: int
+    entries: int
+    active_users: int  # with an entry in the last ACTIVE_DAYS days
+    active_per_day: List[int]  # oldest first, today last
+    streaking: int  # users who logged yesterday or today
+    average_streak: float  # consecutive days up to their last entry, among them
+    average_longest_streak: float
+    losing: int  # over the last TREND_DAYS days
+    stable: int
+    gaining: int
+    median_weekly_change: float
+
+
+def overview(snap: Snapshot, today: Optional[dt.date] = None) -> Overview:
+    """Activity, streak and trend statistics over all users."""
+    today_ord = (today or dt.datetime.now().date()).toordinal()
+    users, days, weights = snap.users, snap.days, snap.weights
+    n = len(users)
+    if n == 0:
+        return Overview(0, 0, 0, [0] * ACTIVE_DAYS, 0, 0.0, 0.0, 0, 0, 0, 0.0)
+
+    new_user = np.ones(n, dtype=bool)
+    new_user[1:] = users[1:] != users[:-1]
+    user_starts = np.flatnonzero(new_user)
+
+    recent = days > today_ord - ACTIVE_DAYS
+    active_per_day = np.bincount(days[recent] - (today_ord - ACTIVE_DAYS + 1), minlength=ACTIVE_DAYS)
+    active_users = len(np.unique(users[recent]))
+
+    # Runs of consecutive days of one user
+    new_run = new_user.copy()
+    new_run[1:] |= days[1:] != days[:-1] + 1
+    run_starts = np.flatnonzero(new_run)
+    run_lengths = np.diff(np.append(run_starts, n))
+    first_run_of_user = np.flatnonzero(new_user[run_starts])
+    longest = np.maximum.reduceat(run_lengths, first_run_of_user)
+    last_run = np.append(first_run_of_user[1:], len(run_starts)) - 1
+    last_day = days[np.append(user_starts[1:], n) - 1]
+    current = last_day >= today_ord - 1
+    streaks = run_lengths[last_run][current]
+
+    # Least-squares slope of each user's weights over the last TREND_DAYS days
+    window = days > today_ord - TREND_DAYS
+    group = np.cumsum(new_user)[window] - 1
+    x = (days[window] - today_ord).astype(np.float64)
+    y = weights[window]
+    count = np.bincount(group)
+    sx, sy = np.bincount(group, x), np.bincount(group, y)
+    sxx, sxy = np.bincount(group, x * x), np.bincount(group, x * y)
+    denominator = count * sxx - sx * sx
+    valid = (count >= TREND_MIN_ENTRIES) & (denominator > 0)
+    weekly = 7 * (count * sxy - sx * sy)[valid] / denominator[valid]
+
+    return Overview(
+        users=len(user_starts),
+        entries=n,
+        active_users=active_users,
+        active_per_day=active_per_day.tolist(),
+        streaking=int(current.sum()),
+        average_streak=float(streaks.mean()) if len(streaks) else 0.0,
+        average_longest_streak=float(longest.mean()),
+        losing=int((weekly < -STABLE_KG_PER_WEEK).sum()),
+        stable=int((np.abs(weekly) <= STABLE_KG_PER_WEEK).sum()),
+        gaining=int((weekly > STABLE_KG_PER_WEEK).sum()),
+        median_weekly_change=float(np.median(weekly)) if len(weekly) else 0.0,
+    )
+
+
+_snapshot: Optional[Snapshot] = None
+_pending: Dict[Tuple[int, int], Optional[float]] = {}
+_reload: Set[int] = set()
+_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+_loading = False
+
+
+def record(user_id: int, date: dt.date, weight: Optional[float]) -> None:
+    """Note a written day (``weight`` None: deleted) for the kept snapshot."""
+    if not ANALYTICS_SNAPSHOT:
+        return
+    with _lock:
+        if _snapshot is None and not _loading:
+            return
+        _pending[(user_id, date.toordinal())] = weight
+        compact = len(_pending) > MAX_PENDING
+    # Bound the pending dict between queries, unless a refresh is already running
+    if compact and _refresh_lock.acquire(blocking=False):
+        try:
+            with _lock:
+                snap = _snapshot
+            if snap is not None:
+                _install(_apply_changes(snap))
+        finally:
+            _refresh_lock.release()
+
+
+def drop_user(user_id: int) -> None:
+    """Reload a user's rows before the next query (after bulk writes)."""
+    if not ANALYTICS_SNAPSHOT:
+        return
+    with _lock:
+        if _snapshot is not None or _loading:
+            _reload.add(user_id)
+
+
+def reset() -> None:
+    """Forget the kept snapshot; the next query loads a new one."""
+    global _snapshot
+    with _lock:
+        _snapshot = None
+        _pending.clear()
+        _reload.clear()
+
+
+def _apply_changes(snap: Snapshot) -> Snapshot:
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+        reload_ids = set(_reload)
+        _reload.clear()
+    if not pending and not reload_ids:
+        return snap
+    merged = snap.merged(pending, {uid: Snapshot.load(uid) for uid in reload_ids})
+    merged.loaded_at = snap.loaded_at
+    return merged
+
+
+def _install(snap: Snapshot) -> None:
+    global _snapshot
+    with _lock:
+        _snapshot = snap
+
+
+def current() -> Snapshot:
+    """The up-to-date snapshot; blocking (loads or merges), so call it from a worker thread."""
+    global _snapshot, _loading
+    if not ANALYTICS_SNAPSHOT:
+        return Snapshot.load()
+    with _refresh_lock:
+        with _lock:
+            snap = _snapshot
+            if snap is not None and time.monotonic() - snap.loaded_at > ANALYTICS_MAX_AGE:
+                snap = _snapshot = None
+            if snap is None:
+                # Writes made while loading are applied right after
+                _loading = True
+                _pending.clear()
+                _reload.clear()
+        if snap is None:
+            try:
+                snap = Snapshot.load()
+            finally:
+                with _lock:
+                    _loading = False
+        snap = _apply_changes(snap)
+        _install(snap)
+        return snap
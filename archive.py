@@ -0,0 +1,60 @@
+"""Compressed blocks of archived weight history.
+
+Daily weights older than ARCHIVE_AFTER_DAYS are moved out of the ``weights``
+table by ``database.archive_cold_rows`` into one ``weight_archive`` row per
+user and year, whose BLOB holds the whole year:
+
+* a header: format version and number of entries;
+* the days, as uint16 deltas from the previous day (the first one from
+  January 1st), mostly 1s;
+* the weights as float64 bit patterns, each XOR-ed with the previous one
+  (the sign, exponent and high mantissa bits of nearby weights cancel out),
+  stored byte plane by byte plane so the zeroed high bytes form long runs;
+
+all compressed with zlib. The encoding is lossless: decoded weights are the
+exact floats that were stored.
+"""
+
+import datetime as dt
+import struct
+import zlib
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+BLOCK_VERSION = 1
+_HEADER = struct.Struct("<BH")  # version, entries
+
+
+def encode_block(year: int, rows: Sequence[Tuple[dt.date, float]]) -> bytes:
+    """Encode the (date, weight) entries of one year, oldest first."""
+    if not rows:
+        raise ValueError("empty block")
+    jan1 = dt.date(year, 1, 1)
+    offsets = np.fromiter(((d - jan1).days for d, _ in rows), dtype=np.int32, count=len(rows))
+    if offsets[0] < 0 or offsets[-1] > 365 or np.any(np.diff(offsets) <= 0):
+        raise ValueError(f"dates must be increasing and within {year}")
+    deltas = np.diff(offsets, prepend=0).astype("<u2")
+
+    bits = np.fromiter((w for _, w in rows), dtype="<f8", count=len(rows)).view("<u8")
+    xored = bits ^ np.concatenate((np.zeros(1, dtype="<u8"), bits[:-1]))
+    planes = xored.view(np.uint8).reshape(-1, 8).T  # byte plane k holds byte k of every value
+
+    payload = _HEADER.pack(BLOCK_VERSION, len(rows)) + deltas.tobytes() + planes.tobytes()
+    return zlib.compress(payload, 9)
+
+
+def decode_block(year: int, blob: bytes) -> List[Tuple[dt.date, float]]:
+    """Entries of a block made by ``encode_block``, oldest first."""
+    payload = zlib.decompress(blob)
+    version, count = _HEADER.unpack_from(payload)
+    if version != BLOCK_VERSION:
+        raise ValueError(f"unknown archive block version {version}")
+    start = _HEADER.size
+    deltas = np.frombuffer(payload, dtype="<u2", count=count, offset=start)
+    planes = np.frombuffer(payload, dtype=np.uint8, count=8 * count, offset=start + 2 * count)
+
+    xored = np.ascontiguousarray(planes.reshape(8, count).T).view("<u8").ravel()
+    weights = np.bitwise_xor.accumulate(xored).view("<f8")
+    ordinals = np.cumsum(deltas, dtype=np.int64) + dt.date(year, 1, 1).toordinal()
+    return [(dt.date.fromordinal(o), w) for o, w in zip(ordinals.tolist(), weights.tolist())]
@@ -1,154 +1,405 @@
-"""Backup manager for SQLite database using Supabase Storage."""
+"""Backup manager for SQLite database using Supabase Storage or a local directory."""
 
+import gzip
+import hashlib
+import json
+import logging
 import os
 import shutil
+import sqlite3
 import tempfile
+import threading
+import time
+import uuid
+from contextlib import closing, contextmanager
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 try:
-    from supabase import create_client, Client
-    SUPABASE_AVAILABLE = True
+    import fcntl
 except ImportError:
-    SUPABASE_AVAILABLE = False
+    # Not on Windows, where backups are only serialized within a process
+    fcntl = None
 
-from config import DB_FILE
+try:
+    import zstandard
+except ImportError:
+    # Only needed for BACKUP_COMPRESSION=zstd, which validate_config checks
+    zstandard = None
 
-class BackupManager:
-    """Manages database backups to Supabase Storage."""
-    
-    def __init__(self):
-        from config import SUPABASE_URL, SUPABASE_ANON_KEY
-        self.supabase_url = SUPABASE_URL
-        self.supabase_key = SUPABASE_ANON_KEY
-        self.bucket_name = "weightlogs-backups"
-        
-        if SUPABASE_AVAILABLE and self.supabase_url and self.supabase_key:
-            self.supabase: Optional[Client] = create_client(self.supabase_url, self.supabase_key)
+from config import (
+    DB_FILE,
+    BACKUP_CHUNK_SIZE,
+    BACKUP_COMPRESSION,
+    BACKUP_DOWNLOAD_WORKERS,
+    BACKUP_KEEP_RECENT,
+    BACKUP_KEEP_DAILY,
+    BACKUP_KEEP_WEEKLY,
+    BACKUP_KEEP_MONTHLY,
+)
+from metrics import BACKUP_SECONDS, timed
+from storage_backends import StorageBackend, create_backend
+
+logger = logging.getLogger(__name__)
+
+BACKUP_PREFIX = "weights_backup_"
+MANIFEST_NAME = "manifest.json"
+COPY_CHUNK_SIZE = 1024 * 1024
+
+_warned_no_backend = False
+# Backups run from handler threads, the importer and every cluster worker
+_backup_lock = threading.Lock()
+
+_EXTENSIONS = {
+    "gzip": ".db.gz",
+    "zstd": ".db.zst",
+    "none": ".db",
+}
+
+
+def _compression_for(name: str) -> str:
+    """Guess the compression method of a backup object from its name."""
+    if name.endswith(".gz"):
+        return "gzip"
+    if name.endswith(".zst"):
+        return "zstd"
+    return "none"
+
+
+def _timestamp_from_name(name: str) -> Optional[datetime]:
+    """Parse the creation time encoded in a backup object name."""
+    # Names end in a random suffix since two backups can start in the same second
+    stem = name[len(BACKUP_PREFIX):len(BACKUP_PREFIX) + 15]
+    try:
+        return datetime.strptime(stem, "%Y%m%d_%H%M%S")
+    except ValueError:
+        return None
+
+
+def file_sha256(path: str) -> str:
+    """Return the hex SHA-256 digest of a file, reading it in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextmanager
+def _exclusive(db_file: str):
+    """Hold the backup lock of ``db_file`` for this process and, with fcntl, for all of them."""
+    with _backup_lock, open(f"{db_file}.backup-lock", "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def compress_file(src: str, dst: str, method: str) -> None:
+    """Stream-compress ``src`` into ``dst`` using gzip, zstd or no compression."""
+    with open(src, "rb") as fin, open(dst, "wb") as fout:
+        if method == "zstd":
+            zstandard.ZstdCompressor().copy_stream(fin, fout)
+        elif method == "gzip":
+            with gzip.GzipFile(fileobj=fout, mode="wb", compresslevel=6) as gz:
+                shutil.copyfileobj(fin, gz, COPY_CHUNK_SIZE)
+        else:
+            shutil.copyfileobj(fin, fout, COPY_CHUNK_SIZE)
+
+
+def decompress_file(src: str, dst: str, method: str) -> None:
+    """Stream-decompress ``src`` into ``dst``."""
+    with open(src, "rb") as fin, open(dst, "wb") as fout:
+        if method == "zstd":
+            zstandard.ZstdDecompressor().copy_stream(fin, fout)
+        elif method == "gzip":
+            with gzip.GzipFile(fileobj=fin, mode="rb") as gz:
+                shutil.copyfileobj(gz, fout, COPY_CHUNK_SIZE)
         else:
-            self.supabase = None
-            print("⚠️ Supabase not configured. Backups will be disabled.")
-    
+            shutil.copyfileobj(fin, fout, COPY_CHUNK_SIZE)
+
+
+def verify_database(path: str) -> str:
+    """Run ``PRAGMA quick_check`` on a database file and return its verdict."""
+    try:
+        with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as conn:
+            rows = conn.execute("PRAGMA quick_check").fetchall()
+    except sqlite3.DatabaseError as e:
+        return str(e)
+    return "; ".join(str(row[0]) for row in rows)
+
+
+def apply_retention(
+    entries: List[Dict],
+    keep_recent: int = BACKUP_KEEP_RECENT,
+    keep_daily: int = BACKUP_KEEP_DAILY,
+    keep_weekly: int = BACKUP_KEEP_WEEKLY,
+    keep_monthly: int = BACKUP_KEEP_MONTHLY,
+) -> Tuple[List[Dict], List[Dict]]:
+    """Split manifest entries (newest first) into kept and pruned lists.
+
+    The newest ``keep_recent`` backups are always kept. On top of that the
+    newest backup of each of the last ``keep_daily`` days, ``keep_weekly``
+    ISO weeks and ``keep_monthly`` months is kept.
+    """
+    keep = set(range(min(keep_recent, len(entries))))
+    tiers = [
+        (keep_daily, lambda ts: ts.date()),
+        (keep_weekly, lambda ts: ts.isocalendar()[:2]),
+        (keep_monthly, lambda ts: (ts.year, ts.month)),
+    ]
+    for limit, bucket_of in tiers:
+        seen = set()
+        for i, entry in enumerate(entries):
+            bucket = bucket_of(datetime.fromisoformat(entry["created_at"]))
+            if bucket in seen:
+                continue
+            if len(seen) >= limit:
+                break
+            seen.add(bucket)
+            keep.add(i)
+    kept = [e for i, e in enumerate(entries) if i in keep]
+    pruned = [e for i, e in enumerate(entries) if i not in keep]
+    return kept, pruned
+
+
+class BackupManager:
+    """Manages database backups to a storage backend (Supabase Storage by default)."""
+
+    def __init__(self, backend: Optional[StorageBackend] = None, db_file: str = DB_FILE):
+        self.db_file = db_file
+        self.chunk_size = BACKUP_CHUNK_SIZE
+        self.download_workers = BACKUP_DOWNLOAD_WORKERS
+        # Checked by validate_config, so an unknown or unavailable method fails at startup
+        self.compression = BACKUP_COMPRESSION
+
+        self.backend = backend or create_backend()
+        self.last_restore_seconds: Optional[float] = None
+        if self.backend is None:
+            # A manager is built for every auto_backup call; say it once
+            global _warned_no_backend
+            if not _warned_no_backend:
+                logger.warning("No backup storage configured. Backups will be disabled.")
+                _warned_no_backend = True
+
+    def _load_manifest(self) -> Dict:
+        """Load the manifest object, bootstrapping it from a bucket listing if missing.
+
+        Any other read error is raised: a manifest rebuilt from a listing has
+        no checksums or parts and must never replace the real one.
+        """
+        try:
+            return json.loads(self.backend.read_bytes(MANIFEST_NAME))
+        except FileNotFoundError:
+            pass
+        # No manifest yet: index the existing backups once so they get pruned too
+        entries = []
+        for f in self.backend.list_objects():
+            created = _timestamp_from_name(f["name"]) if f["name"].startswith(BACKUP_PREFIX) else None
+            if created is None or ".part" in f["name"]:
+                continue
+            entries.append({
+                "name": f["name"],
+                "sha256": None,
+                "created_at": created.isoformat(),
+                "size": f.get("size"),
+                "compression": _compression_for(f["name"]),
+            })
+        entries.sort(key=lambda e: e["created_at"], reverse=True)
+        return {"latest": entries[0]["name"] if entries else None, "backups": entries}
+
+    def _save_manifest(self, manifest: Dict) -> None:
+        self.backend.write_bytes(
+            MANIFEST_NAME,
+            json.dumps(manifest).encode("utf-8"),
+            content_type="application/json",
+        )
+
+    @timed(BACKUP_SECONDS)
     def create_backup(self) -> Optional[str]:
-        """Create a backup of the database and upload to Supabase."""
-        if not self.supabase or not os.path.exists(DB_FILE):
+        """Create a compressed backup of the database and upload it.
+
+        The upload is skipped when the database content is identical to the
+        latest backup. Backups of a database run one at a time, across threads
+        and (with fcntl) processes. Returns the uploaded object name, or None.
+        """
+        if not self.backend or not os.path.exists(self.db_file):
             return None
-        
+
+        snapshot_path = None
+        compressed_path = None
+        started = time.perf_counter()
         try:
-            # Create backup filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_filename = f"weights_backup_{timestamp}.db"
-            
-            # Create temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as temp_file:
-                temp_path = temp_file.name
-            
-            # Copy database to temp file
-            shutil.copy2(DB_FILE, temp_path)
-            
-            # Upload to Supabase Storage
-            with open(temp_path, 'rb') as f:
-                self.supabase.storage.from_(self.bucket_name).upload(
-                    path=backup_filename,
-                    file=f,
-                    file_options={"content-type": "application/x-sqlite3"}
-                )
-            
-            # Clean up temp file
-            os.unlink(temp_path)
-            
-            print(f"✅ Backup created: {backup_filename}")
-            return backup_filename
-            
+            # One backup at a time, so uploads and manifest updates never interleave
+            with _exclusive(self.db_file):
+                now = datetime.now()
+                timestamp = now.strftime("%Y%m%d_%H%M%S")
+                backup_filename = f"{BACKUP_PREFIX}{timestamp}_{uuid.uuid4().hex[:8]}{_EXTENSIONS[self.compression]}"
+
+                # Take a consistent snapshot with the SQLite online backup API
+                with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as temp_file:
+                    snapshot_path = temp_file.name
+                with closing(sqlite3.connect(self.db_file)) as src, closing(sqlite3.connect(snapshot_path)) as dst:
+                    src.backup(dst)
+                    # Leave out the free pages of deleted (e.g. archived) rows
+                    dst.execute("VACUUM")
+
+                digest = file_sha256(snapshot_path)
+                manifest = self._load_manifest()
+                backups = manifest.get("backups", [])
+                if backups and backups[0].get("sha256") == digest:
+                    logger.info("Backup skipped, database unchanged since %s", backups[0]["name"])
+                    return None
+
+                with tempfile.NamedTemporaryFile(delete=False, suffix=_EXTENSIONS[self.compression]) as temp_file:
+                    compressed_path = temp_file.name
+                compress_file(snapshot_path, compressed_path, self.compression)
+
+                # Large databases are uploaded as several parts
+                parts = self.backend.upload_chunked(backup_filename, compressed_path, self.chunk_size)
+
+                entry = {
+                    "name": backup_filename,
+                    "sha256": digest,
+                    "created_at": now.isoformat(timespec="seconds"),
+                    "size": os.path.getsize(compressed_path),
+                    "compression": self.compression,
+                    "parts": parts,
+                    "chunk_size": self.chunk_size,
+                }
+                kept, pruned = apply_retention([entry] + backups)
+                # Publish the manifest before deleting so it never points at removed objects
+                self._save_manifest({"latest": backup_filename, "backups": kept})
+                if pruned:
+                    names = []
+                    for e in pruned:
+                        names.extend(self.backend.object_names(e["name"], e.get("parts", 0)))
+                    self.backend.remove(names)
+                    logger.info("Pruned %d old backups", len(pruned))
+
+                logger.info("Backup created: %s", backup_filename,
+                            extra={"size": entry["size"], "duration_ms": round((time.perf_counter() - started) * 1000, 1)})
+                return backup_filename
+
         except Exception as e:
-            print(f"❌ Backup failed: {e}")
+            logger.error("Backup failed: %s", e)
             return None
-    
+        finally:
+            for path in (snapshot_path, compressed_path):
+                if path and os.path.exists(path):
+                    os.unlink(path)
+
+    @timed(BACKUP_SECONDS)
     def restore_latest_backup(self) -> bool:
-        """Restore the latest backup from Supabase Storage."""
-        if not self.supabase:
-            print("❌ No Supabase client available")
+        """Restore the latest backup from the storage backend.
+
+        The backup is streamed to a temporary file next to the database,
+        checked with ``PRAGMA quick_check`` and only then swapped in with an
+        atomic rename, so a failed restore never leaves a partial database.
+        """
+        if not self.backend:
+            logger.error("No backup storage available")
             return False
-        
+
+        started = time.perf_counter()
+        download_path = None
+        restored_path = None
         try:
-            print("📋 Listing backups from Supabase...")
-            # List all backups
-            backups = self.supabase.storage.from_(self.bucket_name).list()
-            print(f"📦 Found {len(backups)} files in bucket")
-            
-            if not backups:
-                print("ℹ️ No backups found")
-                return False
-            
-            # Find the latest backup
-            backup_files = [f['name'] for f in backups if f['name'].startswith("weights_backup_")]
-            print(f"🔍 Found {len(backup_files)} backup files")
-            
-            if not backup_files:
-                print("ℹ️ No backup files found")
+            logger.info("Reading backup manifest from %s", self.backend.name)
+            manifest = self._load_manifest()
+            latest_backup = manifest.get("latest")
+
+            if not latest_backup:
+                logger.info("No backups found")
                 return False
-            
-            # Sort by timestamp (newest first)
-            backup_files.sort(reverse=True)
-            latest_backup = backup_files[0]
-            
-            print(f"📥 Restoring from: {latest_backup}")
-            
+
+            entry = next(
+                (e for e in manifest.get("backups", []) if e["name"] == latest_backup),
+                {"name": latest_backup},
+            )
+            logger.info("Restoring from: %s", latest_backup)
+
+            # Create database directory if needed; temp files live there so the rename is atomic
+            db_dir = os.path.dirname(self.db_file) or "."
+            os.makedirs(db_dir, exist_ok=True)
+            fd, download_path = tempfile.mkstemp(dir=db_dir, suffix=".download")
+            os.close(fd)
+            fd, restored_path = tempfile.mkstemp(dir=db_dir, suffix=".restore")
+            os.close(fd)
+
             # Download backup
-            print("⬇️ Downloading backup file...")
-            response = self.supabase.storage.from_(self.bucket_name).download(latest_backup)
-            print(f"📏 Downloaded {len(response)} bytes")
-            
-            # Create database directory if needed
-            os.makedirs(os.path.dirname(DB_FILE), exist_ok=True)
-            
-            # Write backup to database file
-            print(f"💾 Writing to: {DB_FILE}")
-            with open(DB_FILE, 'wb') as f:
-                f.write(response)
-            
-            print(f"✅ Restored from: {latest_backup}")
+            logger.debug("Downloading backup file")
+            self.backend.download_chunked(
+                latest_backup, download_path,
+                entry.get("parts", 0), entry.get("chunk_size", self.chunk_size),
+                workers=self.download_workers,
+            )
+            logger.debug("Downloaded %d bytes", os.path.getsize(download_path))
+
+            decompress_file(download_path, restored_path, _compression_for(latest_backup))
+            os.unlink(download_path)
+            download_path = None
+
+            if entry.get("sha256") and file_sha256(restored_path) != entry["sha256"]:
+                raise ValueError("checksum mismatch")
+            check = verify_database(restored_path)
+            if check != "ok":
+                raise ValueError(f"integrity check failed: {check}")
+
+            # Swap the verified file in and drop journals that belonged to the old database
+            logger.debug("Writing to: %s", self.db_file)
+            os.replace(restored_path, self.db_file)
+            restored_path = None
+            for suffix in ("-wal", "-shm", "-journal"):
+                if os.path.exists(self.db_file + suffix):
+                    os.unlink(self.db_file + suffix)
+
+            self.last_restore_seconds = time.perf_counter() - started
+            logger.info("Restored from: %s", latest_backup,
+                        extra={"duration_ms": round(self.last_restore_seconds * 1000, 1)})
             return True
-            
+
         except Exception as e:
-            print(f"❌ Restore failed: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Restore failed: %s", e)
             return False
-    
+        finally:
+            for path in (download_path, restored_path):
+                if path and os.path.exists(path):
+                    os.unlink(path)
+
+    @timed(BACKUP_SECONDS)
     def list_backups(self) -> list:
-        """List all available backups."""
-        if not self.supabase:
+        """List all available backups, newest first."""
+        if not self.backend:
             return []
-        
+
         try:
-            backups = self.supabase.storage.from_(self.bucket_name).list()
-            backup_files = [f['name'] for f in backups if f['name'].startswith("weights_backup_")]
-            backup_files.sort(reverse=True)
-            return backup_files
+            return [e["name"] for e in self._load_manifest().get("backups", [])]
         except Exception as e:
-            print(f"❌ Failed to list backups: {e}")
+            logger.error("Failed to list backups: %s", e)
             return []
 
 def auto_backup():
-    """Create automatic backup if Supabase is configured."""
+    """Create automatic backup if a storage backend is configured."""
     manager = BackupManager()
-    if manager.supabase:
+    if manager.backend:
         return manager.create_backup()
     return None
 
 def restore_if_needed():
     """Restore from backup if database doesn't exist."""
-    print(f"🔍 Checking if database exists: {DB_FILE}")
     if not os.path.exists(DB_FILE):
-        print("📥 Database not found, attempting to restore from backup...")
+        logger.info("Database %s not found, attempting to restore from backup", DB_FILE)
         manager = BackupManager()
         success = manager.restore_latest_backup()
         if success:
-            print("✅ Database restored successfully")
+            logger.info("Database restored successfully")
         else:
-            print("❌ Database restoration failed")
+            logger.error("Database restoration failed")
         return success
     else:
-        print(f"✅ Database already exists: {DB_FILE}")
-        return False 
\ No newline at end of file
+        logger.info("Database already exists: %s", DB_FILE)
+        return False
@@ -0,0 +1 @@
+"""Benchmarks for the Telegram Weight Tracker Bot."""
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Benchmark backup and restore time against the local storage backend.
+
+Usage:
+    python benchmarks/bench_backup.py --rows 1000000 --chunk-size 4194304
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import closing
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datetime as dt
+
+from backup_manager import BackupManager
+from storage_backends import LocalDirectoryBackend
+
+
+def build_database(path: str, rows: int, users: int) -> None:
+    """Fill a weights table with ``rows`` synthetic entries spread over ``users``."""
+    start = dt.date(2015, 1, 1)
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute(
+            "CREATE TABLE weights (user_id INTEGER, date TEXT, weight REAL, PRIMARY KEY (user_id, date))"
+        )
+        conn.executemany(
+            "INSERT INTO weights VALUES (?,?,?)",
+            (
+                (i % users, (start + dt.timedelta(days=i // users)).isoformat(), 60 + (i * 7919 % 400) / 10)
+                for i in range(rows)
+            ),
+        )
+        conn.commit()
+
+
+def run(rows: int, users: int, chunk_size: int, workers: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "weights.db")
+        build_database(db_path, rows, users)
+
+        backend = LocalDirectoryBackend(os.path.join(tmp, "store"))
+        manager = BackupManager(backend, db_file=db_path)
+        manager.chunk_size = chunk_size
+
+        t0 = time.perf_counter()
+        name = manager.create_backup()
+        backup_seconds = time.perf_counter() - t0
+
+        restorer = BackupManager(backend, db_file=os.path.join(tmp, "restore", "weights.db"))
+        restorer.download_workers = workers
+        t0 = time.perf_counter()
+        ok = restorer.restore_latest_backup()
+        restore_seconds = time.perf_counter() - t0
+
+        return {
+            "benchmark": "backup_local",
+            "rows": rows,
+            "users": users,
+            "chunk_size": chunk_size,
+            "download_workers": workers,
+            "db_bytes": os.path.getsize(db_path),
+            "backup_bytes": sum(o["size"] for o in backend.list_objects() if o["name"].startswith(name or "")),
+            "backup_seconds": round(backup_seconds, 4),
+            "restore_seconds": round(restore_seconds, 4),
+            "restore_ok": ok,
+        }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--chunk-size", type=int, default=4 * 1024 * 1024)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.users, args.chunk_size, args.workers)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
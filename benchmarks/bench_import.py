@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Measure bulk import throughput for CSV and JSON documents.
+
+Usage:
+    python benchmarks/bench_import.py --rows 100000
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("WEIGHT_DB_DIR", tempfile.mkdtemp(prefix="bench_import_"))
+
+import database
+import importer
+
+
+def write_documents(directory: str, rows: int):
+    """Write the same synthetic history as CSV and as a JSON array."""
+    today = dt.date.today()
+    csv_path = os.path.join(directory, "history.csv")
+    json_path = os.path.join(directory, "history.json")
+    with open(csv_path, "w") as csv_file, open(json_path, "w") as json_file:
+        csv_file.write("date,weight\n")
+        json_file.write("[")
+        for i in range(rows):
+            # Dates repeat every ~50 years, so later rows overwrite earlier ones
+            day = (today - dt.timedelta(days=i % 18000)).isoformat()
+            weight = round(75 + 5 * ((i * 7919) % 1000) / 1000, 1)
+            csv_file.write(f"{day},{weight}\n")
+            json_file.write(("," if i else "") + json.dumps({"date": day, "weight": weight}))
+        json_file.write("]")
+    return csv_path, json_path
+
+
+def time_import(user_id: int, path: str) -> dict:
+    t0 = time.perf_counter()
+    result = importer.import_weights(user_id, importer.iter_rows(path, importer.detect_format(path)))
+    seconds = time.perf_counter() - t0
+    return {
+        "rows": result.imported + result.skipped,
+        "imported": result.imported,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round((result.imported + result.skipped) / seconds),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    database.init_db()
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path, json_path = write_documents(tmp, args.rows)
+        results = {
+            "benchmark": "bulk_import",
+            "chunk_size": importer.IMPORT_CHUNK_SIZE,
+            "csv": time_import(1, csv_path),
+            "json": time_import(2, json_path),
+            # ru_maxrss is KiB on Linux
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+    print(json.dumps(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
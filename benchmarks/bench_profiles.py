@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Measure the per-message cost of looking up a user's language.
+
+Compares the database round trip of ``get_user_language`` with the cached
+``profiles.get_user_strings`` lookup used by handlers and jobs.
+
+Usage:
+    python benchmarks/bench_profiles.py --users 5000 --lookups 50000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("WEIGHT_DB_DIR", tempfile.mkdtemp(prefix="bench_profiles_"))
+
+import database
+import profiles
+
+
+def run(users: int, lookups: int) -> dict:
+    database.init_db()
+    for uid in range(users):
+        database.save_user_language(uid, "en" if uid % 3 else "es")
+    ids = [random.randrange(users) for _ in range(lookups)]
+
+    t0 = time.perf_counter()
+    for uid in ids:
+        database.get_user_language(uid)
+    db_seconds = time.perf_counter() - t0
+
+    profiles.invalidate()
+    t0 = time.perf_counter()
+    loaded = profiles.load_profiles()
+    load_seconds = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for uid in ids:
+        profiles.get_user_strings(uid)
+    cache_seconds = time.perf_counter() - t0
+
+    return {
+        "benchmark": "profile_lookup",
+        "users": users,
+        "lookups": lookups,
+        "db_lookup_us": round(db_seconds / lookups * 1e6, 2),
+        "cached_lookup_us": round(cache_seconds / lookups * 1e6, 2),
+        "bulk_load_seconds": round(load_seconds, 4),
+        "profiles_loaded": loaded,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.users, args.lookups)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""Benchmark database queries, charts and job registration on a synthetic dataset.
+
+Builds (or reuses) a database of ``--users`` users with ``--years`` of
+history each (see dataset.py), runs every benchmark ``--repeat`` times and
+prints one JSON document with per-operation timings and run metadata
+(commit, Python version, dataset size). Save it and compare two runs to
+spot regressions between commits.
+
+Usage:
+    python benchmarks/bench_suite.py --users 1000 --years 5 --output before.json
+    python benchmarks/bench_suite.py --users 1000 --years 5 --output after.json
+    python benchmarks/bench_suite.py --diff before.json after.json --threshold 0.2
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple, Union
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("WEIGHT_DB_DIR", tempfile.mkdtemp(prefix="bench_suite_"))
+
+import matplotlib.dates as mdates
+
+import charts
+import database
+from benchmarks import dataset
+from config import CHART_MAX_POINTS
+from downsample import lttb
+
+# name -> (function returning the sample times, operations per sample)
+BENCHMARKS: Dict[str, Tuple[Callable[["Context"], List[float]], Union[int, Callable[["Context"], int]]]] = {}
+
+
+class Context:
+    def __init__(self, users: int, years: float, repeat: int, burst: int, seed: int):
+        self.users = users
+        self.years = years
+        self.repeat = repeat
+        self.burst = burst
+        self.ids = dataset.user_ids(users)
+        self.rng = random.Random(seed)
+        self.today = dt.date.today()
+
+    def user(self) -> int:
+        return self.rng.choice(self.ids)
+
+
+def benchmark(ops: int = 1):
+    """Register a benchmark timing ``ops`` operations per sample (a number, or a function of the context)."""
+
+    def decorator(func):
+        BENCHMARKS[func.__name__] = (func, ops)
+        return func
+
+    return decorator
+
+
+def _samples(ctx: Context, call: Callable[[], object]) -> List[float]:
+    samples = []
+    for _ in range(ctx.repeat):
+        t0 = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+@benchmark()
+def get_weights_year(ctx):
+    return _samples(ctx, lambda: database.get_weights(ctx.user(), ctx.today - dt.timedelta(days=365), ctx.today))
+
+
+@benchmark()
+def get_weights_all(ctx):
+    return _samples(ctx, lambda: database.get_weights(ctx.user(), dt.date(1900, 1, 1), ctx.today))
+
+
+@benchmark()
+def get_daily_weights(ctx):
+    return _samples(ctx, lambda: database.get_daily_weights(ctx.user()))
+
+
+@benchmark()
+def get_weekly_weights(ctx):
+    return _samples(ctx, lambda: database.get_weekly_weights(ctx.user()))
+
+
+@benchmark()
+def get_monthly_weights(ctx):
+    return _samples(ctx, lambda: database.get_monthly_weights(ctx.user()))
+
+
+@benchmark()
+def get_all_user_ids(ctx):
+    return _samples(ctx, database.get_all_user_ids)
+
+
+@benchmark(ops=lambda ctx: ctx.burst)
+def save_weight_burst(ctx):
+    """``burst`` users logging today's weight back to back, like the 08:00 replies."""
+    def burst():
+        for uid in ctx.rng.sample(ctx.ids, min(ctx.burst, len(ctx.ids))):
+            database.save_weight(uid, ctx.today, round(ctx.rng.uniform(60, 100), 1))
+    return _samples(ctx, burst)
+
+
+def _chart_data(ctx, days: int):
+    rows = database.get_weights(ctx.user(), ctx.today - dt.timedelta(days=days), ctx.today)
+    return [d for d, _ in rows], [w for _, w in rows]
+
+
+@benchmark()
+def render_diario_chart(ctx):
+    dates, vals = _chart_data(ctx, 6)
+    return _samples(ctx, lambda: charts.render_diario_chart(dates, vals))
+
+
+@benchmark()
+def render_average_chart(ctx):
+    rows = database.get_monthly_weights(ctx.user())
+    labels, values = [m for m, _ in rows], [v or 0.0 for _, v in rows]
+    return _samples(ctx, lambda: charts.render_average_chart(labels, values, "Monthly", "Month"))
+
+
+@benchmark()
+def render_month_chart(ctx):
+    dates, vals = _chart_data(ctx, 30)
+    return _samples(ctx, lambda: charts.render_month_chart(dates, vals, "Month"))
+
+
+@benchmark()
+def render_history_chart(ctx):
+    """Whole history, downsampled like /historial."""
+    dates, vals = _chart_data(ctx, int(ctx.years * 366))
+
+    def render():
+        days, values = lttb(mdates.date2num(dates), vals, CHART_MAX_POINTS)
+        charts.render_history_chart(days, values, "History")
+
+    return _samples(ctx, render)
+
+
+@benchmark(ops=lambda ctx: ctx.users)
+def register_jobs_all(ctx):
+    """Register every user's jobs on a fresh application, as on startup."""
+    from telegram.ext import ApplicationBuilder
+    from jobs import register_jobs
+
+    samples = []
+    for _ in range(max(1, ctx.repeat // 5)):
+        app = ApplicationBuilder().token("123456:BENCHMARK").build()
+        t0 = time.perf_counter()
+        for uid in ctx.ids:
+            register_jobs(app, uid)
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def _summary(samples: List[float], ops: int) -> dict:
+    ordered = sorted(samples)
+    median = statistics.median(ordered)
+    return {
+        "samples": len(ordered),
+        "ops_per_sample": ops,
+        "median_ms": round(median * 1000, 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 4),
+        "min_ms": round(ordered[0] * 1000, 4),
+        "ops_per_second": round(ops / median, 1) if median else None,
+    }
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def run(users: int, years: float, repeat: int, burst: int, seed: int, only: List[str]) -> dict:
+    database.init_db()
+    generated = None
+    if dataset.FIRST_USER_ID not in set(database.get_all_user_ids()):
+        generated = dataset.populate(users, years, seed)
+
+    ctx = Context(users, years, repeat, burst, seed)
+    results = {}
+    for name, (func, ops) in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        samples = func(ctx)
+        results[name] = _summary(samples, ops(ctx) if callable(ops) else ops)
+    return {
+        "meta": {
+            "commit": _commit(),
+            "timestamp": dt.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "users": users,
+            "years": years,
+            "repeat": repeat,
+            "dataset": generated,
+        },
+        "results": results,
+    }
+
+
+def diff(old: dict, new: dict, threshold: float) -> int:
+    """Print the median change of every benchmark; returns 1 if any got slower than ``threshold``."""
+    regressions = 0
+    print(f"{'benchmark':<24} {'old ms':>10} {'new ms':>10} {'change':>8}")
+    for name, result in new["results"].items():
+        before = old["results"].get(name)
+        if before is None:
+            print(f"{name:<24} {'-':>10} {result['median_ms']:>10.3f} {'new':>8}")
+            continue
+        change = result["median_ms"] / before["median_ms"] - 1 if before["median_ms"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions += 1
+            flag = "  << slower"
+        print(f"{name:<24} {before['median_ms']:>10.3f} {result['median_ms']:>10.3f} {change:>+8.1%}{flag}")
+    print(f"\n{old['meta'].get('commit') or '?'} -> {new['meta'].get('commit') or '?'}: {regressions} regression(s) above {threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--years", type=float, default=5)
+    parser.add_argument("--repeat", type=int, default=30, help="samples per benchmark")
+    parser.add_argument("--burst", type=int, default=200, help="saves per save_weight_burst sample")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", default="", help="comma-separated benchmark names")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--diff", nargs=2, metavar=("OLD", "NEW"), help="compare two saved reports")
+    parser.add_argument("--threshold", type=float, default=0.2, help="median slowdown flagged by --diff")
+    args = parser.parse_args()
+
+    if args.diff:
+        with open(args.diff[0]) as f_old, open(args.diff[1]) as f_new:
+            return diff(json.load(f_old), json.load(f_new), args.threshold)
+
+    only = [name for name in args.only.split(",") if name]
+    unknown = set(only) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    report = json.dumps(run(args.users, args.years, args.repeat, args.burst, args.seed, only), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Generate a synthetic database of realistic weight histories.
+
+Each user gets a starting weight, a slowly changing long-term drift (diet
+phases, plateaus, regain), a small weekend bump, daily noise, a personal
+logging habit (some weigh in every day, others twice a week) and the odd
+multi-week gap. The series is reproducible for a given seed.
+
+Usage:
+    python benchmarks/dataset.py --users 1000 --years 5
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+import random
+import sys
+import time
+from typing import List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+FIRST_USER_ID = 100000  # clear of the ids used by the test suite
+
+
+def generate_series(rng: random.Random, years: float, end: dt.date) -> List[Tuple[dt.date, float]]:
+    """One user's (date, weight) history over the ``years`` before ``end``."""
+    days = int(years * 365)
+    start = end - dt.timedelta(days=days - 1)
+    weight = rng.uniform(55, 115)
+    drift = 0.0  # kg/day
+    adherence = rng.uniform(0.3, 0.98)
+    series = []
+    gap_left = 0
+    for i in range(days):
+        # A new phase every ~2 months: losing, maintaining or regaining
+        if rng.random() < 1 / 60:
+            drift = rng.choice((-0.08, -0.04, 0.0, 0.0, 0.02, 0.05)) * rng.uniform(0.5, 1.5)
+        weight = min(200.0, max(40.0, weight + drift + rng.gauss(0, 0.05)))
+        if gap_left:
+            gap_left -= 1
+            continue
+        if rng.random() < 1 / 180:
+            gap_left = rng.randint(7, 40)  # holidays, lost interest
+            continue
+        if rng.random() > adherence:
+            continue
+        day = start + dt.timedelta(days=i)
+        weekend = 0.3 if day.weekday() in (5, 6) else 0.0
+        series.append((day, round(weight + weekend + rng.gauss(0, 0.4), 1)))
+    return series
+
+
+def populate(users: int, years: float, seed: int = 1, end: Optional[dt.date] = None) -> dict:
+    """Fill the configured database (WEIGHT_DB_DIR) with ``users`` synthetic users."""
+    end = end or dt.date.today()
+    rng = random.Random(seed)
+    database.init_db()
+    t0 = time.perf_counter()
+    rows = 0
+    for n in range(users):
+        user_id = FIRST_USER_ID + n
+        series = generate_series(rng, years, end)
+        rows += database.save_weights_bulk(user_id, series)
+        database.save_user_language(user_id, "es" if rng.random() < 0.6 else "en")
+        if series:
+            database.save_user_activity(user_id, series[-1][0])
+    return {"users": users, "years": years, "rows": rows, "seconds": round(time.perf_counter() - t0, 3)}
+
+
+def user_ids(users: int) -> List[int]:
+    """Ids given to the users created by ``populate``."""
+    return list(range(FIRST_USER_ID, FIRST_USER_ID + users))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--years", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    result = populate(args.users, args.years, args.seed)
+    result["database"] = database.DB_FILE
+    print(json.dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""Local stand-in for the Telegram Bot API, for end-to-end load tests.
+
+Serves ``/bot<token>/<method>`` like api.telegram.org: ``getUpdates`` long
+polls a queue of injected updates; ``sendMessage``, ``sendPhoto``,
+``sendDocument``, ``editMessageText`` and friends answer with plausible
+objects after a configurable latency. Send methods can also be answered
+with 429 Too Many Requests, at random (``flood_rate``) and when more than
+``global_limit`` messages per second are sent, like Telegram's broadcast
+limit. Every answered send is reported to ``on_send`` so a driver can match
+replies to the updates it injected.
+
+Point the bot at it with TELEGRAM_API_URL=http://127.0.0.1:<port>. Run on
+its own it accepts updates posted as a JSON list to ``/_updates``:
+
+    python benchmarks/fake_bot_api.py --port 8081 --latency 0.05 --flood-rate 0.01
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import sys
+import time
+from collections import Counter, deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+import tornado.httpserver
+import tornado.netutil
+import tornado.web
+
+BOT_USER = {"id": 424242, "is_bot": True, "first_name": "FakeBot", "username": "fake_weight_bot",
+            "can_join_groups": False, "can_read_all_group_messages": False, "supports_inline_queries": False}
+SEND_METHODS = {"sendMessage", "sendPhoto", "sendDocument", "editMessageText", "sendChatAction"}
+MAX_POLL_SECONDS = 10.0
+
+
+class FakeBotApi:
+    """State shared by the request handlers: update queue, latency, limits and counters."""
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.5, flood_rate: float = 0.0,
+                 global_limit: int = 0, retry_after: int = 1,
+                 on_send: Optional[Callable[[str, int, dict], None]] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.flood_rate = flood_rate
+        self.global_limit = global_limit
+        self.retry_after = retry_after
+        self.on_send = on_send
+        self.updates: deque = deque()
+        self._new_updates = asyncio.Event()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._recent_sends: deque = deque()
+        self.calls: Counter = Counter()
+        self.rejected: Counter = Counter()
+
+    def inject(self, update: dict) -> int:
+        """Queue an update for the bot's next getUpdates; returns its update_id."""
+        update = dict(update, update_id=next(self._update_ids))
+        self.updates.append(update)
+        self._new_updates.set()
+        return update["update_id"]
+
+    async def get_updates(self, offset: int, limit: int, timeout: float) -> List[dict]:
+        # Updates below the offset were confirmed by the bot
+        while self.updates and self.updates[0]["update_id"] < offset:
+            self.updates.popleft()
+        if not self.updates and timeout > 0:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), min(timeout, MAX_POLL_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+        return list(itertools.islice(self.updates, limit))
+
+    def close(self) -> None:
+        """Answer pending long polls so the server can shut down cleanly."""
+        self._new_updates.set()
+
+    def _flooded(self) -> bool:
+        if self.flood_rate and random.random() < self.flood_rate:
+            return True
+        if self.global_limit:
+            now = time.monotonic()
+            while self._recent_sends and now - self._recent_sends[0] > 1.0:
+                self._recent_sends.popleft()
+            if len(self._recent_sends) >= self.global_limit:
+                return True
+            self._recent_sends.append(now)
+        return False
+
+    def message(self, chat_id: int, params: dict, method: str) -> dict:
+        result = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+        }
+        if method == "sendPhoto":
+            result["photo"] = [{"file_id": f"photo{result['message_id']}", "file_unique_id": f"p{result['message_id']}",
+                                "width": 800, "height": 400}]
+            if "caption" in params:
+                result["caption"] = params["caption"]
+        elif method == "sendDocument":
+            result["document"] = {"file_id": f"doc{result['message_id']}", "file_unique_id": f"d{result['message_id']}"}
+        else:
+            result["text"] = params.get("text", "")
+        return result
+
+
+class _MethodHandler(tornado.web.RequestHandler):
+    def initialize(self, api: FakeBotApi):
+        self.api = api
+
+    def _params(self) -> Dict[str, object]:
+        content_type = self.request.headers.get("Content-Type", "")
+        if content_type.startswith("application/json") and self.request.body:
+            return json.loads(self.request.body)
+        params = {}
+        for key, values in {**self.request.query_arguments, **self.request.body_arguments}.items():
+            raw = values[-1].decode("utf-8", "replace")
+            # PTB sends every parameter JSON-encoded in form fields
+            try:
+                params[key] = json.loads(raw)
+            except ValueError:
+                params[key] = raw
+        return params
+
+    def _reply(self, result, status: int = 200, **error) -> None:
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json")
+        body = {"ok": True, "result": result} if status == 200 else {"ok": False, "error_code": status, **error}
+        self.finish(json.dumps(body))
+
+    async def post(self, token: str, method: str):
+        api = self.api
+        api.calls[method] += 1
+        params = self._params()
+        if method == "getUpdates":
+            updates = await api.get_updates(int(params.get("offset") or 0), int(params.get("limit") or 100),
+                                            float(params.get("timeout") or 0))
+            return self._reply(updates)
+        if method == "getMe":
+            return self._reply(BOT_USER)
+
+        delay = api.latency * (1 + random.uniform(-api.jitter, api.jitter))
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if method in SEND_METHODS and api._flooded():
+            api.rejected[method] += 1
+            return self._reply(None, 429, description=f"Too Many Requests: retry after {api.retry_after}",
+                               parameters={"retry_after": api.retry_after})
+
+        chat_id = params.get("chat_id")
+        if method in SEND_METHODS and method != "sendChatAction":
+            result = api.message(int(chat_id), params, method)
+            if api.on_send is not None:
+                api.on_send(method, int(chat_id), params)
+            return self._reply(result)
+        # deleteWebhook, answerCallbackQuery, setMyCommands, sendChatAction...
+        return self._reply(True)
+
+    get = post
+
+
+class _InjectHandler(tornado.web.RequestHandler):
+    def initialize(self, api: FakeBotApi):
+        self.api = api
+
+    def post(self):
+        ids = [self.api.inject(update) for update in json.loads(self.request.body)]
+        self.finish({"update_ids": ids})
+
+
+def make_app(api: FakeBotApi) -> tornado.web.Application:
+    return tornado.web.Application([
+        (r"/_updates", _InjectHandler, {"api": api}),
+        (r"/bot([^/]+)/(\w+)", _MethodHandler, {"api": api}),
+    ])
+
+
+async def serve(api: FakeBotApi, port: int = 0, host: str = "127.0.0.1") -> Tuple[tornado.httpserver.HTTPServer, int]:
+    """Start listening on the running event loop (port 0 picks a free one); returns the server and port."""
+    sockets = tornado.netutil.bind_sockets(port, address=host)
+    logging.getLogger("tornado.access").setLevel(logging.ERROR)  # 429s are counted, not logged
+    server = tornado.httpserver.HTTPServer(make_app(api), max_buffer_size=64 * 1024 * 1024)
+    server.add_sockets(sockets)
+    return server, sockets[0].getsockname()[1]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every API call")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="fraction of sends answered with 429")
+    parser.add_argument("--global-limit", type=int, default=0, help="sends per second before 429 (0: no limit)")
+    args = parser.parse_args()
+
+    async def run():
+        api = FakeBotApi(args.latency, flood_rate=args.flood_rate, global_limit=args.global_limit)
+        _, port = await serve(api, args.port)
+        print(json.dumps({"listening": f"http://127.0.0.1:{port}"}), flush=True)
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""End-to-end load test: the real bot (main.main) against a fake Bot API.
+
+Starts benchmarks/fake_bot_api.py in this process, seeds a temporary
+database with recent history for ``--users`` simulated users, launches the
+bot in a subprocess with TELEGRAM_API_URL pointing at the fake server, and
+has every user run a short session, all starting within ``--ramp`` seconds
+(the 08:00 burst):
+
+1. ``/start``                        -> welcome message
+2. ``/peso``                         -> "how much do you weigh?" prompt
+3. a weight, answering the prompt    -> confirmation and daily chart
+4. ``/diario``, ``/semanal`` or ``/mensual`` -> summary and chart
+
+Step 3 takes the same path as a reply to the morning reminder. Each step
+waits for its last expected message (the chart photo where there is one);
+the latency is measured from the moment the update becomes available to
+getUpdates. Reports throughput, p50/p99 latency per step and error rates
+as JSON.
+
+Usage:
+    python benchmarks/load_e2e.py --users 2000 --ramp 10 --latency 0.05 --flood-rate 0.01
+"""
+
+import argparse
+import asyncio
+import datetime as dt
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from benchmarks.fake_bot_api import FakeBotApi, serve
+
+FIRST_USER_ID = 500000
+CHART_COMMANDS = ["/diario", "/semanal", "/mensual"]
+READY_TIMEOUT = 60.0
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def seed_history(db_dir: str, users: int, days: int) -> Dict[int, float]:
+    """Give every simulated user ``days`` of steady history before today; returns their last weight."""
+    os.environ["WEIGHT_DB_DIR"] = db_dir
+    import database  # reads WEIGHT_DB_DIR on import
+
+    database.init_db()
+    rng = random.Random(3)
+    today = dt.date.today()
+    last = {}
+    for n in range(users):
+        user_id = FIRST_USER_ID + n
+        weight = rng.uniform(60, 100)
+        entries = []
+        for i in range(days, 0, -1):
+            weight += rng.uniform(-0.15, 0.12)
+            entries.append((today - dt.timedelta(days=i), round(weight, 1)))
+        database.save_weights_bulk(user_id, entries)
+        last[user_id] = entries[-1][1]
+    return last
+
+
+def message_update(user_id: int, text: str) -> dict:
+    message = {
+        "message_id": random.randrange(1, 2**31),
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "language_code": "es"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"message": message}
+
+
+class Driver:
+    """Injects each user's updates and waits for the bot's replies to that chat."""
+
+    def __init__(self, step_timeout: float):
+        self.step_timeout = step_timeout
+        self.api: Optional[FakeBotApi] = None
+        self._waiting: Dict[int, Tuple[str, asyncio.Future]] = {}
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.completed = 0
+
+    def on_send(self, method: str, chat_id: int, params: dict) -> None:
+        waiting = self._waiting.get(chat_id)
+        if waiting and waiting[0] == method and not waiting[1].done():
+            waiting[1].set_result(time.perf_counter())
+
+    async def step(self, name: str, user_id: int, text: str, expect: str) -> bool:
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[user_id] = (expect, future)
+        t0 = time.perf_counter()
+        self.api.inject(message_update(user_id, text))
+        try:
+            done = await asyncio.wait_for(future, self.step_timeout)
+        except asyncio.TimeoutError:
+            self.errors[f"timeout:{name}"] += 1
+            return False
+        finally:
+            self._waiting.pop(user_id, None)
+        self.latencies[name].append(done - t0)
+        self.completed += 1
+        return True
+
+    async def session(self, user_id: int, last_weight: float, delay: float) -> None:
+        await asyncio.sleep(delay)
+        weight = round(last_weight + random.uniform(-0.3, 0.3), 1)
+        steps = [
+            ("start", "/start", "sendMessage"),
+            ("peso_prompt", "/peso", "sendMessage"),
+            ("weight_reply", f"{weight}", "sendPhoto"),
+            ("chart", random.choice(CHART_COMMANDS), "sendPhoto"),
+        ]
+        for name, text, expect in steps:
+            if not await self.step(name, user_id, text, expect):
+                return  # the next step depends on this one
+
+
+def start_bot(api_url: str, db_dir: str, log_level: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        TELEGRAM_TOKEN="123456:LOADTEST",
+        TELEGRAM_API_URL=api_url,
+        WEIGHT_DB_DIR=db_dir,
+        BACKUP_BACKEND=os.getenv("BACKUP_BACKEND", "none"),
+        METRICS_PORT=os.getenv("METRICS_PORT", "0"),
+        LOG_LEVEL=log_level,
+    )
+    # Run from the temporary directory so bot_data.pkl doesn't land in the repo
+    return subprocess.Popen([sys.executable, "-c", "import main; main.main()"], cwd=db_dir, env=env)
+
+
+async def run(users: int, ramp: float, history_days: int, latency: float, flood_rate: float,
+              global_limit: int, step_timeout: float, log_level: str) -> dict:
+    db_dir = tempfile.mkdtemp(prefix="load_e2e_")
+    last_weights = seed_history(db_dir, users, history_days)
+
+    driver = Driver(step_timeout)
+    driver.api = FakeBotApi(latency, flood_rate=flood_rate, global_limit=global_limit, on_send=driver.on_send)
+    server, port = await serve(driver.api)
+    bot = start_bot(f"http://127.0.0.1:{port}", db_dir, log_level)
+    try:
+        ready_by = time.monotonic() + READY_TIMEOUT
+        while driver.api.calls["getUpdates"] == 0:
+            if bot.poll() is not None or time.monotonic() > ready_by:
+                raise RuntimeError(f"bot did not start polling (exit code {bot.poll()})")
+            await asyncio.sleep(0.1)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            driver.session(user_id, weight, random.uniform(0, ramp))
+            for user_id, weight in last_weights.items()
+        ))
+        elapsed = time.perf_counter() - started
+    finally:
+        bot.send_signal(signal.SIGINT)
+        # Keep the loop (and the fake API) running while the bot shuts down
+        try:
+            await asyncio.wait_for(asyncio.to_thread(bot.wait), 30)
+        except asyncio.TimeoutError:
+            bot.kill()
+        server.stop()
+        driver.api.close()
+        await asyncio.sleep(0.1)
+
+    all_latencies = [v for values in driver.latencies.values() for v in values]
+    attempted = driver.completed + sum(driver.errors.values())
+    return {
+        "benchmark": "e2e_load",
+        "users": users,
+        "ramp_seconds": ramp,
+        "api_latency_ms": latency * 1000,
+        "flood_rate": flood_rate,
+        "global_limit": global_limit,
+        "seconds": round(elapsed, 3),
+        "steps_completed": driver.completed,
+        "steps_per_second": round(driver.completed / elapsed, 1),
+        "sessions_completed": len(driver.latencies.get("chart", [])),
+        "error_rate": round(1 - driver.completed / attempted, 4) if attempted else 0.0,
+        "p50_ms": round(percentile(all_latencies, 50) * 1000, 1) if all_latencies else None,
+        "p99_ms": round(percentile(all_latencies, 99) * 1000, 1) if all_latencies else None,
+        "steps": {
+            name: {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p99_ms": round(percentile(values, 99) * 1000, 1),
+            }
+            for name, values in driver.latencies.items()
+        },
+        "errors": dict(driver.errors),
+        "api_calls": dict(driver.api.calls),
+        "api_429": dict(driver.api.rejected),
+        "bot_exit_code": bot.returncode,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--ramp", type=float, default=10.0, help="seconds over which sessions start")
+    parser.add_argument("--history-days", type=int, default=90, help="seeded history per user")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake Bot API latency in seconds")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="fraction of sends answered with 429")
+    parser.add_argument("--global-limit", type=int, default=0, help="sends per second before 429 (0: no limit)")
+    parser.add_argument("--step-timeout", type=float, default=60.0)
+    parser.add_argument("--log-level", default="WARNING", help="LOG_LEVEL of the bot under test")
+    args = parser.parse_args()
+    result = asyncio.run(run(args.users, args.ramp, args.history_days, args.latency, args.flood_rate,
+                             args.global_limit, args.step_timeout, args.log_level))
+    print(json.dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
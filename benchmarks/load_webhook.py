@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Load test for webhook mode: post synthetic updates to the local endpoint.
+
+Start the bot with BOT_MODE=webhook first, then run for example:
+    python benchmarks/load_webhook.py --url http://127.0.0.1:8443/telegram --users 500 --updates 5000
+
+Reports request throughput, p50/p99 latency and error counts as JSON.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import time
+
+import httpx
+
+COMMANDS = ["/diario", "/semanal", "/mensual", "/help"]
+
+
+def synthetic_update(update_id: int, user_id: int) -> dict:
+    """A private-chat message update from ``user_id``: a command or a weight."""
+    if random.random() < 0.4:
+        text = f"/peso {random.uniform(55, 110):.1f}"
+    else:
+        text = random.choice(COMMANDS)
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "language_code": "es"},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}],
+        },
+    }
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(url: str, users: int, updates: int, concurrency: int, secret: str) -> dict:
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    ids = itertools.count(1)
+    latencies = []
+    errors = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(timeout=30) as client:
+        async def send_one():
+            update_id = next(ids)
+            payload = synthetic_update(update_id, 10_000 + random.randrange(users))
+            async with semaphore:
+                t0 = time.perf_counter()
+                try:
+                    response = await client.post(url, json=payload, headers=headers)
+                    if response.status_code != 200:
+                        errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+                except httpx.HTTPError as e:
+                    errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                latencies.append(time.perf_counter() - t0)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(send_one() for _ in range(updates)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "benchmark": "webhook_load",
+        "updates": updates,
+        "users": users,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "updates_per_second": round(updates / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "errors": errors,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8443/telegram")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--secret", default=os.getenv("WEBHOOK_SECRET", ""))
+    args = parser.parse_args()
+    result = asyncio.run(run(args.url, args.users, args.updates, args.concurrency, args.secret))
+    print(json.dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Chart rendering for the Telegram Weight Tracker Bot.
+
+Charts are drawn with the object-oriented matplotlib API (no pyplot global
+state), so they can be rendered in worker threads off the event loop.
+
+matplotlib takes a few hundred milliseconds to import, so it is loaded on
+the first render, or in the background by ``preload()`` once the bot is
+receiving updates, instead of delaying startup.
+"""
+
+import datetime as dt
+import io
+import threading
+from typing import List, Sequence
+
+from metrics import RENDER_SECONDS, timed
+
+# Set by preload()
+Figure = None
+mdates = None
+_load_lock = threading.Lock()
+
+
+def preload() -> None:
+    """Import matplotlib (once); safe to call from any thread."""
+    global Figure, mdates
+    if Figure is not None:
+        return
+    with _load_lock:
+        if Figure is None:
+            import matplotlib.dates as _mdates
+            from matplotlib.figure import Figure as _Figure
+            mdates = _mdates
+            Figure = _Figure
+
+
+def _to_png(fig: "Figure", **savefig_kwargs) -> io.BytesIO:
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", **savefig_kwargs)
+    buf.seek(0)
+    return buf
+
+
+@timed(RENDER_SECONDS)
+def render_diario_chart(dates: List[dt.date], vals: List[float]) -> io.BytesIO:
+    """Daily weights of the last days, one annotated point per day."""
+    preload()
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    dates_mpl = [mdates.date2num(d) for d in dates]
+    ax.plot(dates_mpl, vals, marker="o", linewidth=2, markersize=6)
+    ax.set_title("Evolución peso - Últimos 6 días", fontsize=14, fontweight='bold')
+    ax.set_ylabel("Kg", fontsize=12)
+    ax.set_xlabel("Fecha", fontsize=12)
+    ax.grid(True, alpha=0.3)
+    ax.tick_params(axis='x', rotation=45)
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+    ax.xaxis.set_major_locator(mdates.DayLocator())
+    for date, weight in zip(dates_mpl, vals):
+        ax.annotate(f'{weight:.1f}', (date, weight),
+                    textcoords="offset points", xytext=(0, 10),
+                    ha='center', fontsize=10)
+    fig.tight_layout()
+    return _to_png(fig, dpi=150, bbox_inches='tight')
+
+
+@timed(RENDER_SECONDS)
+def render_average_chart(labels: Sequence[str], values: Sequence[float], title: str, xlabel: str) -> io.BytesIO:
+    """Averages per period (week or month), oldest first."""
+    preload()
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    ax.plot(labels, values, marker="o", linewidth=2, markersize=6)
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.set_ylabel("Kg", fontsize=12)
+    ax.set_xlabel(xlabel, fontsize=12)
+    ax.grid(True, alpha=0.3)
+    for i, weight in enumerate(values):
+        ax.annotate(f'{weight:.1f}', (i, weight), textcoords="offset points", xytext=(0, 10), ha='center', fontsize=10)
+    fig.tight_layout()
+    return _to_png(fig, dpi=150, bbox_inches='tight')
+
+
+@timed(RENDER_SECONDS)
+def render_history_chart(days, vals, title: str) -> io.BytesIO:
+    """An arbitrary date range; ``days`` are matplotlib date numbers.
+
+    Callers downsample long series first, so the cost of this render
+    doesn't grow with the length of the range.
+    """
+    preload()
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    ax.plot(days, vals, linewidth=1.5, marker="o" if len(days) <= 60 else None, markersize=4)
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.set_ylabel("Kg", fontsize=12)
+    ax.grid(True, alpha=0.3)
+    locator = mdates.AutoDateLocator()
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+    fig.tight_layout()
+    return _to_png(fig, dpi=120, bbox_inches='tight')
+
+
+@timed(RENDER_SECONDS)
+def render_month_chart(dates: List[dt.date], vals: List[float], title: str) -> io.BytesIO:
+    """Every weight of one month, used by the monthly summary job."""
+    preload()
+    fig = Figure()
+    ax = fig.subplots()
+    ax.plot(dates, vals, marker="o")
+    ax.set_title(title)
+    ax.set_ylabel("Kg")
+    ax.grid(True)
+    return _to_png(fig)
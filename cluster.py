@@ -0,0 +1,147 @@
+"""Multi-process deployment: one ingress process and N workers partitioned by user.
+
+The ingress process receives updates (webhook or polling, per BOT_MODE) and
+routes each one to a worker chosen by the sender's id. Every worker runs a
+full bot application (handlers, profile cache, rate limiter) and schedules
+the jobs of its own users only, so a given user's updates and jobs are
+always handled by the same process, in order.
+
+Usage:
+    export TELEGRAM_TOKEN="<TU_TOKEN>" BOT_WORKERS=4
+    python cluster.py
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import queue
+import signal
+import sys
+
+from telegram import Update
+from telegram.ext import ApplicationBuilder, ApplicationHandlerStop, TypeHandler
+
+from config import TOKEN, TELEGRAM_API_URL, BOT_WORKERS, METRICS_PORT, validate_config
+from database import init_db
+from backup_manager import restore_if_needed
+from jobs import register_maintenance_jobs, schedule_startup
+from logging_setup import setup_logging
+from main import build_application, add_handlers, run_application, profile_signal_handler
+from metrics import start_http_server
+from update_processor import update_user_key
+import tracing
+
+logger = logging.getLogger(__name__)
+
+QUEUE_POLL_SECONDS = 0.5
+
+
+def worker_for(key: int, workers: int) -> int:
+    """Index of the worker that owns ``key`` (a user or chat id)."""
+    return key % workers
+
+
+async def _run_worker(index: int, workers: int, inbox) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+
+    app = build_application(persistence_path=f"bot_data.worker{index}.pkl")
+    add_handlers(app)
+
+    # Jobs and caches of the users this worker owns are set up in the background once it runs
+    schedule_startup(app, owns=lambda uid: worker_for(uid, workers) == index)
+    if index == 0:
+        register_maintenance_jobs(app)
+
+    async with app:
+        await app.start()
+        logger.info("Worker ready", extra={"worker": index})
+
+        while not stop.is_set():
+            try:
+                message = await loop.run_in_executor(None, inbox.get, True, QUEUE_POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if message is None:
+                break
+            update = Update.de_json(message["update"], app.bot)
+            # The ingress made the sampling decision; keep it for unsampled updates too
+            tracing.set_remote_parent(update.update_id, message.get("traceparent") or tracing.NOT_SAMPLED)
+            await app.update_queue.put(update)
+
+        await app.stop()
+    logger.info("Worker stopped", extra={"worker": index})
+
+
+def worker_main(index: int, workers: int, inbox) -> None:
+    """Entry point of a worker process."""
+    # The ingress process coordinates Ctrl+C shutdown through the queues
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # kill -USR1 <worker pid> profiles that worker
+    signal.signal(signal.SIGUSR1, profile_signal_handler)
+    setup_logging()
+    # Each process has its own metrics: the ingress on METRICS_PORT, workers on the next ports
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT + 1 + index)
+    asyncio.run(_run_worker(index, workers, inbox))
+
+
+def build_ingress(inboxes):
+    """Application that forwards every update to the owning worker's queue."""
+    app = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        .base_url(f"{TELEGRAM_API_URL}/bot")
+        .base_file_url(f"{TELEGRAM_API_URL}/file/bot")
+        .build()
+    )
+    workers = len(inboxes)
+
+    async def route(update: Update, context) -> None:
+        key = update_user_key(update) or 0
+        # The worker's update span continues this trace (when sampled)
+        span = tracing.start_trace("ingress", user_id=key, worker=worker_for(key, workers))
+        try:
+            inboxes[worker_for(key, workers)].put({"update": update.to_dict(), "traceparent": tracing.current_traceparent()})
+        finally:
+            tracing.end_span(span)
+        raise ApplicationHandlerStop
+
+    app.add_handler(TypeHandler(Update, route))
+    return app
+
+
+def main() -> None:
+    """Start the workers and run the ingress process."""
+    setup_logging()
+    validate_config()
+    restore_if_needed()
+    init_db()
+    start_http_server(METRICS_PORT)
+
+    # spawn gives each worker a clean interpreter (no inherited event loop or sockets)
+    ctx = multiprocessing.get_context("spawn")
+    inboxes = [ctx.Queue() for _ in range(BOT_WORKERS)]
+    processes = [
+        ctx.Process(target=worker_main, args=(i, BOT_WORKERS, inboxes[i]), name=f"worker-{i}")
+        for i in range(BOT_WORKERS)
+    ]
+    for process in processes:
+        process.start()
+
+    logger.info("Ingress started with %d workers. Press Ctrl+C to stop.", BOT_WORKERS)
+    try:
+        run_application(build_ingress(inboxes))
+    except KeyboardInterrupt:
+        logger.info("Received interrupt signal, shutting down")
+    finally:
+        for inbox in inboxes:
+            inbox.put(None)
+        for process in processes:
+            process.join(timeout=30)
+        logger.info("Cluster stopped")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
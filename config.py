@@ -1,5 +1,6 @@
 """Configuration settings for the Telegram Weight Tracker Bot."""
 
+import importlib.util
 import os
 import pytz
 
@@ -12,13 +13,131 @@ DB_FILE = os.path.join(DB_DIR, os.getenv("WEIGHT_DB_NAME", "weights.db"))
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 
+# Backup configuration
+BACKUP_BACKEND = os.getenv("BACKUP_BACKEND", "supabase")  # supabase or local
+BACKUP_LOCAL_DIR = os.getenv("BACKUP_LOCAL_DIR", os.path.join(DB_DIR, "backups"))
+BACKUP_CHUNK_SIZE = int(os.getenv("BACKUP_CHUNK_SIZE", str(8 * 1024 * 1024)))
+BACKUP_DOWNLOAD_WORKERS = int(os.getenv("BACKUP_DOWNLOAD_WORKERS", "4"))
+BACKUP_BUCKET = os.getenv("BACKUP_BUCKET", "weightlogs-backups")
+BACKUP_COMPRESSION = os.getenv("BACKUP_COMPRESSION", "gzip").lower()
+BACKUP_COMPRESSIONS = ("gzip", "zstd", "none")  # zstd needs the zstandard package
+# Tiered retention: newest N backups, plus one per day/week/month for the last N days/weeks/months
+BACKUP_KEEP_RECENT = int(os.getenv("BACKUP_KEEP_RECENT", "10"))
+BACKUP_KEEP_DAILY = int(os.getenv("BACKUP_KEEP_DAILY", "7"))
+BACKUP_KEEP_WEEKLY = int(os.getenv("BACKUP_KEEP_WEEKLY", "4"))
+BACKUP_KEEP_MONTHLY = int(os.getenv("BACKUP_KEEP_MONTHLY", "12"))
+
 # Bot configuration
 TOKEN = os.getenv("TELEGRAM_TOKEN")
+# Bot API server; point it at a local Bot API server or at benchmarks/fake_bot_api.py for load tests
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
 TZ = pytz.timezone(os.getenv("BOT_TZ", "Europe/Madrid"))
 DAILY_HOUR = 8  # 08:00
 
+# Update delivery: "polling" or "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # public base URL Telegram posts to
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("PORT", os.getenv("WEBHOOK_PORT", "8443")))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+# Updates processed at once; updates from the same user always run in order
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "64"))
+# Updates kept per user (running or waiting); further argument-less commands are dropped
+USER_MAX_PENDING = int(os.getenv("USER_MAX_PENDING", "10"))
+# Chart renders/uploads running at once across all users
+CHART_CONCURRENCY = int(os.getenv("CHART_CONCURRENCY", "4"))
+# How the readings of one day become its weight: first, last, min or mean
+DAILY_AGGREGATION = os.getenv("DAILY_AGGREGATION", "last").lower()
+DAILY_AGGREGATIONS = ("first", "last", "min", "mean")
+
+# Trend: daily EMA smoothing factor and half-life (days) of the weighted rate regression
+TREND_SMOOTHING = float(os.getenv("TREND_SMOOTHING", "0.1"))
+TREND_HALF_LIFE_DAYS = float(os.getenv("TREND_HALF_LIFE_DAYS", "14"))
+
+# Outlier check on new weights: window of previous entries, threshold in robust
+# standard deviations, minimum spread (kg) and extra allowance per day since the last entry
+OUTLIER_WINDOW = int(os.getenv("OUTLIER_WINDOW", "15"))
+OUTLIER_THRESHOLD = float(os.getenv("OUTLIER_THRESHOLD", "5"))
+OUTLIER_MIN_SPREAD = float(os.getenv("OUTLIER_MIN_SPREAD", "0.5"))
+OUTLIER_DAILY_DRIFT = float(os.getenv("OUTLIER_DAILY_DRIFT", "0.3"))
+
+# Maximum points drawn by range charts (/historial); longer series are downsampled
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "300"))
+
+# Telegram user ids allowed to run admin commands (comma separated)
+ADMIN_IDS = {int(uid) for uid in os.getenv("ADMIN_IDS", "").split(",") if uid.strip()}
+
+# Bulk import of weight history (/importar)
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))  # rows per transaction
+IMPORT_MAX_ERRORS = 5  # invalid rows quoted back to the user
+IMPORT_PROGRESS_SECONDS = 2.0  # minimum time between progress messages
+# History export (/exportar)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))  # rows per fetchmany
+# Largest file sent by the bot (Telegram's limit for bots); uploads are read into memory whole
+EXPORT_MAX_BYTES = int(os.getenv("EXPORT_MAX_BYTES", str(50 * 1024 * 1024)))
+# Worker processes started by cluster.py
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", str(os.cpu_count() or 1)))
+
+# Logging: level (DEBUG, INFO, WARNING...) and output format (json or text)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# Updates slower than this are logged as warnings
+SLOW_UPDATE_SECONDS = float(os.getenv("SLOW_UPDATE_SECONDS", "2.0"))
+
+# Prometheus metrics endpoint (/metrics); 0 disables it. cluster.py workers use the following ports
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+
+# Tracing: fraction of updates traced (0 disables it) and where spans go (file or otlp)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "file").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(DB_DIR, "traces.jsonl"))
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://127.0.0.1:4318/v1/traces")
+
+# On-demand profiling (/perfil, SIGUSR1): reports directory, updates/jobs profiled and lines per report section
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(DB_DIR, "profiles"))
+PROFILE_UPDATES = int(os.getenv("PROFILE_UPDATES", "50"))
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "30"))
+
+# Startup: scheduled jobs registered per batch once the bot is receiving updates
+JOB_REGISTRATION_BATCH = int(os.getenv("JOB_REGISTRATION_BATCH", "200"))
+
+# Recent weights cached per user (days, users; 0 users disables it) and the startup
+# warm-up of users active in the last WARMUP_ACTIVE_DAYS days, at most WARMUP_USERS_PER_SECOND
+SERIES_CACHE_DAYS = int(os.getenv("SERIES_CACHE_DAYS", "200"))
+SERIES_CACHE_USERS = int(os.getenv("SERIES_CACHE_USERS", "10000"))
+WARMUP_ACTIVE_DAYS = int(os.getenv("WARMUP_ACTIVE_DAYS", "14"))
+WARMUP_USERS_PER_SECOND = float(os.getenv("WARMUP_USERS_PER_SECOND", "500"))
+
+# Archival: daily weights older than this many days move to compressed per-user-year
+# blocks (0 disables it), ARCHIVE_BATCH_USERS users per transaction
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "400"))
+ARCHIVE_BATCH_USERS = int(os.getenv("ARCHIVE_BATCH_USERS", "200"))
+
+# Analytics: keep the columnar snapshot behind /global in memory, reloaded when older
+# than ANALYTICS_MAX_AGE seconds (other workers' writes); off, each /global reads the table
+ANALYTICS_SNAPSHOT = os.getenv("ANALYTICS_SNAPSHOT", "0").lower() in ("1", "true", "yes")
+ANALYTICS_MAX_AGE = int(os.getenv("ANALYTICS_MAX_AGE", "3600"))
+
+# Group rankings (/ranking [días]): default and longest period in days, members listed,
+# boards kept in memory and seconds before one is reloaded (other workers' writes)
+LEADERBOARD_DAYS = int(os.getenv("LEADERBOARD_DAYS", "30"))
+LEADERBOARD_MAX_DAYS = int(os.getenv("LEADERBOARD_MAX_DAYS", "365"))
+LEADERBOARD_TOP = int(os.getenv("LEADERBOARD_TOP", "10"))
+LEADERBOARD_BOARDS = int(os.getenv("LEADERBOARD_BOARDS", "1000"))
+LEADERBOARD_MAX_AGE = int(os.getenv("LEADERBOARD_MAX_AGE", "600"))
+
 # Validation
 def validate_config():
     """Validate that all required configuration is present."""
     if not TOKEN:
-        raise RuntimeError("Debes exportar TELEGRAM_TOKEN con tu token de BotFather") 
\ No newline at end of file
+        raise RuntimeError("Debes exportar TELEGRAM_TOKEN con tu token de BotFather")
+    if DAILY_AGGREGATION not in DAILY_AGGREGATIONS:
+        raise RuntimeError(f"DAILY_AGGREGATION debe ser uno de: {', '.join(DAILY_AGGREGATIONS)}")
+    if BACKUP_COMPRESSION not in BACKUP_COMPRESSIONS:
+        raise RuntimeError(f"BACKUP_COMPRESSION debe ser uno de: {', '.join(BACKUP_COMPRESSIONS)}")
+    if BACKUP_COMPRESSION == "zstd" and importlib.util.find_spec("zstandard") is None:
+        raise RuntimeError("BACKUP_COMPRESSION=zstd requiere el paquete zstandard (pip install zstandard)")
+    if BOT_MODE == "webhook" and not WEBHOOK_URL:
+        raise RuntimeError("BOT_MODE=webhook requiere WEBHOOK_URL con la URL pública del bot") 
\ No newline at end of file
@@ -1,20 +1,33 @@
 """Database operations for the Telegram Weight Tracker Bot."""
 
 import datetime as dt
+import heapq
 import sqlite3
+import time
 from contextlib import closing
-from typing import List, Tuple
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Tuple
 
-from config import DB_FILE, DB_DIR
+from config import DB_FILE, DB_DIR, DAILY_AGGREGATION, ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_USERS
+from metrics import DB_SECONDS, timed
+import leaderboard
+import series_cache
 
+if TYPE_CHECKING:
+    import streaks
+    import trend
 
+
+@timed(DB_SECONDS)
 def init_db() -> None:
-    """Initialize the database with the weights table."""
-    # Create database directory if it doesn't exist
+    """Initialize the database tables and run pending migrations."""
+    import analytics
     import os
+    # Create database directory if it doesn't exist
     os.makedirs(DB_DIR, exist_ok=True)
     
     with closing(sqlite3.connect(DB_FILE)) as conn:
+        # WAL lets readers in other worker processes run alongside a writer
+        conn.execute("PRAGMA journal_mode=WAL")
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS weights (
@@ -25,6 +38,28 @@ def init_db() -> None:
             )
             """
         )
+        # Timestamped readings are the source of truth; ``weights`` holds one
+        # aggregated value per day (DAILY_AGGREGATION) for the daily readers
+        has_readings = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'readings'"
+        ).fetchone()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS readings (
+                user_id INTEGER,
+                ts TEXT,
+                weight REAL,
+                PRIMARY KEY (user_id, ts)
+            )
+            """
+        )
+        if not has_readings:
+            # Databases from before readings: one reading per stored day
+            conn.execute(
+                "INSERT INTO readings (user_id, ts, weight) "
+                "SELECT user_id, date || 'T00:00:00', weight FROM weights"
+            )
+        conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS user_preferences (
@@ -33,28 +68,656 @@ def init_db() -> None:
             )
             """
         )
+        # Columns added after the first release
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(user_preferences)")}
+        for column, ddl in (
+            ("silenced", "INTEGER DEFAULT 0"),
+            ("last_active", "TEXT"),
+            ("goal_weight", "REAL"),
+        ):
+            if column not in existing:
+                conn.execute(f"ALTER TABLE user_preferences ADD COLUMN {column} {ddl}")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS user_trends (
+                user_id INTEGER PRIMARY KEY,
+                last_date TEXT,
+                last_weight REAL,
+                trend REAL,
+                count INTEGER,
+                s0 REAL, s1 REAL, s2 REAL, sy REAL, sty REAL,
+                recent TEXT,
+                last_step REAL
+            )
+            """
+        )
+        # Cold history: one compressed block per user and year (see archive.py)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS weight_archive (
+                user_id INTEGER,
+                year INTEGER,
+                entries INTEGER,
+                data BLOB,
+                PRIMARY KEY (user_id, year)
+            )
+            """
+        )
+        # Members of group chats who opted in to /ranking (see leaderboard.py)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS group_members (
+                chat_id INTEGER,
+                user_id INTEGER,
+                name TEXT,
+                PRIMARY KEY (chat_id, user_id)
+            )
+            """
+        )
+        # Streaks, weekly adherence and missed days (see streaks.py), backfilled when added
+        has_streaks = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_streaks'"
+        ).fetchone()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS user_streaks (
+                user_id INTEGER PRIMARY KEY,
+                first_date TEXT,
+                last_date TEXT,
+                settled TEXT,
+                current INTEGER,
+                longest INTEGER,
+                missed INTEGER,
+                week_start TEXT,
+                week_days INTEGER,
+                prev_week_days INTEGER
+            )
+            """
+        )
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(user_trends)")}
+        for column, ddl in (("recent", "TEXT"), ("last_step", "REAL")):
+            if column not in existing:
+                # Rows without it are rebuilt on their next read or write
+                conn.execute(f"ALTER TABLE user_trends ADD COLUMN {column} {ddl}")
         conn.commit()
 
+        # Daily values follow the configured policy; rebuild them when it changes
+        row = conn.execute("SELECT value FROM settings WHERE key = 'daily_aggregation'").fetchone()
+        if row is None or row[0] != DAILY_AGGREGATION:
+            with conn:
+                _rebuild_daily_weights(conn)
+                conn.execute(
+                    "REPLACE INTO settings (key, value) VALUES ('daily_aggregation', ?)",
+                    (DAILY_AGGREGATION,),
+                )
+            series_cache.invalidate()
+            analytics.reset()
+            leaderboard.reset()
+
+    if not has_streaks:
+        backfill_streaks()
+
+
+# Per-day value of the readings for each DAILY_AGGREGATION policy.
+# "first"/"last" rely on SQLite's bare columns: with MIN()/MAX(), ``weight`` comes from that row.
+_AGGREGATE_COLUMNS = {
+    "first": "weight AS value, MIN(ts)",
+    "last": "weight AS value, MAX(ts)",
+    "min": "MIN(weight) AS value",
+    "mean": "AVG(weight) AS value",
+}
+
+
+def _daily_aggregate_query(where: str) -> str:
+    return (
+        "SELECT user_id, day, value FROM ("
+        f"SELECT user_id, substr(ts, 1, 10) AS day, {_AGGREGATE_COLUMNS[DAILY_AGGREGATION]} "
+        f"FROM readings {where} GROUP BY user_id, day)"
+    )
+
+
+def _rebuild_daily_weights(conn) -> None:
+    """Recompute every daily value from the readings (after a policy change).
+
+    Archived days have no readings left and keep their stored value.
+    """
+    conn.execute("DELETE FROM weights")
+    conn.execute(f"INSERT INTO weights (user_id, date, weight) {_daily_aggregate_query('')}")
+    conn.execute("DELETE FROM user_trends")
+
+
+def _day_bounds(date: dt.date) -> Tuple[str, str]:
+    return date.isoformat(), (date + dt.timedelta(days=1)).isoformat()
+
+
+def _reading_ts(at: dt.datetime) -> str:
+    """Readings are stored as local (naive ISO) times, so their date prefix is their day."""
+    return at.strftime("%Y-%m-%dT%H:%M:%S")
 
+
+def _aggregate_day(conn, user_id: int, date: dt.date) -> Optional[float]:
+    """Store the day's value from its readings (a range scan of the primary key)."""
+    conn.execute(
+        f"REPLACE INTO weights (user_id, date, weight) "
+        f"{_daily_aggregate_query('WHERE user_id = ? AND ts >= ? AND ts < ?')}",
+        (user_id, *_day_bounds(date)),
+    )
+    row = conn.execute(
+        "SELECT weight FROM weights WHERE user_id = ? AND date = ?", (user_id, date.isoformat())
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _update_trend(conn, user_id: int, date: dt.date, weight: float) -> None:
+    """Update the user's trend after the value of ``date`` changed.
+
+    O(1) for the latest day (a new day or another reading of the last one),
+    a full recompute for older days.
+    """
+    import trend
+    state = _load_trend(conn, user_id)
+    if state is not None and date >= state.last_date:
+        state = trend.update(state, date, weight)
+    else:
+        state = _recompute_trend(conn, user_id)
+    _store_trend(conn, user_id, state)
+
+
+@timed(DB_SECONDS)
+def save_reading(user_id: int, at: dt.datetime, weight: float) -> Tuple[float, int]:
+    """Add a timestamped reading and update that day's value and the trend.
+
+    Returns the day's aggregated weight and its number of readings.
+    """
+    import analytics
+    date = at.date()
+    with closing(sqlite3.connect(DB_FILE)) as conn:
+        with conn:
+            conn.execute(
+                "REPLACE INTO readings (user_id, ts, weight) VALUES (?,?,?)",
+                (user_id, _reading_ts(at), weight),
+            )
+            daily = _aggregate_day(conn, user_id, date)
+            _update_trend(conn, user_id, date, daily)
+            _update_streak(conn, user_id, date)
+            count = conn.execute(
+                "SELECT COUNT(*) FROM readings WHERE user_id = ? AND ts >= ? AND ts < ?",
+                (user_id, *_day_bounds(date)),
+            ).fetchone()[0]
+    series_cache.update(user_id, date, daily)
+    analytics.record(user_id, date, daily)
+    leaderboard.record(user_id, date, daily)
+    return daily, count
+
+
+@timed(DB_SECONDS)
 def save_weight(user_id: int, date: dt.date, weight: float) -> None:
-    """Save a weight entry for a user on a specific date."""
+    """Set the weight of a day, replacing any readings it had.
+
+    The user's trend is updated in the same transaction (see ``_update_trend``).
+    """
+    import analytics
     with closing(sqlite3.connect(DB_FILE)) as conn:
-        conn.execute(
-            "REPLACE INTO weights (user_id, date, weight) VALUES (?,?,?)",
-            (user_id, date.isoformat(), weight),
-        )
-        conn.commit()
+        with conn:
+            conn.execute(
+                "DELETE FROM readings WHERE user_id = ? AND ts >= ? AND ts < ?",
+                (user_id, *_day_bounds(date)),
+            )
+            conn.execute(
+                "INSERT INTO readings (user_id, ts, weight) VALUES (?,?,?)",
+                (user_id, _reading_ts(dt.datetime.combine(date, dt.time())), weight),
+            )
+            conn.execute(
+                "REPLACE INTO weights (user_id, date, weight) VALUES (?,?,?)",
+                (user_id, date.isoformat(), weight),
+            )
+            _update_trend(conn, user_id, date, weight)
+            _update_streak(conn, user_id, date)
+    series_cache.update(user_id, date, weight)
+    analytics.record(user_id, date, weight)
+    leaderboard.record(user_id, date, weight)
 
 
-def get_weights(user_id: int, start: dt.date, end: dt.date) -> List[Tuple[dt.date, float]]:
-    """Get weight entries for a user within a date range."""
+@timed(DB_SECONDS)
+def save_weights_bulk(user_id: int, entries: Iterable[Tuple[dt.date, float]]) -> int:
+    """Set the weight of many days for a user in a single transaction.
+
+    Like ``save_weight``, each day's readings are replaced by the given
+    value; when a day is given more than once the last value wins. The
+    user's trend is dropped rather than updated row by row; it is rebuilt by
+    ``refresh_trend`` or on the next read. Returns the number of days written.
+    """
+    import analytics
+    # One reading per day: a repeated day would hit the (user_id, ts) key
+    entries = list(dict(entries).items())
+    rows = [(user_id, date.isoformat(), weight) for date, weight in entries]
     with closing(sqlite3.connect(DB_FILE)) as conn:
-        cur = conn.execute(
+        with conn:
+            conn.executemany(
+                "DELETE FROM readings WHERE user_id = ? AND ts >= ? AND ts < ?",
+                [(user_id, *_day_bounds(date)) for date, _ in entries],
+            )
+            conn.executemany(
+                "INSERT INTO readings (user_id, ts, weight) VALUES (?, ? || 'T00:00:00', ?)",
+                rows,
+            )
+            conn.executemany(
+                "REPLACE INTO weights (user_id, date, weight) VALUES (?,?,?)",
+                rows,
+            )
+            conn.execute("DELETE FROM user_trends WHERE user_id = ?", (user_id,))
+            conn.execute("DELETE FROM user_streaks WHERE user_id = ?", (user_id,))
+    series_cache.invalidate(user_id)
+    analytics.drop_user(user_id)
+    leaderboard.refresh_user(user_id)
+    return len(rows)
+
+
+@timed(DB_SECONDS)
+def get_readings(user_id: int, date: dt.date) -> List[Tuple[dt.datetime, float]]:
+    """Get the timestamped readings of one day, oldest first."""
+    with closing(sqlite3.connect(DB_FILE)) as conn:
+        rows = conn.execute(
+            "SELECT ts, weight FROM readings WHERE user_id = ? AND ts >= ? AND ts < ? ORDER BY ts",
+            (user_id, *_day_bounds(date)),
+        ).fetchall()
+    return [(dt.datetime.fromisoformat(ts), w) for ts, w in rows]
+
+
+_TREND_COLUMNS = "last_date, last_weight, trend, count, s0, s1, s2, sy, sty, recent, last_step"
+
+
+def _load_trend(conn, user_id: int) -> Optional["trend.TrendState"]:
+    import trend
+    row = conn.execute(
+        f"SELECT {_TREND_COLUMNS} FROM user_trends WHERE user_id = ?", (user_id,)
+    ).fetchone()
+    if row is None or row[-2] is None or row[-1] is None:
+        return None
+    recent = tuple(float(v) for v in row[-2].split(","))
+    return trend.TrendState(dt.date.fromisoformat(row[0]), *row[1:-2], recent=recent, last_step=row[-1])
+
+
+def _store_trend(conn, user_id: int, state: Optional["trend.TrendState"]) -> None:
+    if state is None:
+        conn.execute("DELETE FROM user_trends WHERE user_id = ?", (user_id,))
+        return
+    conn.execute(
+        f"REPLACE INTO user_trends (user_id, {_TREND_COLUMNS}) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+        (user_id, state.last_date.isoformat(), state.last_weight, state.trend, state.count,
+         state.s0, state.s1, state.s2, state.sy, state.sty, ",".join(map(repr, state.recent)),
+         state.last_step),
+    )
+
+
+def _recompute_trend(conn, user_id: int) -> Optional["trend.TrendState"]:
+    import trend
+    rows = _read_weights(conn, user_id, dt.date.min, dt.date.max)
+    return trend.recompute([d for d, _ in rows], [w for _, w in rows])
+
+
+@timed(DB_SECONDS)
+def delete_weight(user_id: int, date: dt.date) -> bool:
+    """Delete a user's entry (and readings) for one day; returns whether it existed."""
+    import analytics
+    with closing(sqlite3.connect(DB_FILE)) as conn:
+        with conn:
+            conn.execute(
+                "DELETE FROM readings WHERE user_id = ? AND ts >= ? AND ts < ?",
+                (user_id, *_day_bounds(date)),
+            )
+            cur = conn.execute(
+                "DELETE FROM weights WHERE user_id = ? AND date = ?", (user_id, date.isoformat())
+            )
+            deleted = _unarchive_day(conn, user_id, date) or cur.rowcount > 0
+            if deleted:
+                _store_trend(conn, user_id, _recompute_trend(conn, user_id))
+                _store_streak(conn, user_id, _recompute_streak(conn, user_id))
+    if deleted:
+        series_cache.update(user_id, date, None)
+        analytics.record(user_id, date, None)
+        leaderboard.refresh_user(user_id)
+    return deleted
+
+
+@timed(DB_SECONDS)
+def refresh_trend(user_id: int) -> Optional["trend.TrendState"]:
+    """Rebuild a user's trend from their whole history (after backfills)."""
+    with closing(sqlite3.connect(DB_FILE)) as conn:
+        with conn:
+            state = _recompute_trend(conn, user_id)
+            _store_trend(conn, user_id, state)
+    return state
+
+
+@timed(DB_SECONDS)
+def get_trend(user_id: int) -> Optional["trend.TrendState"]:
+    """Return the user's stored trend, rebuilding it if missing; None without data."""
+    with closing(sqlite3.connect(DB_FILE)) as conn:
+        state = _load_trend(conn, user_id)
+    return state if state is not None else refresh_trend(user_id)
+
+
+_STREAK_COLUMNS = "first_date, last_date, settled, current, longest, missed, week_start, week_days, prev_week_days"
+_STREAK_DATES = (0, 1, 2, 6)
+
+
+def _load_streak(conn, user_id: int) -> Optional["streaks.StreakState"]:
+    import streaks
+    row = conn.execute(
+        f"SELECT {_STREAK_COLUMNS} FROM user_streaks WHERE user_id = ?", (user_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    return streaks.StreakState(*(dt.date.fromisoformat(v) if i in _STREAK_DATES else v for i, v in enumerate(row)))
+
+
+def _streak_row(user_id: int, state: "streaks.StreakState") -> tuple:
+    return (user_id, state.first_date.isoformat(), state.last_date.isoformat(), state.settled.isoformat(),
+            state.current, state.longest, state.missed, state.week_start.isoformat(),
+            state.week_days, state.prev_week_days)
+
+
+def _store_streak(conn, user_id: int, state: Optional["streaks.StreakState"]) -> None:
+    if state is None:
+        conn.execute("DELETE FROM user_streaks WHERE user_id = ?", (user_id,))
+        return
+    conn.execute(
+        f"REPLACE INTO user_streaks (user_id, {_STREAK_COLUMNS}) VALUES (?,?,?,?,?,?,?,?,?,?)",
+        _streak_row(user_id, state),
+    )
+
+
+def _recompute_streak(conn, user_id: int) -> Optional["streaks.StreakState"]:
+    import streaks
+    return streaks.recompute([d for d, _ in _read_weights(conn, user_id, dt.date.min, dt.date.max)])
+
+
+def _update_streak(conn, user_id: int, date: dt.date) -> None:
+    """Update the user's streaks after ``date`` got an entry: O(1) unless it's an older day."""
+    import streaks
+    state = _load_streak(conn, user_id)
+    if state is not None and date >= state.last_date:
+        state = streaks.update(state, date)
+    else:
+        state = _recompute_streak(conn, user_id)
+    _store_streak(conn, user_id, state)
+
+
+@timed(DB_SECONDS)
+def refresh_streak(user_id: int) -> Optional["streaks.StreakState"]:
+    """Rebuild a user's streaks from their whole history (after backfills)."""
+    with closing(sqlite3.connect(DB_FILE)) as conn:
+        with conn:
+            state = _recompute_streak(conn, user_id)
+            _store_streak(conn, user_id, state)
+    return state
+
+
+@timed(DB_SECONDS)
+def get_streak(user_id: int) -> Optional["streaks.StreakState"]:
+    """Return the user's stored streaks, rebuilding them if missing; None without data."""
+    with closing(sqlite3.connect(DB_FILE)) as conn:
+        state = _load_streak(conn, user_id)
+    return state if state is not None else refresh_streak(user_id)
+
+
+@timed(DB_SECONDS)
+def settle_streak(user_id: int, day: dt.date) -> Optional["streaks.StreakState"]:
+    """Count a user's days without an entry up to ``day`` as missed (daily reminder pass)."""
+    import streaks
+    with closing(sqlite3.connect(DB_FILE)) as conn:
+        with conn:
+            state = _load_streak(conn, user_id)
+            if state is None:
+                return None
+            state = streaks.settle(state, day)
+            _store_streak(conn, user_id, state)
+    return state
+
+
+@timed(DB_SECONDS)
+def backfill_streaks() -> int:
+    """Rebuild every user's streaks from the whole history in one vectorized pass; returns the users."""
+    import analytics
+    import streaks
+    snapshot = analytics.Snapshot.load()
+    states = streaks.backfill(snapshot.users, snapshot.days)
+    with closing(sqlite3.connect(DB_FILE)) as conn:
+        with conn:
+            conn.execute("DELETE FROM user_streaks")
+            conn.executemany(
+                f"INSERT INTO user_streaks (user_id, {_STREAK_COLUMNS}) VALUES (?,?,?,?,?,?,?,?,?,?)",
+                (_streak_row(uid, state) for uid, state in states.items()),
+            )
+    return len(states)
+
+
+def _archive_cutoff(today: Optional[dt.date] = None) -> Optional[dt.date]:
+    """Days before this one may be archived; None when archival is off."""
+    if ARCHIVE_AFTER_DAYS <= 0:
+        return None
+    return (today or dt.datetime.now().date()) - dt.timedelta(days=ARCHIVE_AFTER_DAYS)
+
+
+def _archived_weights(conn, user_id: int, start: dt.date, end: dt.date) -> List[Tuple[dt.date, float]]:
+    import archive
+    rows = []
+    for year, data in conn.execute(
+        "SELECT year, data FROM weight_archive WHERE user_id = ? AND year BETWEEN ? AND ? ORDER BY year",
+        (user_id, start.year, end.year),
+    ):
+        rows.extend((d, w) for d, w in archive.decode_block(year, data) if start <= d <= end)
+    return rows
+
+
+def _merge_days(hot: List[Tuple[dt.date, float]], archived: List[Tuple[dt.date, float]]) -> List[Tuple[dt.date, float]]:
+    """Merge two date-ordered lists; a hot row replaces an archived row of the same day."""
+    if not archived:
+        return hot
+    merged = dict(archived)
+    merged.update(hot)
+    return sorted(merged.items())
+
+
+def _read_weights(conn, user_id: int, start: dt.date, end: dt.date) -> List[Tuple[dt.date, float]]:
+    """A user's daily weights in a range, from the hot table and the archive."""
+    hot = [
+        (dt.date.fromisoformat(d), w)
+        for d, w in conn.execute(
             "SELECT date, weight FROM weights WHERE user_id = ? AND date BETWEEN ? AND ? ORDER BY date",
             (user_id, start.isoformat(), end.isoformat()),
         )
-        rows = cur.fetchall()
-    return [(dt.date.fromisoformat(d), w) for d, w in rows]
+    ]
+    cutoff = _archive_cutoff()
+    # Ranges after the archival horizon can't have archived days (the horizon only moves forward)
+    if cutoff is not None and start >= cutoff:
+        return hot
+    return _merge_days(hot, _archived_weights(conn, user_id, start, end))
+
+
+def _query_weights(user_id: int, start: dt.date, end: dt.date) -> List[Tuple[dt.date, float]]:
+    with closing(sqlite3.connect(DB_FILE)) as conn:
+        return _read_weights(conn, user_id, start, end)
+
+
+@timed(DB_SECONDS)
+def get_weights(user_id: int, start: dt.date, end: dt.date) -> List[Tuple[dt.date, float]]:
+    """Get weight entries for a user within a date range.
+
+    Ranges within the last SERIES_CACHE_DAYS days are served by
+    ``series_cache``; a miss reads and caches the user's whole window.
+    """
+    since = series_cache.window_start()
+    if not series_cache.enabled() or start < since:
+        return _query_weights(user_id, start, end)
+    cached = series_cache.get(user_id, start, end)
+    if cached is not None:
+        return cached
+    mark = series_cache.write_mark()
+    rows = _query_weights(user_id, since, dt.date.max)
+    series_cache.put(user_id, since, rows, mark)
+    return [(d, w) for d, w in rows if start <= d <= end]
+
+
+def _iter_hot_rows(conn, user_id: Optional[int], batch_size: int) -> Iterator[Tuple[int, str, float]]:
+    query = "SELECT user_id, date, weight FROM weights"
+    params: tuple = ()
+    if user_id is not None:
+        query += " WHERE user_id = ?"
+        params = (user_id,)
+    cur = conn.execute(query + " ORDER BY user_id, date", params)
+    while True:
+        # Timed per batch: timing the generator would include the consumer's work
+        start = time.perf_counter()
+        rows = cur.fetchmany(batch_size)
+        DB_SECONDS.observe(time.perf_counter() - start, "iter_weight_rows")
+        if not rows:
+            return
+        yield from rows
+
+
+def _iter_archived_rows(conn, user_id: Optional[int]) -> Iterator[Tuple[int, str, float]]:
+    import archive
+    query = "SELECT user_id, year, data FROM weight_archive"
+    params: tuple = ()
+    if user_id is not None:
+        query += " WHERE user_id = ?"
+        params = (user_id,)
+    for uid, year, data in conn.execute(query + " ORDER BY user_id, year", params):
+        for d, w in archive.decode_block(year, data):
+            yield uid, d.isoformat(), w
+
+
+def iter_weight_rows(user_id: Optional[int] = None, batch_size: int = 5000) -> Iterator[List[Tuple[int, str, float]]]:
+    """Stream (user_id, date, weight) rows ordered by user and date, in batches.
+
+    Hot rows come from a single cursor read with ``fetchmany`` and archived
+    rows are decoded one block at a time, merged in order, so memory use is
+    bounded by ``batch_size`` whatever the table size. All users are returned
+    when ``user_id`` is None.
+    """
+    with closing(sqlite3.connect(DB_FILE)) as conn:
+        merged = heapq.merge(
+            ((uid, d, 0, w) for uid, d, w in _iter_hot_rows(conn, user_id, batch_size)),
+            ((uid, d, 1, w) for uid, d, w in _iter_archived_rows(conn, user_id)),
+        )
+        batch: List[Tuple[int, str, float]] = []
+        last = None
+        for uid, d, _, w in merged:
+            # The hot row (source 0) sorts first; skip the archived copy of the same day
+            if (uid, d) == last:
+                continue
+            last = (uid, d)
+            batch.append((uid, d, w))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def iter_recent_users(active_since: dt.date, series_since: dt.date,
+                      batch_size: int = 5000) -> Iterator[Tuple[tuple, List[Tuple[dt.date, float]]]]:
+    """Stream users active since ``active_since``: their profile row and entries since ``series_since``.
+
+    A single ordered scan of user_preferences joined to each user's range of
+    ``weights``; profile rows are shaped like ``get_user_profiles`` rows.
+    """
+    query = (
+        "SELECT p.user_id, p.language_code, p.silenced, p.last_active, p.goal_weight, w.date, w.weight "
+        "FROM user_preferences p LEFT JOIN weights w ON w.user_id = p.user_id AND w.date >= ? "
+        "WHERE p.last_active >= ? ORDER BY p.user_id, w.date"
+    )
+    profile, series = None, []
+    with closing(sqlite3.connect(DB_FILE)) as conn:
+        cur = conn.execute(query, (series_since.isoformat(), active_since.isoformat()))
+        while True:
+            start = time.perf_counter()
+            rows = cur.fetchmany(batch_size)
+            DB_SECONDS.observe(time.perf_counter() - start, "iter_recent_users")
+            if not rows:
+                break
+            for row in rows:
+                if profile is None or row[0] != profile[0]:
+                    if profile is not None:
+                        yield profile, series
+                    profile, series = row[:5], []
+                if row[5] is not None:
+                    series.append((dt.date.fromisoformat(row[5]), row[6]))
+    if profile is not None:
+        yield profile, series
+
+
+def _store_block(conn, user_id: int, year: int, rows: List[Tuple[dt.date, float]]) -> None:
+    import archive
+    if rows:
+        conn.execute(
+            "REPLACE INTO weight_archive (user_id, year, entries, data) VALUES (?,?,?,?)",
+            (user_id, year, len(rows), archive.encode_block(year, rows)),
+        )
+    else:
+        conn.execute("DELETE FROM weight_archive WHERE user_id = ? AND year = ?", (user_id, year))
+
+
+def _unarchive_day(conn, user_id: int, date: dt.date) -> bool:
+    """Remove one day from its archived block; returns whether it was there."""
+    import archive
+    row = conn.execute(
+        "SELECT data FROM weight_archive WHERE user_id = ? AND year = ?", (user_id, date.year)
+    ).fetchone()
+    if row is None:
+        return False
+    rows = archive.decode_block(date.year, row[0])
+    kept = [(d, w) for d, w in rows if d != date]
+    if len(kept) == len(rows):
+        return False
+    _store_block(conn, user_id, date.year, kept)
+    return True
+
+
+@timed(DB_SECONDS)
+def archive_cold_rows(cutoff: Optional[dt.date] = None, batch_users: int = ARCHIVE_BATCH_USERS) -> dict:
+    """Move daily weights older than ``cutoff`` (default: ARCHIVE_AFTER_DAYS ago) into the archive.
+
+    Each user's rows of a year are merged into that year's block (rows
+    written after an earlier pass win over archived ones), then deleted from
+    ``weights`` along with their readings. Users are processed in
+    transactions of ``batch_users`` so writers are never blocked for long.
+    Returns the numbers of users, rows and blocks written.
+    """
+    cutoff = cutoff or _archive_cutoff()
+    stats = {"users": 0, "rows": 0, "blocks": 0}
+    if cutoff is None:
+        return stats
+    with closing(sqlite3.connect(DB_FILE)) as conn:
+        user_ids = [row[0] for row in conn.execute(
+            "SELECT DISTINCT user_id FROM weights WHERE date < ?", (cutoff.isoformat(),)
+        )]
+        for i in range(0, len(user_ids), batch_users):
+            with conn:
+                for user_id in user_ids[i:i + batch_users]:
+                    hot = [
+                        (dt.date.fromisoformat(d), w)
+                        for d, w in conn.execute(
+                            "SELECT date, weight FROM weights WHERE user_id = ? AND date < ? ORDER BY date",
+                            (user_id, cutoff.isoformat()),
+                        )
+                    ]
+                    for year in sorted({d.year for d, _ in hot}):
+                        year_rows = [(d, w) for d, w in hot if d.year == year]
+                        archived = _archived_weights(conn, user_id, dt.date(year, 1, 1), dt.date(year, 12, 31))
+                        _store_block(conn, user_id, year, _merge_days(year_rows, archived))
+                        stats["blocks"] += 1
+                    conn.execute(
+                        "DELETE FROM weights WHERE user_id = ? AND date < ?", (user_id, cutoff.isoformat())
+                    )
+                    conn.execute(
+                        "DELETE FROM readings WHERE user_id = ? AND ts < ?", (user_id, cutoff.isoformat())
+                    )
+                    stats["users"] += 1
+                    stats["rows"] += len(hot)
+    return stats
 
 
 def _month_end(date_: dt.date) -> dt.date:
@@ -63,6 +726,7 @@ def _month_end(date_: dt.date) -> dt.date:
     return next_month.replace(day=1) - dt.timedelta(days=1)
 
 
+@timed(DB_SECONDS)
 def get_monthly_weights(user_id: int, months_back: int = 6) -> List[Tuple[str, float]]:
     """Get monthly average weights for the last N months."""
     today = dt.datetime.now().date()
@@ -83,6 +747,7 @@ def get_monthly_weights(user_id: int, months_back: int = 6) -> List[Tuple[str, f
     return results
 
 
+@timed(DB_SECONDS)
 def get_weekly_weights(user_id: int, weeks_back: int = 4) -> List[Tuple[str, float]]:
     """Get weekly average weights for the last N weeks."""
     today = dt.datetime.now().date()
@@ -101,6 +766,7 @@ def get_weekly_weights(user_id: int, weeks_back: int = 4) -> List[Tuple[str, flo
     return results
 
 
+@timed(DB_SECONDS)
 def get_daily_weights(user_id: int, days_back: int = 6) -> List[Tuple[str, float]]:
     """Get daily weights for the last N days."""
     today = dt.datetime.now().date()
@@ -117,23 +783,144 @@ def get_daily_weights(user_id: int, days_back: int = 6) -> List[Tuple[str, float
     return results 
 
 
+@timed(DB_SECONDS)
 def get_all_user_ids():
     """Return a list of all unique user_ids in the database."""
     with closing(sqlite3.connect(DB_FILE)) as conn:
-        cur = conn.execute("SELECT DISTINCT user_id FROM weights")
+        cur = conn.execute("SELECT DISTINCT user_id FROM weights UNION SELECT DISTINCT user_id FROM weight_archive")
         return [row[0] for row in cur.fetchall()]
 
 
+@timed(DB_SECONDS)
+def add_group_member(chat_id: int, user_id: int, name: str) -> bool:
+    """Opt a user in to a group's ranking (updating their name); returns whether they were new."""
+    with closing(sqlite3.connect(DB_FILE)) as conn:
+        with conn:
+            new = conn.execute(
+                "SELECT 1 FROM group_members WHERE chat_id = ? AND user_id = ?", (chat_id, user_id)
+            ).fetchone() is None
+            conn.execute(
+                "REPLACE INTO group_members (chat_id, user_id, name) VALUES (?,?,?)",
+                (chat_id, user_id, name),
+            )
+    return new
+
+
+@timed(DB_SECONDS)
+def remove_group_member(chat_id: int, user_id: int) -> bool:
+    """Opt a user out of a group's ranking; returns whether they were a member."""
+    with closing(sqlite3.connect(DB_FILE)) as conn:
+        with conn:
+            cur = conn.execute(
+                "DELETE FROM group_members WHERE chat_id = ? AND user_id = ?", (chat_id, user_id)
+            )
+    return cur.rowcount > 0
+
+
+def _period_ends(rows: List[Tuple[dt.date, float]]) -> Tuple:
+    if not rows:
+        return None, None, None, None
+    return (*rows[0], *rows[-1])
+
+
+@timed(DB_SECONDS)
+def get_period_ends(chat_id: int, start: dt.date, end: dt.date) -> List[Tuple]:
+    """(user_id, name, first_date, first_weight, last_date, last_weight) of a group's members.
+
+    First and last are the member's first and last entries between ``start``
+    and ``end``; all four are None for members without entries there.
+    """
+    bounds = (start.isoformat(), end.isoformat())
+    # Bare columns: with MIN()/MAX(), ``weight`` comes from that row
+    ends = """
+        SELECT w.user_id, {agg}(w.date) AS date, w.weight FROM weights w
+        JOIN group_members g ON g.user_id = w.user_id AND g.chat_id = ?
+        WHERE w.date BETWEEN ? AND ? GROUP BY w.user_id
+    """
+    with closing(sqlite3.connect(DB_FILE)) as conn:
+        cutoff = _archive_cutoff()
+        if cutoff is not None and start < cutoff:
+            # Periods reaching into the archive are read member by member
+            members = conn.execute(
+                "SELECT user_id, name FROM group_members WHERE chat_id = ?", (chat_id,)
+            ).fetchall()
+            return [(uid, name, *_period_ends(_read_weights(conn, uid, start, end))) for uid, name in members]
+        rows = conn.execute(
+            f"""
+            SELECT g.user_id, g.name, f.date, f.weight, l.date, l.weight
+            FROM group_members g
+            LEFT JOIN ({ends.format(agg="MIN")}) f ON f.user_id = g.user_id
+            LEFT JOIN ({ends.format(agg="MAX")}) l ON l.user_id = g.user_id
+            WHERE g.chat_id = ?
+            """,
+            (chat_id, *bounds, chat_id, *bounds, chat_id),
+        ).fetchall()
+    return [
+        (uid, name, f and dt.date.fromisoformat(f), fw, l and dt.date.fromisoformat(l), lw)
+        for uid, name, f, fw, l, lw in rows
+    ]
+
+
+@timed(DB_SECONDS)
+def get_user_period_ends(user_id: int, start: dt.date, end: dt.date) -> Tuple:
+    """(first_date, first_weight, last_date, last_weight) of a user between ``start`` and ``end``."""
+    with closing(sqlite3.connect(DB_FILE)) as conn:
+        return _period_ends(_read_weights(conn, user_id, start, end))
+
+
+@timed(DB_SECONDS)
 def save_user_language(user_id: int, language_code: str) -> None:
     """Save user's language preference."""
+    _upsert_preference(user_id, "language_code", language_code)
+
+
+@timed(DB_SECONDS)
+def save_user_silenced(user_id: int, silenced: bool) -> None:
+    """Save whether the user has silenced the morning reminder."""
+    _upsert_preference(user_id, "silenced", int(silenced))
+
+
+@timed(DB_SECONDS)
+def save_user_activity(user_id: int, date: dt.date) -> None:
+    """Save the last day the user interacted with the bot."""
+    _upsert_preference(user_id, "last_active", date.isoformat())
+
+
+@timed(DB_SECONDS)
+def save_user_goal(user_id: int, goal_weight: Optional[float]) -> None:
+    """Save the user's goal weight (None clears it)."""
+    _upsert_preference(user_id, "goal_weight", goal_weight)
+
+
+def _upsert_preference(user_id: int, column: str, value) -> None:
+    """Set one user_preferences column, keeping the others."""
     with closing(sqlite3.connect(DB_FILE)) as conn:
         conn.execute(
-            "REPLACE INTO user_preferences (user_id, language_code) VALUES (?, ?)",
-            (user_id, language_code),
+            f"INSERT INTO user_preferences (user_id, {column}) VALUES (?, ?) "
+            f"ON CONFLICT(user_id) DO UPDATE SET {column} = excluded.{column}",
+            (user_id, value),
         )
         conn.commit()
 
 
+@timed(DB_SECONDS)
+def get_user_profiles(user_ids: Optional[Iterable[int]] = None) -> List[Tuple[int, str, int, Optional[str], Optional[float]]]:
+    """Return (user_id, language_code, silenced, last_active, goal_weight) rows.
+
+    Returns every stored profile when ``user_ids`` is None.
+    """
+    query = "SELECT user_id, language_code, silenced, last_active, goal_weight FROM user_preferences"
+    with closing(sqlite3.connect(DB_FILE)) as conn:
+        if user_ids is None:
+            return conn.execute(query).fetchall()
+        ids = list(user_ids)
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        return conn.execute(f"{query} WHERE user_id IN ({placeholders})", ids).fetchall()
+
+
+@timed(DB_SECONDS)
 def get_user_language(user_id: int) -> str:
     """Get user's language preference, defaults to 'es'."""
     with closing(sqlite3.connect(DB_FILE)) as conn:
@@ -0,0 +1,45 @@
+"""Series downsampling for charts (Largest-Triangle-Three-Buckets)."""
+
+from typing import Tuple
+
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Downsample a series to ``n_out`` points, keeping its visual shape.
+
+    Implements Largest-Triangle-Three-Buckets: the first and last points are
+    kept, the rest is split into ``n_out - 2`` buckets and from each bucket
+    the point forming the largest triangle with the previously selected
+    point and the average of the next bucket is kept. Bucket averages are
+    computed for all buckets at once; the per-bucket selection is vectorized
+    over the bucket's points. ``x`` must be sorted.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    # Bucket edges over the interior points [1, n-1)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    starts, ends = edges[:-1], edges[1:]
+
+    # Average point of every bucket, plus the last point as the final "next bucket"
+    counts = ends - starts
+    avg_x = np.append(np.add.reduceat(x[1:n - 1], starts - 1) / counts, x[-1])
+    avg_y = np.append(np.add.reduceat(y[1:n - 1], starts - 1) / counts, y[-1])
+
+    selected = np.empty(n_out, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    prev = 0
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        px, py = x[prev], y[prev]
+        nx, ny = avg_x[i + 1], avg_y[i + 1]
+        bx, by = x[start:end], y[start:end]
+        # Twice the triangle area; the constant factor doesn't change the argmax
+        area = np.abs((px - nx) * (by - py) - (px - bx) * (ny - py))
+        prev = start + int(np.argmax(area))
+        selected[i + 1] = prev
+    return x[selected], y[selected]
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Streaming export of weight history to CSV or a compact columnar file.
+
+Rows are read from a single database cursor in batches and written as they
+arrive, so exports never hold the whole history in memory. The columnar
+format is Parquet when pyarrow is installed; otherwise it falls back to a
+gzip-compressed CSV.
+
+Usage:
+    python exporter.py --user 123456 --format csv --output history.csv
+    python exporter.py --all --format columnar --output all.parquet
+"""
+
+import argparse
+import csv
+import gzip
+import importlib.util
+import io
+import sys
+from typing import Iterator, List, Optional, Tuple
+
+# pyarrow is only imported when a Parquet export is written
+PYARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+from config import EXPORT_BATCH_SIZE
+from database import iter_weight_rows
+
+HEADER = ("user_id", "date", "weight")
+Batch = List[Tuple[int, str, float]]
+
+
+def columnar_extension() -> str:
+    """File extension of the columnar export available in this install."""
+    return ".parquet" if PYARROW_AVAILABLE else ".csv.gz"
+
+
+def write_csv(batches: Iterator[Batch], out) -> int:
+    """Write batches to a text stream as CSV; returns the row count."""
+    writer = csv.writer(out)
+    writer.writerow(HEADER)
+    rows = 0
+    for batch in batches:
+        writer.writerows(batch)
+        rows += len(batch)
+    return rows
+
+
+def write_columnar(batches: Iterator[Batch], path: str) -> int:
+    """Write batches to ``path`` as Parquet (one row group per batch) or gzip CSV."""
+    if not PYARROW_AVAILABLE:
+        with gzip.open(path, "wt", newline="", encoding="utf-8") as out:
+            return write_csv(batches, out)
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([("user_id", pa.int64()), ("date", pa.date32()), ("weight", pa.float64())])
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for batch in batches:
+            user_ids, dates, weights = zip(*batch)
+            table = pa.table({
+                "user_id": pa.array(user_ids, pa.int64()),
+                "date": pa.array(dates, pa.string()).cast(pa.date32()),
+                "weight": pa.array(weights, pa.float64()),
+            }, schema=schema)
+            writer.write_table(table)
+            rows += len(batch)
+    return rows
+
+
+def export_history(path: str, fmt: str, user_id: Optional[int] = None,
+                   batch_size: int = EXPORT_BATCH_SIZE) -> int:
+    """Export one user's history (or everyone's when ``user_id`` is None) to ``path``.
+
+    ``fmt`` is "csv" or "columnar". Returns the number of rows written.
+    """
+    batches = iter_weight_rows(user_id, batch_size)
+    if fmt == "columnar":
+        return write_columnar(batches, path)
+    with open(path, "w", newline="", encoding="utf-8") as out:
+        return write_csv(batches, out)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Export weight history")
+    who = parser.add_mutually_exclusive_group(required=True)
+    who.add_argument("--user", type=int, help="Telegram user id to export")
+    who.add_argument("--all", action="store_true", help="export every user")
+    parser.add_argument("--format", choices=("csv", "columnar"), default="csv")
+    parser.add_argument("--output", help="output file (CSV goes to stdout if omitted)")
+    args = parser.parse_args()
+
+    user_id = None if args.all else args.user
+    if args.output:
+        rows = export_history(args.output, args.format, user_id)
+    elif args.format == "csv":
+        out = io.TextIOWrapper(sys.stdout.buffer, newline="", encoding="utf-8")
+        rows = write_csv(iter_weight_rows(user_id, EXPORT_BATCH_SIZE), out)
+        out.flush()
+        out.detach()
+    else:
+        parser.error("--format columnar needs --output")
+    print(f"✅ Exported {rows} rows", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,58 @@
 """Command and message handlers for the Telegram Weight Tracker Bot."""
 
+import asyncio
 import datetime as dt
-import io
-from typing import List, Tuple
-
-import matplotlib.pyplot as plt
-from telegram import InputFile, Update
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, InputFile, Update
 from telegram.ext import CallbackContext
 
-from config import TZ
-from database import save_weight, get_monthly_weights, get_weekly_weights, get_daily_weights, get_weights, save_user_language
+from config import (
+    TZ, IMPORT_PROGRESS_SECONDS, ADMIN_IDS, CHART_MAX_POINTS, DAILY_AGGREGATION, PROFILE_UPDATES,
+    LEADERBOARD_DAYS, LEADERBOARD_MAX_DAYS, EXPORT_MAX_BYTES,
+)
+from database import (
+    save_reading, save_weight, delete_weight, get_monthly_weights, get_weekly_weights, get_daily_weights, get_weights, get_trend,
+    get_streak,
+)
 from backup_manager import auto_backup
-from lang.strings import get_strings
+from admission import chart_admission
+from charts import render_diario_chart, render_average_chart, render_history_chart
+from exporter import columnar_extension, export_history
+from importer import ImportFormatError, detect_format, import_file, parse_date, MIN_DATE, MIN_WEIGHT, MAX_WEIGHT
+from metrics import (
+    HANDLER_SECONDS, JOB_SECONDS, DB_SECONDS, RENDER_SECONDS, TELEGRAM_SECONDS, BACKUP_SECONDS, timed,
+)
+from profiles import get_profile, get_user_strings, set_goal, set_language, set_silenced, touch
+import leaderboard
+import profiling
+from update_processor import PerUserUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+def _user_strings(update: Update):
+    """Strings for the sender's cached language; also records their activity."""
+    user = update.effective_user
+    # Before touch(), whose row would otherwise hide the Telegram language fallback
+    strings = get_user_strings(user.id, user.language_code)
+    touch(user.id, dt.datetime.now(TZ).date())
+    return strings
 
 
+@timed(HANDLER_SECONDS)
 async def start(update: Update, context: CallbackContext) -> None:
     """Handle the /start command."""
     user = update.effective_user
-    strings = get_strings(user.language_code)
-    
-    # Save user's language preference
-    save_user_language(user.id, user.language_code or 'es')
+
+    # Save user's language preference (only written when it changed)
+    set_language(user.id, user.language_code or 'es')
+    strings = _user_strings(update)
     
     # Register scheduled jobs for this user
     from jobs import register_jobs
@@ -31,52 +63,49 @@ async def start(update: Update, context: CallbackContext) -> None:
     )
 
 
+@timed(HANDLER_SECONDS)
 async def help_cmd(update: Update, context: CallbackContext) -> None:
     """Handle the /help command."""
-    strings = get_strings(update.effective_user.language_code)
+    strings = _user_strings(update)
     await update.message.reply_text(strings["help_message"])
 
 
+def _submit_chart(user_id: int, kind: str, data, send):
+    """Render and upload a chart in the background, through the admission layer.
+
+    Identical requests (same user, kind and data) still in flight share one
+    render and upload, and the user's next updates don't wait for it.
+    """
+    return chart_admission.submit((user_id, kind, tuple(data)), send)
+
+
 async def send_diario_chart(update: Update, user_id: int):
-    strings = get_strings(update.effective_user.language_code)
+    strings = _user_strings(update)
     today = dt.datetime.now(TZ).date()
     start_date = today - dt.timedelta(days=5)
     weights_data = get_weights(user_id, start_date, today)
     if len(weights_data) >= 2:
         dates = [d for d, _ in weights_data]
         vals = [w for _, w in weights_data]
-        try:
-            import matplotlib.dates as mdates
-            fig, ax = plt.subplots(figsize=(10, 6))
-            dates_mpl = [mdates.date2num(d) for d in dates]
-            ax.plot(dates_mpl, vals, marker="o", linewidth=2, markersize=6)
-            ax.set_title("Evolución peso - Últimos 6 días", fontsize=14, fontweight='bold')
-            ax.set_ylabel("Kg", fontsize=12)
-            ax.set_xlabel("Fecha", fontsize=12)
-            ax.grid(True, alpha=0.3)
-            ax.tick_params(axis='x', rotation=45)
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-            ax.xaxis.set_major_locator(mdates.DayLocator())
-            for i, (date, weight) in enumerate(zip(dates_mpl, vals)):
-                ax.annotate(f'{weight:.1f}', (date, weight), 
-                           textcoords="offset points", xytext=(0,10), 
-                           ha='center', fontsize=10)
-            plt.tight_layout()
-            buf = io.BytesIO()
-            fig.savefig(buf, format="png", dpi=150, bbox_inches='tight')
-            plt.close(fig)
-            buf.seek(0)
-            await update.message.reply_photo(
-                InputFile(buf, "peso_diario.png"),
-                caption=strings["diario_chart_caption"]
-            )
-        except Exception as e:
-            print(f"[ERROR] Error generating or sending the chart: {e}")
+
+        async def send():
+            try:
+                # Render off the event loop so other users' updates keep flowing
+                buf = await asyncio.to_thread(render_diario_chart, dates, vals)
+                await update.effective_message.reply_photo(
+                    InputFile(buf, "peso_diario.png"),
+                    caption=strings["diario_chart_caption"]
+                )
+            except Exception as e:
+                logger.error("Error generating or sending the daily chart: %s", e, extra={"user_id": user_id})
+
+        return _submit_chart(user_id, "diario", weights_data, send)
 
 
 async def _register_weight_arg(update: Update, context: CallbackContext, arg: str) -> None:
     """Register weight from command argument or user input."""
-    strings = get_strings(update.effective_user.language_code)
+    from outliers import check as check_outlier
+    strings = _user_strings(update)
     try:
         weight = float(arg.replace(",", "."))
     except ValueError:
@@ -84,8 +113,36 @@ async def _register_weight_arg(update: Update, context: CallbackContext, arg: st
         return
     
     user_id = update.effective_user.id
-    today = dt.datetime.now(TZ).date()
-    save_weight(user_id, today, weight)
+    now = dt.datetime.now(TZ)
+    # Values far from the recent ones (typos like 724 for 72.4) need a confirmation;
+    # the pending flags stay set so the user can also just send the right value
+    suspicion = check_outlier(get_trend(user_id), now.date(), weight)
+    if suspicion is not None:
+        # The buttons carry the reading time, so a late confirmation keeps it
+        buttons = [InlineKeyboardButton(
+            strings["weight_confirm_button"].format(weight=weight),
+            callback_data=f"peso:ok:{int(now.timestamp())}:{weight}",
+        )]
+        if suspicion.suggestion is not None:
+            buttons.append(InlineKeyboardButton(
+                strings["weight_confirm_button"].format(weight=suspicion.suggestion),
+                callback_data=f"peso:ok:{int(now.timestamp())}:{suspicion.suggestion}",
+            ))
+        buttons.append(InlineKeyboardButton(strings["weight_cancel_button"], callback_data="peso:no"))
+        await update.message.reply_text(
+            strings["weight_suspicious"].format(weight=weight, median=suspicion.median),
+            reply_markup=InlineKeyboardMarkup([buttons]),
+        )
+        return
+
+    await _store_weight(update, context, now, weight)
+
+
+async def _store_weight(update: Update, context: CallbackContext, at: dt.datetime, weight: float) -> None:
+    """Save a reading, clear the pending prompts and answer with the daily chart."""
+    strings = _user_strings(update)
+    user_id = update.effective_user.id
+    daily, readings = save_reading(user_id, at, weight)
     context.user_data["awaiting_weight"] = False
     # Clear chat_data flag if exists
     if hasattr(context, "chat_data") and context.chat_data is not None:
@@ -95,17 +152,42 @@ async def _register_weight_arg(update: Update, context: CallbackContext, arg: st
         reminder_map = context.bot_data.get("reminder_messages", {})
         if user_id in reminder_map:
             reminder_map.pop(user_id, None)
-    # Create backup after saving weight
-    auto_backup()
+    # Create backup after saving weight (network I/O, keep it off the event loop)
+    await asyncio.to_thread(auto_backup)
     
-    await update.message.reply_text(strings["weight_registered"].format(weight=weight))
+    reply = strings["weight_registered"].format(weight=weight)
+    if readings > 1:
+        reply += "\n" + strings["weight_daily_value"].format(
+            count=readings, policy=strings[f"aggregation_{DAILY_AGGREGATION}"], weight=daily
+        )
+    await update.effective_message.reply_text(reply)
     # Send daily chart after registering weight
     await send_diario_chart(update, user_id)
 
 
+@timed(HANDLER_SECONDS)
+async def confirm_weight_callback(update: Update, context: CallbackContext) -> None:
+    """Handle the buttons of the suspicious weight confirmation."""
+    strings = _user_strings(update)
+    query = update.callback_query
+    await query.answer()
+    await query.edit_message_reply_markup(reply_markup=None)
+    parts = query.data.split(":")
+    if parts[1] != "ok":
+        await query.message.reply_text(strings["weight_cancelled"])
+        return
+    try:
+        at = dt.datetime.fromtimestamp(int(parts[2]), TZ)
+        weight = float(parts[3])
+    except (IndexError, ValueError):
+        return
+    await _store_weight(update, context, at, weight)
+
+
+@timed(HANDLER_SECONDS)
 async def peso_cmd(update: Update, context: CallbackContext) -> None:
     """Handle the /peso command."""
-    strings = get_strings(update.effective_user.language_code)
+    strings = _user_strings(update)
     # If a number is provided, register directly
     if context.args:
         await _register_weight_arg(update, context, context.args[0])
@@ -115,26 +197,140 @@ async def peso_cmd(update: Update, context: CallbackContext) -> None:
         context.user_data["awaiting_weight"] = True
 
 
+@timed(HANDLER_SECONDS)
+async def importar_cmd(update: Update, context: CallbackContext) -> None:
+    """Handle the /importar command: wait for a CSV/JSON history document."""
+    strings = _user_strings(update)
+    context.user_data["awaiting_import"] = True
+    await update.message.reply_text(strings["import_ask"])
+
+
+@timed(HANDLER_SECONDS)
+async def document_listener(update: Update, context: CallbackContext) -> None:
+    """Import an uploaded weight history sent after /importar or captioned /importar."""
+    message = update.message
+    caption = (message.caption or "").strip().lower()
+    if not (context.user_data.get("awaiting_import") or caption.startswith("/importar")):
+        return
+    context.user_data["awaiting_import"] = False
+
+    strings = _user_strings(update)
+    document = message.document
+    try:
+        detect_format(document.file_name)
+    except ImportFormatError:
+        await message.reply_text(strings["import_unsupported"])
+        return
+
+    status = await message.reply_text(strings["import_started"])
+    loop = asyncio.get_running_loop()
+    last_report = time.monotonic()
+    edits = []
+
+    def progress(result) -> None:
+        # Called from the import thread after every chunk; throttle the edits
+        nonlocal last_report
+        now = time.monotonic()
+        if now - last_report < IMPORT_PROGRESS_SECONDS:
+            return
+        last_report = now
+        text = strings["import_progress"].format(rows=result.imported)
+        edits.append(asyncio.run_coroutine_threadsafe(status.edit_text(text), loop))
+
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(document.file_name)[1])
+    os.close(fd)
+    try:
+        tg_file = await document.get_file()
+        await tg_file.download_to_drive(path)
+        today = dt.datetime.now(TZ).date()
+        result = await asyncio.to_thread(
+            import_file, update.effective_user.id, path, document.file_name, today, progress
+        )
+    except Exception as e:
+        if not isinstance(e, ImportFormatError):
+            logger.exception("Import failed", extra={"user_id": update.effective_user.id})
+        await asyncio.gather(*(asyncio.wrap_future(f) for f in edits), return_exceptions=True)
+        await status.edit_text(strings["import_failed"])
+        return
+    finally:
+        os.unlink(path)
+
+    # Let pending progress edits land before the final summary
+    await asyncio.gather(*(asyncio.wrap_future(f) for f in edits), return_exceptions=True)
+    lines = [strings["import_done"].format(imported=result.imported, skipped=result.skipped)]
+    for row, reason, value in result.errors:
+        lines.append(strings["import_error_line"].format(
+            row=row, reason=strings[f"import_error_{reason}"], value=value
+        ))
+    await status.edit_text("\n".join(lines))
+
+
+@timed(HANDLER_SECONDS)
+async def exportar_cmd(update: Update, context: CallbackContext) -> None:
+    """Handle /exportar [csv|columnar] [todos]: send the history as a document."""
+    strings = _user_strings(update)
+    args = [a.lower() for a in (context.args or [])]
+    fmt = "columnar" if any(a in ("columnar", "parquet", "col") for a in args) else "csv"
+    user_id = update.effective_user.id
+    export_all = any(a in ("todos", "all") for a in args)
+    if export_all and user_id not in ADMIN_IDS:
+        await update.message.reply_text(strings["admin_only"])
+        return
+
+    suffix = columnar_extension() if fmt == "columnar" else ".csv"
+    filename = f"pesos_{'todos' if export_all else user_id}{suffix}"
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        rows = await asyncio.to_thread(export_history, path, fmt, None if export_all else user_id)
+        if not rows:
+            await update.message.reply_text(strings["export_empty"])
+            return
+        # The export is written batch by batch, but InputFile reads the file into memory
+        # to upload it, so the upload is capped at EXPORT_MAX_BYTES (gzipping a large CSV)
+        if fmt == "csv" and os.path.getsize(path) > EXPORT_MAX_BYTES:
+            await asyncio.to_thread(_gzip_file, path)
+            filename += ".gz"
+        if os.path.getsize(path) > EXPORT_MAX_BYTES:
+            await update.message.reply_text(strings["export_too_large"])
+            return
+        with open(path, "rb") as f:
+            await update.message.reply_document(
+                InputFile(f, filename),
+                caption=strings["export_caption"].format(rows=rows),
+            )
+    finally:
+        os.unlink(path)
+
+
+def _gzip_file(path: str) -> None:
+    """Compress ``path`` in place with gzip."""
+    with open(path, "rb") as src, gzip.open(path + ".gz", "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(path + ".gz", path)
+
+
+@timed(HANDLER_SECONDS)
 async def silenciar_cmd(update: Update, context: CallbackContext) -> None:
     """Disable morning reminders for this user."""
-    strings = get_strings(update.effective_user.language_code)
+    strings = _user_strings(update)
     user_id = update.effective_user.id
-    # Use a set of silenced user IDs stored in bot_data
-    silenced = context.bot_data.setdefault("silenced_users", set())
-    silenced.add(user_id)
+    set_silenced(user_id, True)
     await update.message.reply_text(strings.get("reminders_off", "🔕 Recordatorios desactivados. No te enviaré el recordatorio matutino."))
 
 
+@timed(HANDLER_SECONDS)
 async def notificar_cmd(update: Update, context: CallbackContext) -> None:
     """Enable morning reminders for this user."""
-    strings = get_strings(update.effective_user.language_code)
+    strings = _user_strings(update)
     user_id = update.effective_user.id
-    silenced = context.bot_data.setdefault("silenced_users", set())
-    if user_id in silenced:
-        silenced.remove(user_id)
+    set_silenced(user_id, False)
+    # Older versions kept silenced users in bot_data
+    context.bot_data.get("silenced_users", set()).discard(user_id)
     await update.message.reply_text(strings.get("reminders_on", "🔔 Recordatorios activados. Volveré a enviar el recordatorio matutino."))
 
 
+@timed(HANDLER_SECONDS)
 async def numeric_listener(update: Update, context: CallbackContext) -> None:
     """Handle numeric input from users."""
     text = update.message.text.strip()
@@ -161,64 +357,53 @@ async def numeric_listener(update: Update, context: CallbackContext) -> None:
 
 
 async def send_mensual_chart(update: Update, user_id: int):
-    strings = get_strings(update.effective_user.language_code)
+    strings = _user_strings(update)
     monthly_data = get_monthly_weights(user_id)
     # Solo graficar meses con datos
     labels = [m for m, w in monthly_data if w is not None]
     values = [w for m, w in monthly_data if w is not None]
     if len(values) >= 2:
-        try:
-            fig, ax = plt.subplots(figsize=(10, 6))
-            ax.plot(labels[::-1], values[::-1], marker="o", linewidth=2, markersize=6)
-            ax.set_title("Media mensual de peso - Últimos 6 meses", fontsize=14, fontweight='bold')
-            ax.set_ylabel("Kg", fontsize=12)
-            ax.set_xlabel("Mes", fontsize=12)
-            ax.grid(True, alpha=0.3)
-            for i, (label, weight) in enumerate(zip(labels[::-1], values[::-1])):
-                ax.annotate(f'{weight:.1f}', (i, weight), textcoords="offset points", xytext=(0,10), ha='center', fontsize=10)
-            plt.tight_layout()
-            buf = io.BytesIO()
-            fig.savefig(buf, format="png", dpi=150, bbox_inches='tight')
-            plt.close(fig)
-            buf.seek(0)
-            await update.message.reply_photo(
-                InputFile(buf, "peso_mensual.png"),
-                caption=strings["mensual_chart_caption"]
-            )
-        except Exception as e:
-            print(f"[ERROR] Error generando o enviando el gráfico mensual: {e}")
+        async def send():
+            try:
+                buf = await asyncio.to_thread(
+                    render_average_chart, labels[::-1], values[::-1],
+                    "Media mensual de peso - Últimos 6 meses", "Mes",
+                )
+                await update.message.reply_photo(
+                    InputFile(buf, "peso_mensual.png"),
+                    caption=strings["mensual_chart_caption"]
+                )
+            except Exception as e:
+                logger.error("Error generating or sending the monthly chart: %s", e, extra={"user_id": user_id})
+
+        return _submit_chart(user_id, "mensual", monthly_data, send)
 
 async def send_semanal_chart(update: Update, user_id: int):
-    strings = get_strings(update.effective_user.language_code)
+    strings = _user_strings(update)
     weekly_data = get_weekly_weights(user_id)
     # Only plot weeks with data
     labels = [s for s, w in weekly_data if w is not None]
     values = [w for s, w in weekly_data if w is not None]
     if len(values) >= 2:
-        try:
-            fig, ax = plt.subplots(figsize=(10, 6))
-            ax.plot(labels[::-1], values[::-1], marker="o", linewidth=2, markersize=6)
-            ax.set_title("Media semanal de peso - Últimas 4 semanas", fontsize=14, fontweight='bold')
-            ax.set_ylabel("Kg", fontsize=12)
-            ax.set_xlabel("Semana", fontsize=12)
-            ax.grid(True, alpha=0.3)
-            for i, (label, weight) in enumerate(zip(labels[::-1], values[::-1])):
-                ax.annotate(f'{weight:.1f}', (i, weight), textcoords="offset points", xytext=(0,10), ha='center', fontsize=10)
-            plt.tight_layout()
-            buf = io.BytesIO()
-            fig.savefig(buf, format="png", dpi=150, bbox_inches='tight')
-            plt.close(fig)
-            buf.seek(0)
-            await update.message.reply_photo(
-                InputFile(buf, "peso_semanal.png"),
-                caption=strings["semanal_chart_caption"]
-            )
-        except Exception as e:
-            print(f"[ERROR] Error generating or sending the weekly chart: {e}")
-
-
+        async def send():
+            try:
+                buf = await asyncio.to_thread(
+                    render_average_chart, labels[::-1], values[::-1],
+                    "Media semanal de peso - Últimas 4 semanas", "Semana",
+                )
+                await update.message.reply_photo(
+                    InputFile(buf, "peso_semanal.png"),
+                    caption=strings["semanal_chart_caption"]
+                )
+            except Exception as e:
+                logger.error("Error generating or sending the weekly chart: %s", e, extra={"user_id": user_id})
+
+        return _submit_chart(user_id, "semanal", weekly_data, send)
+
+
+@timed(HANDLER_SECONDS)
 async def mensual_cmd(update: Update, context: CallbackContext) -> None:
-    strings = get_strings(update.effective_user.language_code)
+    strings = _user_strings(update)
     user_id = update.effective_user.id
     monthly_data = get_monthly_weights(user_id)
     lines = [strings["mensual_header"]]
@@ -229,8 +414,9 @@ async def mensual_cmd(update: Update, context: CallbackContext) -> None:
     # Enviar gráfico mensual
     await send_mensual_chart(update, user_id)
 
+@timed(HANDLER_SECONDS)
 async def semanal_cmd(update: Update, context: CallbackContext) -> None:
-    strings = get_strings(update.effective_user.language_code)
+    strings = _user_strings(update)
     user_id = update.effective_user.id
     weekly_data = get_weekly_weights(user_id)
     lines = [strings["semanal_header"]]
@@ -242,35 +428,391 @@ async def semanal_cmd(update: Update, context: CallbackContext) -> None:
     await send_semanal_chart(update, user_id)
 
 
+@timed(HANDLER_SECONDS)
 async def diario_cmd(update: Update, context: CallbackContext) -> None:
-    strings = get_strings(update.effective_user.language_code)
-    print("[DEBUG] Entering diario_cmd")
+    strings = _user_strings(update)
     user_id = update.effective_user.id
     today = dt.datetime.now(TZ).date()
-    print(f"[DEBUG] user_id: {user_id}, today: {today}")
-    # Get data for the last 6 days
+    # Get data for the last 6 days (one range read, looked up per day below)
     start_date = today - dt.timedelta(days=5)
-    print(f"[DEBUG] start_date: {start_date}")
-    weights_data = get_weights(user_id, start_date, today)
-    print(f"[DEBUG] weights_data: {weights_data}")
+    by_day = dict(get_weights(user_id, start_date, today))
+    logger.debug("diario range %s..%s: %d entries", start_date, today, len(by_day), extra={"user_id": user_id})
     # Prepare text response
     lines = [strings["diario_header"]]
     for i in range(6):
         d = today - dt.timedelta(days=i)
-        ws = get_weights(user_id, d, d)
-        print(f"[DEBUG] Day: {d}, ws: {ws}")
-        weight_text = f"{ws[0][1]:.1f} kg" if ws else strings["no_data"]
+        weight_text = f"{by_day[d]:.1f} kg" if d in by_day else strings["no_data"]
         lines.append(f"{d.strftime('%d/%m')}: {weight_text}")
-    print(f"[DEBUG] lines: {lines}")
     # Send text first
     try:
         await update.message.reply_text("\n".join(lines))
-        print("[DEBUG] Text message sent")
     except Exception as e:
-        print(f"[ERROR] Error sending text message: {e}")
+        logger.error("Error sending the diario text: %s", e, extra={"user_id": user_id})
     # Send daily chart
     await send_diario_chart(update, user_id) 
 
+def _render_history(weights_data, title: str):
+    """Downsample a long series to CHART_MAX_POINTS and render it."""
+    from downsample import lttb
+    import matplotlib.dates as mdates
+    days = [mdates.date2num(d) for d, _ in weights_data]
+    vals = [w for _, w in weights_data]
+    days, vals = lttb(days, vals, CHART_MAX_POINTS)
+    return render_history_chart(days, vals, title)
+
+
+@timed(HANDLER_SECONDS)
+async def historial_cmd(update: Update, context: CallbackContext) -> None:
+    """Handle /historial [desde] [hasta]: chart any date range (whole history by default)."""
+    strings = _user_strings(update)
+    user_id = update.effective_user.id
+    today = dt.datetime.now(TZ).date()
+    args = context.args or []
+    try:
+        start_date = parse_date(args[0]) if args else MIN_DATE
+        end_date = parse_date(args[1]) if len(args) > 1 else today
+    except ValueError:
+        await update.message.reply_text(strings["historial_usage"])
+        return
+    if start_date > end_date:
+        start_date, end_date = end_date, start_date
+
+    weights_data = get_weights(user_id, start_date, end_date)
+    if not weights_data:
+        await update.message.reply_text(strings["historial_empty"])
+        return
+
+    vals = [w for _, w in weights_data]
+    first_day, last_day = weights_data[0][0], weights_data[-1][0]
+    await update.message.reply_text(strings["historial_summary"].format(
+        start=first_day.strftime('%d/%m/%Y'),
+        end=last_day.strftime('%d/%m/%Y'),
+        count=len(vals),
+        first=vals[0],
+        last=vals[-1],
+        min=min(vals),
+        max=max(vals),
+    ))
+    if len(weights_data) >= 2:
+        async def send():
+            try:
+                title = f"{first_day.strftime('%d/%m/%Y')} – {last_day.strftime('%d/%m/%Y')}"
+                buf = await asyncio.to_thread(_render_history, weights_data, title)
+                await update.message.reply_photo(
+                    InputFile(buf, "peso_historial.png"),
+                    caption=strings["historial_chart_caption"]
+                )
+            except Exception as e:
+                logger.error("Error generating or sending the history chart: %s", e, extra={"user_id": user_id})
+
+        _submit_chart(user_id, "historial", weights_data, send)
+
+
+@timed(HANDLER_SECONDS)
+async def tendencia_cmd(update: Update, context: CallbackContext) -> None:
+    """Handle /tendencia: smoothed weight, weekly rate and goal projection."""
+    from trend import projection
+    strings = _user_strings(update)
+    user_id = update.effective_user.id
+    state = get_trend(user_id)
+    if state is None or state.weekly_rate is None:
+        await update.message.reply_text(strings["tendencia_no_data"])
+        return
+
+    lines = [strings["tendencia_message"].format(
+        trend=state.trend,
+        rate=state.weekly_rate,
+        date=state.last_date.strftime('%d/%m/%Y'),
+    )]
+    goal = get_profile(user_id).goal_weight
+    if goal is not None:
+        eta = projection(state, goal)
+        if eta == state.last_date:
+            lines.append(strings["tendencia_goal_reached"].format(goal=goal))
+        elif eta is not None:
+            lines.append(strings["tendencia_goal_eta"].format(goal=goal, date=eta.strftime('%d/%m/%Y')))
+        else:
+            lines.append(strings["tendencia_goal_off_track"].format(goal=goal))
+    else:
+        lines.append(strings["tendencia_no_goal"])
+    await update.message.reply_text("\n".join(lines))
+
+
+@timed(HANDLER_SECONDS)
+async def objetivo_cmd(update: Update, context: CallbackContext) -> None:
+    """Handle /objetivo [kg|borrar]: show, set or clear the goal weight."""
+    strings = _user_strings(update)
+    user_id = update.effective_user.id
+    if not context.args:
+        goal = get_profile(user_id).goal_weight
+        key = "objetivo_current" if goal is not None else "objetivo_usage"
+        await update.message.reply_text(strings[key].format(goal=goal))
+        return
+
+    arg = context.args[0].lower()
+    if arg in ("borrar", "clear"):
+        set_goal(user_id, None)
+        await update.message.reply_text(strings["objetivo_cleared"])
+        return
+    try:
+        goal = float(arg.replace(",", "."))
+    except ValueError:
+        await update.message.reply_text(strings["objetivo_usage"])
+        return
+    if not MIN_WEIGHT <= goal <= MAX_WEIGHT:
+        await update.message.reply_text(strings["objetivo_usage"])
+        return
+    set_goal(user_id, goal)
+    await update.message.reply_text(strings["objetivo_saved"].format(goal=goal))
+
+
+@timed(HANDLER_SECONDS)
+async def racha_cmd(update: Update, context: CallbackContext) -> None:
+    """Handle /racha: logging streaks, this week's adherence and missed days."""
+    from streaks import week_start
+    strings = _user_strings(update)
+    state = get_streak(update.effective_user.id)
+    if state is None:
+        await update.message.reply_text(strings["racha_no_data"])
+        return
+    today = dt.datetime.now(TZ).date()
+    week = week_start(today)
+    await update.message.reply_text(strings["racha_message"].format(
+        current=state.current_streak(today),
+        longest=state.longest,
+        week_days=state.days_logged(week),
+        week_elapsed=today.weekday() + 1,
+        adherence=state.adherence(week, today) * 100,
+        last_week=state.adherence(week - dt.timedelta(days=7), today) * 100,
+        missed=state.missed_days(today),
+        since=state.first_date.strftime('%d/%m/%Y'),
+    ))
+
+
+REVIEW_MAX_ITEMS = 10
+
+
+@timed(HANDLER_SECONDS)
+async def revisar_cmd(update: Update, context: CallbackContext) -> None:
+    """Handle /revisar: scan the whole history for suspicious entries."""
+    from outliers import scan as scan_outliers
+    strings = _user_strings(update)
+    user_id = update.effective_user.id
+    today = dt.datetime.now(TZ).date()
+    weights_data = get_weights(user_id, MIN_DATE, today)
+    found = await asyncio.to_thread(
+        scan_outliers, [d for d, _ in weights_data], [w for _, w in weights_data]
+    )
+    if not found:
+        await update.message.reply_text(strings["revisar_clean"])
+        return
+
+    lines = [strings["revisar_header"].format(count=len(found))]
+    keyboard = []
+    for item in found[:REVIEW_MAX_ITEMS]:
+        day = item.date.strftime('%d/%m/%Y')
+        key = "revisar_line_suggestion" if item.suggestion is not None else "revisar_line"
+        lines.append(strings[key].format(date=day, weight=item.weight, median=item.median, suggestion=item.suggestion))
+        row = []
+        if item.suggestion is not None:
+            row.append(InlineKeyboardButton(
+                strings["revisar_fix_button"].format(date=day, weight=item.suggestion),
+                callback_data=f"revisar:fix:{item.date.toordinal()}:{item.weight}:{item.suggestion}",
+            ))
+        row.append(InlineKeyboardButton(
+            strings["revisar_delete_button"].format(date=day),
+            callback_data=f"revisar:del:{item.date.toordinal()}:{item.weight}",
+        ))
+        keyboard.append(row)
+    if len(found) > REVIEW_MAX_ITEMS:
+        lines.append(strings["revisar_more"].format(count=len(found) - REVIEW_MAX_ITEMS))
+    await update.message.reply_text("\n".join(lines), reply_markup=InlineKeyboardMarkup(keyboard))
+
+
+@timed(HANDLER_SECONDS)
+async def review_callback(update: Update, context: CallbackContext) -> None:
+    """Handle the fix/delete buttons of /revisar."""
+    strings = _user_strings(update)
+    query = update.callback_query
+    await query.answer()
+    user_id = update.effective_user.id
+    try:
+        _, action, ordinal, shown = query.data.split(":")[:4]
+        date = dt.date.fromordinal(int(ordinal))
+        shown = float(shown)
+    except ValueError:
+        return
+
+    # Buttons can be pressed long after the scan: only act on unchanged entries
+    current = get_weights(user_id, date, date)
+    day = date.strftime('%d/%m/%Y')
+    if not current or current[0][1] != shown:
+        await query.message.reply_text(strings["revisar_stale"].format(date=day))
+        return
+    if action == "fix":
+        weight = float(query.data.split(":")[4])
+        save_weight(user_id, date, weight)
+        reply = strings["revisar_fixed"].format(date=day, weight=weight)
+    else:
+        delete_weight(user_id, date)
+        reply = strings["revisar_deleted"].format(date=day)
+    await asyncio.to_thread(auto_backup)
+    await query.message.reply_text(reply)
+
+
+STATS_TOP = 5  # slowest entries listed per section in /stats
+_STATS_SECTIONS = (
+    ("Handlers", HANDLER_SECONDS),
+    ("Jobs", JOB_SECONDS),
+    ("DB", DB_SECONDS),
+    ("Render", RENDER_SECONDS),
+    ("Telegram", TELEGRAM_SECONDS),
+    ("Backup", BACKUP_SECONDS),
+)
+
+
+@timed(HANDLER_SECONDS)
+async def unirme_cmd(update: Update, context: CallbackContext) -> None:
+    """Handle /unirme in a group: join its /ranking."""
+    strings = _user_strings(update)
+    if update.effective_chat.type == "private":
+        await update.message.reply_text(strings["group_only"])
+        return
+    user = update.effective_user
+    if leaderboard.join(update.effective_chat.id, user.id, user.first_name):
+        await update.message.reply_text(strings["unirme_done"].format(name=user.first_name))
+    else:
+        await update.message.reply_text(strings["unirme_already"].format(name=user.first_name))
+
+
+@timed(HANDLER_SECONDS)
+async def salir_cmd(update: Update, context: CallbackContext) -> None:
+    """Handle /salir in a group: leave its /ranking."""
+    strings = _user_strings(update)
+    if update.effective_chat.type == "private":
+        await update.message.reply_text(strings["group_only"])
+        return
+    user = update.effective_user
+    if leaderboard.leave(update.effective_chat.id, user.id):
+        await update.message.reply_text(strings["salir_done"].format(name=user.first_name))
+    else:
+        await update.message.reply_text(strings["salir_not_member"].format(name=user.first_name))
+
+
+@timed(HANDLER_SECONDS)
+async def ranking_cmd(update: Update, context: CallbackContext) -> None:
+    """Handle /ranking [days] in a group: members who lost the most, relative to their weight."""
+    strings = _user_strings(update)
+    if update.effective_chat.type == "private":
+        await update.message.reply_text(strings["group_only"])
+        return
+    days = LEADERBOARD_DAYS
+    if context.args:
+        try:
+            days = int(context.args[0])
+        except ValueError:
+            days = 0
+        if not 1 <= days <= LEADERBOARD_MAX_DAYS:
+            await update.message.reply_text(strings["ranking_usage"].format(max_days=LEADERBOARD_MAX_DAYS))
+            return
+    rows = leaderboard.ranking(update.effective_chat.id, days, dt.datetime.now(TZ).date())
+    if not rows:
+        await update.message.reply_text(strings["ranking_empty"].format(days=days))
+        return
+    lines = [strings["ranking_title"].format(days=days)]
+    lines += [f"{i}. {name}: {change * 100:+.1f} %" for i, (_, name, change) in enumerate(rows, 1)]
+    await update.message.reply_text("\n".join(lines))
+
+
+@timed(HANDLER_SECONDS)
+async def stats_cmd(update: Update, context: CallbackContext) -> None:
+    """Handle /stats (admins only): slowest operations by total time, and queue waits."""
+    strings = _user_strings(update)
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text(strings["admin_only"])
+        return
+
+    lines = [strings["stats_title"]]
+    for title, histogram in _STATS_SECTIONS:
+        rows = histogram.summary()[:STATS_TOP]
+        if not rows:
+            continue
+        lines.append(f"\n{title}")
+        for labels, count, total, p95 in rows:
+            p95_text = f"≤{p95 * 1000:.0f} ms" if p95 != float("inf") else f">{histogram.bounds[-1]:g} s"
+            lines.append(f"  {labels[0]}: {count} · {total / count * 1000:.1f} ms · {p95_text}")
+
+    processor = context.application.update_processor
+    update_waits = processor.waits.snapshot() if isinstance(processor, PerUserUpdateProcessor) else {"p95": 0.0}
+    charts = chart_admission.snapshot()
+    lines.append("")
+    lines.append(strings["stats_queues"].format(
+        update_p95=update_waits["p95"] * 1000,
+        dropped=getattr(processor, "dropped", 0),
+        in_flight=charts["in_flight"],
+        coalesced=charts["coalesced"],
+        chart_p95=charts["wait"]["p95"] * 1000,
+    ))
+    await update.message.reply_text("\n".join(lines))
+
+
+@timed(HANDLER_SECONDS)
+async def perfil_cmd(update: Update, context: CallbackContext) -> None:
+    """Handle /perfil [n] [nomem] (admins only): profile the next n updates or jobs."""
+    strings = _user_strings(update)
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text(strings["admin_only"])
+        return
+    args = [a.lower() for a in (context.args or [])]
+    count = next((int(a) for a in args if a.isdigit() and int(a) > 0), PROFILE_UPDATES)
+    chat_id = update.effective_chat.id
+    bot = context.bot
+
+    async def deliver(report: profiling.ProfileReport) -> None:
+        caption = strings["perfil_done"].format(units=report.units, seconds=report.seconds)
+        for path in (report.summary_path, report.stats_path):
+            with open(path, "rb") as f:
+                await bot.send_document(chat_id, InputFile(f, os.path.basename(path)), caption=caption)
+            caption = None
+
+    # This /perfil update finishes inside the session, so it counts as one more
+    if not profiling.start(count + 1, memory="nomem" not in args, on_finish=deliver):
+        await update.message.reply_text(strings["perfil_busy"])
+        return
+    await update.message.reply_text(strings["perfil_started"].format(count=count))
+
+
+@timed(HANDLER_SECONDS)
+async def global_cmd(update: Update, context: CallbackContext) -> None:
+    """Handle /global (admins only): activity, streaks and trends over all users."""
+    import analytics
+    strings = _user_strings(update)
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text(strings["admin_only"])
+        return
+    snapshot = await asyncio.to_thread(analytics.current)
+    t0 = time.perf_counter()
+    stats = analytics.overview(snapshot, dt.datetime.now(TZ).date())
+    elapsed = time.perf_counter() - t0
+    await update.message.reply_text(strings["global_text"].format(
+        users=stats.users,
+        entries=stats.entries,
+        active_users=stats.active_users,
+        active_days=analytics.ACTIVE_DAYS,
+        per_day=" ".join(str(n) for n in stats.active_per_day),
+        streaking=stats.streaking,
+        average_streak=stats.average_streak,
+        average_longest=stats.average_longest_streak,
+        trend_days=analytics.TREND_DAYS,
+        losing=stats.losing,
+        stable=stats.stable,
+        gaining=stats.gaining,
+        median=stats.median_weekly_change,
+        ms=elapsed * 1000,
+    ))
+
+
+@timed(HANDLER_SECONDS)
 async def unknown_cmd(update: Update, context: CallbackContext) -> None:
-    strings = get_strings(update.effective_user.language_code)
+    strings = _user_strings(update)
     await update.message.reply_text(strings["unknown_command"]) 
\ No newline at end of file
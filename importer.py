@@ -0,0 +1,258 @@
+"""Streaming bulk import of weight history from CSV or JSON documents.
+
+Files are read row by row (never loaded whole), validated, and written in
+chunks of IMPORT_CHUNK_SIZE rows, one transaction per chunk.
+"""
+
+import csv
+import datetime as dt
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from config import IMPORT_CHUNK_SIZE, IMPORT_MAX_ERRORS
+from database import save_weights_bulk, refresh_streak, refresh_trend
+
+MIN_WEIGHT = 20.0
+MAX_WEIGHT = 400.0
+MIN_DATE = dt.date(1900, 1, 1)
+READ_SIZE = 64 * 1024
+MAX_RECORD_SIZE = 1024 * 1024  # a single JSON item larger than this is rejected
+
+DATE_KEYS = ("date", "fecha", "day", "dia", "día", "timestamp")
+WEIGHT_KEYS = ("weight", "peso", "kg", "value")
+DATE_FORMATS = ("%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d", "%d.%m.%Y")
+
+RawRow = Tuple[int, object, object]  # (row number, date, weight) as found in the file
+
+
+class ImportFormatError(ValueError):
+    """The document is not a CSV or JSON file we can read."""
+
+
+@dataclass
+class ImportResult:
+    """Outcome of a bulk import."""
+
+    imported: int = 0
+    skipped: int = 0
+    errors: List[Tuple[int, str, str]] = field(default_factory=list)  # (row, reason, value)
+
+    def add_error(self, row: int, reason: str, value: str) -> None:
+        self.skipped += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append((row, reason, value))
+
+
+def detect_format(filename: str) -> str:
+    """Return "csv", "json" or "jsonl" from a file name."""
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext in (".csv", ".txt", ".tsv"):
+        return "csv"
+    if ext == ".json":
+        return "json"
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ImportFormatError(ext or filename)
+
+
+def iter_csv_rows(path: str) -> Iterator[RawRow]:
+    """Yield (row, date, weight) from a CSV file with or without a header."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(f, dialect)
+        date_col, weight_col = 0, 1
+        for row_no, row in enumerate(reader, start=1):
+            if not row or not any(cell.strip() for cell in row):
+                continue
+            if row_no == 1:
+                header = [cell.strip().lower() for cell in row]
+                date_idx = next((i for i, c in enumerate(header) if c in DATE_KEYS), None)
+                weight_idx = next((i for i, c in enumerate(header) if c in WEIGHT_KEYS), None)
+                if date_idx is not None and weight_idx is not None:
+                    date_col, weight_col = date_idx, weight_idx
+                    continue
+            if len(row) <= max(date_col, weight_col):
+                yield row_no, None, None
+                continue
+            yield row_no, row[date_col], row[weight_col]
+
+
+def _record_fields(record) -> Tuple[object, object]:
+    """Date and weight from a JSON record: an object or a [date, weight] pair."""
+    if isinstance(record, dict):
+        lowered = {str(k).lower(): v for k, v in record.items()}
+        date = next((lowered[k] for k in DATE_KEYS if k in lowered), None)
+        weight = next((lowered[k] for k in WEIGHT_KEYS if k in lowered), None)
+        return date, weight
+    if isinstance(record, (list, tuple)) and len(record) >= 2:
+        return record[0], record[1]
+    return None, None
+
+
+def _iter_json_array(f) -> Iterator[object]:
+    """Incrementally decode the items of a top-level JSON array.
+
+    Only the current item and one read buffer are held in memory.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        chunk = f.read(READ_SIZE)
+        if not chunk:
+            eof = True
+            return False
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip(chars: str) -> None:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            if pos < len(buf) or not fill():
+                return
+
+    skip(" \t\r\n")
+    if pos >= len(buf) or buf[pos] != "[":
+        raise ImportFormatError("expected a JSON array")
+    pos += 1
+
+    while True:
+        skip(" \t\r\n,")
+        if pos >= len(buf):
+            raise ImportFormatError("unterminated JSON array")
+        if buf[pos] == "]":
+            return
+        while True:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+                break
+            except json.JSONDecodeError:
+                if eof or len(buf) - pos > MAX_RECORD_SIZE or not fill():
+                    raise ImportFormatError("invalid JSON")
+        pos = end
+        yield item
+
+
+def iter_json_rows(path: str, lines: bool = False) -> Iterator[RawRow]:
+    """Yield (row, date, weight) from a JSON array or a JSON Lines file."""
+    with open(path, encoding="utf-8-sig") as f:
+        if lines:
+            for row_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    yield row_no, None, None
+                    continue
+                yield (row_no, *_record_fields(record))
+        else:
+            for row_no, record in enumerate(_iter_json_array(f), start=1):
+                yield (row_no, *_record_fields(record))
+
+
+def iter_rows(path: str, fmt: str) -> Iterator[RawRow]:
+    """Rows of a document in the given format."""
+    if fmt == "csv":
+        return iter_csv_rows(path)
+    return iter_json_rows(path, lines=(fmt == "jsonl"))
+
+
+def parse_date(value) -> dt.date:
+    text = str(value).strip()
+    # ISO timestamps: keep the day
+    if len(text) > 10 and text[4] == "-" and text[10] in "T ":
+        text = text[:10]
+    try:
+        # Fast path for the common ISO format
+        return dt.date.fromisoformat(text)
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return dt.datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError("date", text)
+
+
+def parse_row(date_value, weight_value, today: dt.date) -> Tuple[dt.date, float]:
+    """Validate one row.
+
+    Raises ValueError(reason, value) where reason is "columns", "date" or "weight".
+    """
+    if date_value is None or weight_value is None:
+        raise ValueError("columns", "")
+    date = parse_date(date_value)
+    if not MIN_DATE <= date <= today:
+        raise ValueError("date", date.isoformat())
+    try:
+        weight = float(str(weight_value).strip().replace(",", "."))
+    except ValueError:
+        raise ValueError("weight", str(weight_value))
+    if not MIN_WEIGHT <= weight <= MAX_WEIGHT:
+        raise ValueError("weight", str(weight_value))
+    return date, weight
+
+
+def import_weights(
+    user_id: int,
+    rows: Iterator[RawRow],
+    today: Optional[dt.date] = None,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    progress: Optional[Callable[[ImportResult], None]] = None,
+) -> ImportResult:
+    """Validate rows and write them in chunked transactions.
+
+    ``progress`` is called with the running result after every chunk.
+    """
+    today = today or dt.date.today()
+    result = ImportResult()
+    chunk: List[Tuple[dt.date, float]] = []
+    for row_no, date_value, weight_value in rows:
+        try:
+            chunk.append(parse_row(date_value, weight_value, today))
+        except ValueError as e:
+            reason, value = e.args if len(e.args) == 2 else ("columns", "")
+            result.add_error(row_no, reason, value)
+            continue
+        if len(chunk) >= chunk_size:
+            result.imported += save_weights_bulk(user_id, chunk)
+            chunk = []
+            if progress:
+                progress(result)
+    if chunk:
+        result.imported += save_weights_bulk(user_id, chunk)
+        if progress:
+            progress(result)
+    return result
+
+
+def import_file(user_id: int, path: str, filename: str, today: Optional[dt.date] = None,
+                progress: Optional[Callable[[ImportResult], None]] = None) -> ImportResult:
+    """Import a CSV/JSON document and run the once-per-import follow-ups."""
+    result = import_weights(user_id, iter_rows(path, detect_format(filename)), today=today, progress=progress)
+    if result.imported:
+        after_bulk_import(user_id)
+    return result
+
+
+def after_bulk_import(user_id: int) -> None:
+    """Refresh derived data once after a bulk import instead of once per row."""
+    from backup_manager import auto_backup
+    refresh_trend(user_id)
+    refresh_streak(user_id)
+    auto_backup()
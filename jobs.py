@@ -1,21 +1,34 @@
 """Scheduled jobs and automated tasks for the Telegram Weight Tracker Bot."""
 
+import asyncio
 import datetime as dt
-import io
-from typing import List, Tuple
+import logging
+import time
+from typing import Callable, Iterable, Optional, Set
 
-import matplotlib.pyplot as plt
 from telegram import InputFile, ForceReply
 from telegram.ext import CallbackContext
 
-from config import TZ
-from database import get_weights, get_user_language
+from admission import chart_admission
+import charts
+from charts import render_month_chart
+from config import TZ, JOB_REGISTRATION_BATCH, ARCHIVE_AFTER_DAYS, ANALYTICS_SNAPSHOT
+from database import archive_cold_rows, get_all_user_ids, get_streak, get_weights, settle_streak
 from lang.strings import get_strings
+from metrics import JOB_SECONDS, timed
+from profiling import counted
+from profiles import get_profile, get_user_strings
+import startup
+import warmup
+
+logger = logging.getLogger(__name__)
 
 def is_first_day_of_month():
     today = dt.datetime.now(TZ).date()
     return today.day == 1
 
+@timed(JOB_SECONDS)
+@counted
 async def ask_weight_job(context: CallbackContext) -> None:
     uid = None
     # context.job.data may be dict, but the linter sees it as object
@@ -23,26 +36,28 @@ async def ask_weight_job(context: CallbackContext) -> None:
     if isinstance(data, dict):
         uid = data.get("user_id")
     if uid is None:
-        print("[ERROR] Could not get user_id in ask_weight_job")
+        logger.error("Could not get user_id in ask_weight_job")
         return
     import datetime as dt
     today = dt.datetime.now().date()
     # Check if weight already registered for today
     weights_today = get_weights(uid, today, today)
     if weights_today:
-        print(f"[DEBUG] User {uid} already registered weight for today, skipping reminder.")
+        logger.debug("Weight already registered today, skipping reminder", extra={"user_id": uid})
         return
-    # Skip if user has silenced reminders
-    silenced = getattr(context, "bot_data", {}).get("silenced_users", set())
-    if uid in silenced:
-        print(f"[DEBUG] User {uid} has reminders silenced. Skipping.")
+    # Nothing logged today: yesterday (and any days before it since the last entry) was missed
+    settle_streak(uid, today - dt.timedelta(days=1))
+    # Skip if user has silenced reminders (older versions kept them in bot_data)
+    profile = get_profile(uid)
+    legacy_silenced = getattr(context, "bot_data", {}).get("silenced_users", set())
+    if profile.silenced or uid in legacy_silenced:
+        logger.debug("Reminders silenced, skipping", extra={"user_id": uid})
         return
     
     # Get user's language preference
-    lang_code = get_user_language(uid)
-    strings = get_strings(lang_code)
+    strings = get_strings(profile.language_code)
     
-    print(f"[DEBUG] Sending daily reminder to {uid}")
+    logger.debug("Sending daily reminder", extra={"user_id": uid})
     # Send message with ForceReply so it's auto-selected for reply
     message = await context.bot.send_message(
         uid,
@@ -56,40 +71,47 @@ async def ask_weight_job(context: CallbackContext) -> None:
     if context.chat_data is not None:
         context.chat_data["expecting_daily_weight"] = True
 
+@timed(JOB_SECONDS)
+@counted
 async def weekly_summary_job(context: CallbackContext) -> None:
     uid = context.job.data["user_id"]
     today = dt.datetime.now(TZ).date()
-    this_start = today - dt.timedelta(days=today.weekday())
-    last_start = this_start - dt.timedelta(days=7)
-    this_ws = get_weights(uid, this_start, today)
-    last_ws = get_weights(uid, last_start, this_start - dt.timedelta(days=1))
-    
-    if len(this_ws) < 2 or len(last_ws) < 2:
-        return
-    
-    # Get user's language preference
-    lang_code = get_user_language(uid)
-    strings = get_strings(lang_code)
-    
-    avg_this = sum(w for _, w in this_ws) / len(this_ws)
-    avg_last = sum(w for _, w in last_ws) / len(last_ws)
-    diff = avg_this - avg_last
-    diff_r = round(diff, 1)
+    # Sent on Mondays: the week that just ended against the one before it
+    last_start = today - dt.timedelta(days=today.weekday() + 7)
+    prev_start = last_start - dt.timedelta(days=7)
+    last_ws = get_weights(uid, last_start, last_start + dt.timedelta(days=6))
+    prev_ws = get_weights(uid, prev_start, last_start - dt.timedelta(days=1))
+    streak = get_streak(uid)
 
-    if diff_r == 0.0:
-        change = strings["weekly_no_change"]
-    elif diff_r < 0:
-        change = strings["weekly_decrease"].format(diff=abs(diff_r))
-    else:
-        change = strings["weekly_increase"].format(diff=diff_r)
+    lines = []
+    strings = get_user_strings(uid)
+    if len(last_ws) >= 2 and len(prev_ws) >= 2:
+        avg_last = sum(w for _, w in last_ws) / len(last_ws)
+        avg_prev = sum(w for _, w in prev_ws) / len(prev_ws)
+        diff_r = round(avg_last - avg_prev, 1)
 
-    text = (
-        f"{strings['weekly_summary_header']}\n"
-        f"{strings['weekly_summary_format'].format(current=avg_this, previous=avg_last, change=change)}"
-    )
+        if diff_r == 0.0:
+            change = strings["weekly_no_change"]
+        elif diff_r < 0:
+            change = strings["weekly_decrease"].format(diff=abs(diff_r))
+        else:
+            change = strings["weekly_increase"].format(diff=diff_r)
+        lines.append(strings["weekly_summary_format"].format(current=avg_last, previous=avg_prev, change=change))
+    if streak is not None and (last_ws or prev_ws):
+        logged = streak.days_logged(last_start)
+        lines.append(strings["weekly_streak"].format(
+            adherence=logged / 7 * 100,
+            missed=7 - logged,
+            current=streak.current_streak(today),
+            longest=streak.longest,
+        ))
+    if not lines:
+        return
 
-    await context.bot.send_message(uid, text)
+    await context.bot.send_message(uid, "\n".join([strings["weekly_summary_header"]] + lines))
 
+@timed(JOB_SECONDS)
+@counted
 async def monthly_summary_job(context: CallbackContext) -> None:
     if not is_first_day_of_month():
         return
@@ -103,23 +125,11 @@ async def monthly_summary_job(context: CallbackContext) -> None:
         return
     
     # Get user's language preference
-    lang_code = get_user_language(uid)
-    strings = get_strings(lang_code)
+    strings = get_user_strings(uid)
     
     dates = [d for d, _ in ws]
     vals = [w for _, w in ws]
     
-    fig, ax = plt.subplots()
-    ax.plot(dates, vals, marker="o")
-    ax.set_title(last_month_start.strftime(strings["monthly_chart_title"]))
-    ax.set_ylabel("Kg")
-    ax.grid(True)
-    
-    buf = io.BytesIO()
-    fig.savefig(buf, format="png")
-    plt.close(fig)
-    buf.seek(0)
-    
     diff = vals[-1] - vals[0]
     diff_r = round(diff, 1)
     if diff_r == 0.0:
@@ -136,19 +146,46 @@ async def monthly_summary_job(context: CallbackContext) -> None:
         change=change_text
     )
     
-    await context.bot.send_photo(uid, InputFile(buf, "peso.png"), caption=caption)
+    async def send():
+        buf = await asyncio.to_thread(
+            render_month_chart, dates, vals, last_month_start.strftime(strings["monthly_chart_title"])
+        )
+        await context.bot.send_photo(uid, InputFile(buf, "peso.png"), caption=caption)
+
+    # Every user's summary fires at the same minute: share the chart render/upload limit
+    await chart_admission.submit((uid, "monthly_summary", tuple(ws)), send)
 
-def register_jobs(app, user_id: int):
+@timed(JOB_SECONDS)
+@counted
+async def archive_job(context: CallbackContext) -> None:
+    """Move history older than ARCHIVE_AFTER_DAYS to the compressed archive."""
+    stats = await asyncio.to_thread(archive_cold_rows)
+    if stats["rows"]:
+        logger.info("Archived cold history", extra=stats)
+
+
+def register_maintenance_jobs(app) -> None:
+    """Schedule the jobs that aren't tied to a user (one process only, in cluster mode)."""
+    if ARCHIVE_AFTER_DAYS > 0:
+        app.job_queue.run_daily(archive_job, time=dt.time(hour=3, minute=30, tzinfo=TZ), name="archive")
+
+
+def register_jobs(app, user_id: int, existing: Optional[Set[str]] = None):
+    """Schedule the daily, weekly and monthly jobs of one user, replacing any previous ones.
+
+    ``existing`` is the set of scheduled job names, when the caller has it:
+    each name lookup scans every job, so bulk registration skips it for
+    users that have none.
+    """
     if not hasattr(app, 'job_queue') or app.job_queue is None:
-        print(f"[ERROR] Application has no job_queue! Scheduled jobs will not be registered for user {user_id}.")
+        logger.error("Application has no job_queue, scheduled jobs not registered", extra={"user_id": user_id})
         return
     # Remove previous jobs for this user
-    for job in app.job_queue.get_jobs_by_name(str(user_id)):
-        job.schedule_removal()
-    for job in app.job_queue.get_jobs_by_name(f"weekly_{user_id}"):
-        job.schedule_removal()
-    for job in app.job_queue.get_jobs_by_name(f"monthly_{user_id}"):
-        job.schedule_removal()
+    for name in (str(user_id), f"weekly_{user_id}", f"monthly_{user_id}"):
+        if existing is not None and name not in existing:
+            continue
+        for job in app.job_queue.get_jobs_by_name(name):
+            job.schedule_removal()
 
     # Daily weight question
     app.job_queue.run_daily(
@@ -173,4 +210,59 @@ def register_jobs(app, user_id: int):
         time=dt.time(hour=8, minute=15, tzinfo=TZ),
         data={"user_id": user_id},
         name=f"monthly_{user_id}",
-    ) 
\ No newline at end of file
+    ) 
+
+
+async def register_all_jobs(app, user_ids: Iterable[int], batch_size: int = JOB_REGISTRATION_BATCH) -> int:
+    """Register the jobs of many users, yielding to the event loop after every batch.
+
+    Updates keep being handled meanwhile; a user who sends /start in the
+    middle is registered by the handler and simply re-registered here.
+    """
+    count = 0
+    existing = None
+    for user_id in user_ids:
+        if existing is None:
+            existing = {job.name for job in app.job_queue.jobs()}
+        register_jobs(app, user_id, existing)
+        count += 1
+        if count % batch_size == 0:
+            existing = None
+            await asyncio.sleep(0)
+    return count
+
+
+@timed(JOB_SECONDS)
+async def startup_job(context: CallbackContext) -> None:
+    """Finish starting up once updates are flowing.
+
+    Registers every user's jobs, loads matplotlib, then warms the caches
+    for recently active users (see ``warmup``) and, when it is kept in
+    memory, loads the analytics snapshot.
+    """
+    import analytics
+    startup.mark("polling")
+    owns: Optional[Callable[[int], bool]] = (context.job.data or {}).get("owns")
+    user_ids = await asyncio.to_thread(get_all_user_ids)
+    if owns is not None:
+        user_ids = [uid for uid in user_ids if owns(uid)]
+    t0 = time.perf_counter()
+    count = await register_all_jobs(context.application, user_ids)
+    logger.info("Registered jobs for %d users in %.2fs", count, time.perf_counter() - t0)
+    startup.mark("jobs")
+    await asyncio.to_thread(charts.preload)
+    startup.mark("charts")
+    await asyncio.to_thread(warmup.warm_up, owns)
+    startup.mark("warmup")
+    if ANALYTICS_SNAPSHOT:
+        await asyncio.to_thread(analytics.current)
+        startup.mark("analytics")
+    startup.log_report()
+
+
+def schedule_startup(app, owns: Optional[Callable[[int], bool]] = None) -> None:
+    """Run startup_job as soon as the job queue starts, i.e. after polling has begun.
+
+    ``owns`` restricts job registration to some users (cluster workers).
+    """
+    app.job_queue.run_once(startup_job, 0, data={"owns": owns}, name="startup")
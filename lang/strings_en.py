@@ -9,7 +9,15 @@ STRINGS = {
         "/peso [kg] – log your weight now (or I will ask if you omit the number)\n"
         "/mensual – average of the last 6 months\n"
         "/semanal – average of the last 4 weeks\n"
-        "/diario – weights of the last 6 days + chart"
+        "/diario – weights of the last 6 days + chart\n"
+        "/historial [from] [to] – chart of any period\n"
+        "/tendencia – smoothed weight, weekly rate and projection\n"
+        "/objetivo [kg] – show or set your goal weight\n"
+        "/racha – your logging streak and weekly consistency\n"
+        "/revisar – look for suspicious entries in your history\n"
+        "/importar – import your history from a CSV or JSON file\n"
+        "/exportar [csv|columnar] – download your full history\n"
+        "/unirme, /salir, /ranking [days] – group ranking (in the group)"
     ),
     "invalid_number": "Invalid number. Example: /peso 72.4",
     "weight_registered": "Weight registered: {weight:.1f} kg ✅",
@@ -35,4 +43,68 @@ STRINGS = {
     "monthly_no_change": "↔️ No change this month (±0.0 kg)",
     "monthly_decrease": "👏 You lost {diff:.1f} kg this month",
     "monthly_increase": "⚠️ You gained {diff:.1f} kg this month",
-} 
\ No newline at end of file
+    "import_ask": "📤 Send me your history as a CSV (date,weight) or JSON ([{\"date\": \"2024-01-31\", \"weight\": 72.4}, ...]) document.",
+    "import_unsupported": "Unsupported format. Send a .csv, .json or .jsonl file.",
+    "import_started": "⏳ Importing history...",
+    "import_progress": "⏳ Imported {rows} entries...",
+    "import_done": "✅ Import finished: {imported} entries imported, {skipped} skipped.",
+    "import_failed": "❌ I couldn't read the file. Make sure it is a valid CSV or JSON.",
+    "import_error_line": "Row {row}: {reason} {value}",
+    "import_error_columns": "missing columns",
+    "import_error_date": "invalid date",
+    "import_error_weight": "invalid weight",
+    "export_caption": "📦 Your history: {rows} entries.",
+    "export_empty": "There are no entries to export.",
+    "export_too_large": "The history is too large to send through Telegram. Use python exporter.py on the server.",
+    "admin_only": "This command is only available to administrators.",
+    "historial_usage": "Usage: /historial [from] [to], for example /historial 01/01/2023 31/12/2024",
+    "historial_empty": "There are no entries in that period.",
+    "historial_summary": "📈 {start} – {end}: {count} entries\nStart {first:.1f} kg, end {last:.1f} kg (min {min:.1f}, max {max:.1f})",
+    "historial_chart_caption": "📈 Weight evolution over the period",
+    "tendencia_no_data": "I need at least two entries on different days to compute your trend.",
+    "tendencia_message": "📉 Trend as of {date}: {trend:.1f} kg\nRate: {rate:+.2f} kg/week",
+    "tendencia_goal_eta": "🎯 At the current rate you will reach {goal:.1f} kg around {date}",
+    "tendencia_goal_reached": "🎯 Your trend is already at your {goal:.1f} kg goal!",
+    "tendencia_goal_off_track": "🎯 At the current rate you are not getting closer to your {goal:.1f} kg goal",
+    "tendencia_no_goal": "Set a goal weight with /objetivo <kg> to see a projection.",
+    "objetivo_usage": "Usage: /objetivo <kg>, for example /objetivo 72.5 (/objetivo clear to remove it)",
+    "objetivo_current": "🎯 Your goal is {goal:.1f} kg. Change it with /objetivo <kg> or remove it with /objetivo clear",
+    "objetivo_saved": "🎯 Goal saved: {goal:.1f} kg",
+    "objetivo_cleared": "Goal removed.",
+    "weight_suspicious": "🤔 {weight:.1f} kg is far from your recent weights (median {median:.1f} kg). Should I save it? You can also send me the right value.",
+    "weight_confirm_button": "✅ Save {weight:.1f} kg",
+    "weight_cancel_button": "❌ Cancel",
+    "weight_cancelled": "OK, nothing was saved.",
+    "revisar_clean": "✅ I found no suspicious entries in your history.",
+    "revisar_header": "🔍 I found {count} suspicious entries:",
+    "revisar_line": "• {date}: {weight:.1f} kg (median {median:.1f} kg)",
+    "revisar_line_suggestion": "• {date}: {weight:.1f} kg (median {median:.1f} kg), maybe {suggestion:.1f}?",
+    "revisar_more": "… and {count} more",
+    "revisar_fix_button": "✏️ {date} → {weight:.1f}",
+    "revisar_delete_button": "🗑 Delete {date}",
+    "revisar_fixed": "✏️ Entry of {date} corrected to {weight:.1f} kg.",
+    "revisar_deleted": "🗑 Entry of {date} deleted.",
+    "revisar_stale": "The entry of {date} changed since the review; run /revisar again.",
+    "weight_daily_value": "📊 {count} readings today; the day's weight ({policy}) is {weight:.1f} kg",
+    "aggregation_first": "the first one",
+    "aggregation_last": "the last one",
+    "aggregation_min": "the lowest",
+    "aggregation_mean": "the mean",
+    "stats_title": "📊 Stats (calls · average · p95)",
+    "stats_queues": "Update queue: p95 wait {update_p95:.0f} ms, {dropped} dropped\nCharts: {in_flight} in flight, {coalesced} shared, p95 wait {chart_p95:.0f} ms",
+    "perfil_started": "🔬 Profiling the next {count} updates or jobs. I'll send you the report when it's done.",
+    "perfil_busy": "A profiling session is already running.",
+    "perfil_done": "🔬 Profile of {units} updates/jobs in {seconds:.1f} s",
+    "global_text": "🌍 Global stats\nUsers: {users} ({active_users} active in {active_days} days)\nEntries: {entries}\nActive per day: {per_day}\nAverage current streak: {average_streak:.1f} days ({streaking} users)\nAverage longest streak: {average_longest:.1f} days\nLast {trend_days} days: {losing} losing, {stable} stable, {gaining} gaining (median {median:+.2f} kg/week)\n⏱ {ms:.1f} ms",
+    "group_only": "This command only works in groups.",
+    "unirme_done": "🏆 {name}, you're now in this group's /ranking. Log your weight with me in private.",
+    "unirme_already": "{name}, you were already in this group's /ranking.",
+    "salir_done": "{name}, you've left this group's /ranking.",
+    "salir_not_member": "{name}, you weren't in this group's /ranking.",
+    "ranking_title": "🏆 Ranking for the last {days} days (weight change)",
+    "ranking_empty": "Nobody in the group has two entries in the last {days} days. Use /unirme to take part.",
+    "ranking_usage": "Usage: /ranking [days], between 1 and {max_days}.",
+    "racha_message": "🔥 Current streak: {current} days (best: {longest})\nThis week: {week_days}/{week_elapsed} days ({adherence:.0f} %), last week: {last_week:.0f} %\nDays without an entry since {since}: {missed}",
+    "racha_no_data": "You have no entries yet. Use /peso to start your streak.",
+    "weekly_streak": "📅 Consistency: {adherence:.0f} % of the week ({missed} days missed) · 🔥 streak {current} days (best {longest})",
+}
@@ -9,7 +9,15 @@ STRINGS = {
         "/peso [kg] – registra tu peso ahora (o pregunta si omites número)\n"
         "/mensual – media de los últimos 6 meses\n"
         "/semanal – media de las últimas 4 semanas\n"
-        "/diario – pesos de los últimos 6 días + gráfico"
+        "/diario – pesos de los últimos 6 días + gráfico\n"
+        "/historial [desde] [hasta] – gráfico de cualquier periodo\n"
+        "/tendencia – peso suavizado, ritmo semanal y proyección\n"
+        "/objetivo [kg] – ver o fijar tu peso objetivo\n"
+        "/racha – tu racha de registros y constancia semanal\n"
+        "/revisar – buscar registros sospechosos en tu historial\n"
+        "/importar – importa tu historial desde un CSV o JSON\n"
+        "/exportar [csv|columnar] – descarga tu historial completo\n"
+        "/unirme, /salir, /ranking [días] – ranking de un grupo (en el grupo)"
     ),
     "invalid_number": "Número no válido. Ejemplo: /peso 72.4",
     "weight_registered": "Peso registrado: {weight:.1f} kg ✅",
@@ -35,4 +43,68 @@ STRINGS = {
     "monthly_no_change": "↔️ Sin cambios este mes (±0.0 kg)",
     "monthly_decrease": "👏 Bajaste {diff:.1f} kg en el mes",
     "monthly_increase": "⚠️ Subiste {diff:.1f} kg en el mes",
-} 
\ No newline at end of file
+    "import_ask": "📤 Envíame tu historial como documento CSV (fecha,peso) o JSON ([{\"date\": \"2024-01-31\", \"weight\": 72.4}, ...]).",
+    "import_unsupported": "Formato no soportado. Envía un archivo .csv, .json o .jsonl.",
+    "import_started": "⏳ Importando historial...",
+    "import_progress": "⏳ Importados {rows} registros...",
+    "import_done": "✅ Importación terminada: {imported} registros importados, {skipped} descartados.",
+    "import_failed": "❌ No pude leer el archivo. Comprueba que sea un CSV o JSON válido.",
+    "import_error_line": "Fila {row}: {reason} {value}",
+    "import_error_columns": "faltan columnas",
+    "import_error_date": "fecha no válida",
+    "import_error_weight": "peso no válido",
+    "export_caption": "📦 Tu historial: {rows} registros.",
+    "export_empty": "No hay registros que exportar.",
+    "export_too_large": "El historial es demasiado grande para enviarlo por Telegram. Usa python exporter.py en el servidor.",
+    "admin_only": "Este comando solo está disponible para administradores.",
+    "historial_usage": "Uso: /historial [desde] [hasta], por ejemplo /historial 01/01/2023 31/12/2024",
+    "historial_empty": "No hay registros en ese periodo.",
+    "historial_summary": "📈 {start} – {end}: {count} registros\nInicio {first:.1f} kg, fin {last:.1f} kg (mín. {min:.1f}, máx. {max:.1f})",
+    "historial_chart_caption": "📈 Evolución de peso en el periodo",
+    "tendencia_no_data": "Necesito al menos dos registros en días distintos para calcular tu tendencia.",
+    "tendencia_message": "📉 Tendencia al {date}: {trend:.1f} kg\nRitmo: {rate:+.2f} kg/semana",
+    "tendencia_goal_eta": "🎯 Al ritmo actual llegarás a {goal:.1f} kg hacia el {date}",
+    "tendencia_goal_reached": "🎯 ¡Tu tendencia ya está en tu objetivo de {goal:.1f} kg!",
+    "tendencia_goal_off_track": "🎯 Al ritmo actual no te estás acercando a tu objetivo de {goal:.1f} kg",
+    "tendencia_no_goal": "Fija un peso objetivo con /objetivo <kg> para ver una proyección.",
+    "objetivo_usage": "Uso: /objetivo <kg>, por ejemplo /objetivo 72,5 (/objetivo borrar para quitarlo)",
+    "objetivo_current": "🎯 Tu objetivo es {goal:.1f} kg. Cámbialo con /objetivo <kg> o quítalo con /objetivo borrar",
+    "objetivo_saved": "🎯 Objetivo guardado: {goal:.1f} kg",
+    "objetivo_cleared": "Objetivo eliminado.",
+    "weight_suspicious": "🤔 {weight:.1f} kg se aleja mucho de tus últimos pesos (mediana {median:.1f} kg). ¿Lo guardo? También puedes enviarme el valor correcto.",
+    "weight_confirm_button": "✅ Guardar {weight:.1f} kg",
+    "weight_cancel_button": "❌ Cancelar",
+    "weight_cancelled": "De acuerdo, no he guardado nada.",
+    "revisar_clean": "✅ No he encontrado registros sospechosos en tu historial.",
+    "revisar_header": "🔍 He encontrado {count} registros sospechosos:",
+    "revisar_line": "• {date}: {weight:.1f} kg (mediana {median:.1f} kg)",
+    "revisar_line_suggestion": "• {date}: {weight:.1f} kg (mediana {median:.1f} kg), ¿quizá {suggestion:.1f}?",
+    "revisar_more": "… y {count} más",
+    "revisar_fix_button": "✏️ {date} → {weight:.1f}",
+    "revisar_delete_button": "🗑 Borrar {date}",
+    "revisar_fixed": "✏️ Registro del {date} corregido a {weight:.1f} kg.",
+    "revisar_deleted": "🗑 Registro del {date} borrado.",
+    "revisar_stale": "El registro del {date} ha cambiado desde la revisión; vuelve a usar /revisar.",
+    "weight_daily_value": "📊 Llevas {count} mediciones hoy; el peso del día ({policy}) es {weight:.1f} kg",
+    "aggregation_first": "la primera",
+    "aggregation_last": "la última",
+    "aggregation_min": "la mínima",
+    "aggregation_mean": "la media",
+    "stats_title": "📊 Estadísticas (llamadas · media · p95)",
+    "stats_queues": "Cola de updates: espera p95 {update_p95:.0f} ms, {dropped} descartados\nGráficos: {in_flight} en curso, {coalesced} compartidos, espera p95 {chart_p95:.0f} ms",
+    "perfil_started": "🔬 Perfilando las próximas {count} actualizaciones o tareas. Te enviaré el informe al terminar.",
+    "perfil_busy": "Ya hay un perfilado en marcha.",
+    "perfil_done": "🔬 Perfil de {units} actualizaciones/tareas en {seconds:.1f} s",
+    "global_text": "🌍 Estadísticas globales\nUsuarios: {users} ({active_users} activos en {active_days} días)\nRegistros: {entries}\nActivos por día: {per_day}\nRacha actual media: {average_streak:.1f} días ({streaking} usuarios)\nRacha más larga media: {average_longest:.1f} días\nÚltimos {trend_days} días: {losing} bajando, {stable} estables, {gaining} subiendo (mediana {median:+.2f} kg/semana)\n⏱ {ms:.1f} ms",
+    "group_only": "Este comando solo funciona en grupos.",
+    "unirme_done": "🏆 {name}, ya participas en el /ranking de este grupo. Registra tu peso en privado conmigo.",
+    "unirme_already": "{name}, ya participabas en el /ranking de este grupo.",
+    "salir_done": "{name}, has salido del /ranking de este grupo.",
+    "salir_not_member": "{name}, no participabas en el /ranking de este grupo.",
+    "ranking_title": "🏆 Ranking de los últimos {days} días (cambio de peso)",
+    "ranking_empty": "Nadie del grupo tiene dos registros en los últimos {days} días. Usad /unirme para participar.",
+    "ranking_usage": "Uso: /ranking [días], entre 1 y {max_days}.",
+    "racha_message": "🔥 Racha actual: {current} días (récord: {longest})\nEsta semana: {week_days}/{week_elapsed} días ({adherence:.0f} %), la anterior: {last_week:.0f} %\nDías sin registrar desde el {since}: {missed}",
+    "racha_no_data": "Aún no tienes registros. Usa /peso para empezar tu racha.",
+    "weekly_streak": "📅 Constancia: {adherence:.0f} % de la semana ({missed} días sin registrar) · 🔥 racha {current} días (récord {longest})",
+}
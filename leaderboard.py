@@ -0,0 +1,213 @@
+"""Group leaderboards: opted-in members ranked by relative weight change.
+
+In a group chat members opt in with /unirme (``group_members`` table) and
+/ranking [días] lists the LEADERBOARD_TOP who lost the most over the last
+days, relative to their weight: (last - first) / first, from their first
+and last entries of the period.
+
+Each (group, period) ``Board`` keeps every member's first and last entries
+and a list of (change, user_id) sorted with ``bisect``. It is loaded with
+one query the first time it is asked for, and again on a new day (the
+period moves) or after LEADERBOARD_MAX_AGE seconds (in cluster mode the
+members' writes reach other workers). In between ``record``, called by
+``database.save_weight`` and ``save_reading``, moves the writer in each
+loaded board of theirs, so a ranking never reads the members' histories.
+Deletes and bulk writes can change a first or last entry to any other day,
+so those members are re-read on their own before the next ranking.
+"""
+
+import bisect
+import datetime as dt
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import LEADERBOARD_BOARDS, LEADERBOARD_MAX_AGE, LEADERBOARD_TOP
+
+_Key = Tuple[int, int]  # chat_id, days
+
+
+class Board:
+    """One group's members ordered by relative change over ``days`` days up to ``today``."""
+
+    def __init__(self, chat_id: int, days: int, today: dt.date):
+        self.chat_id = chat_id
+        self.days = days
+        self.today = today
+        self.start = today - dt.timedelta(days=days - 1)
+        self.loaded_at = time.monotonic()
+        self.names: Dict[int, str] = {}
+        self.ends: Dict[int, Tuple[dt.date, float, dt.date, float]] = {}
+        self.order: List[Tuple[float, int]] = []
+        self.stale: Set[int] = set()
+
+    def set_member(self, user_id: int, name: str, ends: Tuple) -> None:
+        self.names[user_id] = name
+        self._set_ends(user_id, ends if ends[0] is not None else None)
+
+    def remove_member(self, user_id: int) -> None:
+        self._set_ends(user_id, None)
+        self.names.pop(user_id, None)
+        self.stale.discard(user_id)
+
+    def update(self, user_id: int, date: dt.date, weight: float) -> None:
+        """Apply a member's weight for ``date``."""
+        if user_id not in self.names or not self.start <= date <= self.today:
+            return
+        ends = self.ends.get(user_id)
+        if ends is None:
+            self._set_ends(user_id, (date, weight, date, weight))
+            return
+        first_date, first, last_date, last = ends
+        if date <= first_date:
+            first_date, first = date, weight
+        if date >= last_date:
+            last_date, last = date, weight
+        self._set_ends(user_id, (first_date, first, last_date, last))
+
+    def _set_ends(self, user_id: int, ends: Optional[Tuple]) -> None:
+        old = self.ends.pop(user_id, None)
+        if old is not None and old[0] < old[2]:
+            del self.order[bisect.bisect_left(self.order, (_change(old), user_id))]
+        if ends is not None:
+            self.ends[user_id] = ends
+            # Members need two days of the period to be ranked
+            if ends[0] < ends[2]:
+                bisect.insort(self.order, (_change(ends), user_id))
+
+    def top(self, k: int) -> List[Tuple[int, str, float]]:
+        """(user_id, name, change) of the ``k`` members who lost the most."""
+        return [(uid, self.names[uid], change) for change, uid in self.order[:k]]
+
+
+def _change(ends: Tuple) -> float:
+    return (ends[3] - ends[1]) / ends[1]
+
+
+_boards: "OrderedDict[_Key, Board]" = OrderedDict()
+_by_user: Dict[int, Set[_Key]] = {}
+# Writes made while a board is loading, applied to it once loaded
+_loading: Dict[_Key, List[Tuple]] = {}
+_lock = threading.Lock()
+
+
+def _index(key: _Key, board: Board, add: bool) -> None:
+    for user_id in board.names:
+        keys = _by_user.setdefault(user_id, set())
+        if add:
+            keys.add(key)
+        else:
+            keys.discard(key)
+            if not keys:
+                del _by_user[user_id]
+
+
+def _load(chat_id: int, days: int, today: dt.date) -> Board:
+    from database import get_period_ends
+
+    key = (chat_id, days)
+    with _lock:
+        _loading[key] = []
+    board = Board(chat_id, days, today)
+    try:
+        for user_id, name, *ends in get_period_ends(chat_id, board.start, today):
+            board.set_member(user_id, name, tuple(ends))
+    finally:
+        with _lock:
+            writes = _loading.pop(key)
+    for write in writes:
+        if write[0] == "stale":
+            board.stale.add(write[1])
+        else:
+            board.update(*write)
+    return board
+
+
+def _board(chat_id: int, days: int, today: dt.date) -> Board:
+    key = (chat_id, days)
+    with _lock:
+        board = _boards.get(key)
+        if board is not None and board.today == today and time.monotonic() - board.loaded_at <= LEADERBOARD_MAX_AGE:
+            _boards.move_to_end(key)
+            return board
+    board = _load(chat_id, days, today)
+    with _lock:
+        old = _boards.pop(key, None)
+        if old is not None:
+            _index(key, old, add=False)
+        _boards[key] = board
+        _index(key, board, add=True)
+        while len(_boards) > LEADERBOARD_BOARDS:
+            old_key, old = _boards.popitem(last=False)
+            _index(old_key, old, add=False)
+    return board
+
+
+def ranking(chat_id: int, days: int, today: Optional[dt.date] = None,
+            top: int = LEADERBOARD_TOP) -> List[Tuple[int, str, float]]:
+    """(user_id, name, change) of a group's ``top`` members over the last ``days`` days."""
+    from database import get_user_period_ends
+
+    board = _board(chat_id, days, today or dt.datetime.now().date())
+    while True:
+        with _lock:
+            if not board.stale:
+                return board.top(top)
+            user_id = board.stale.pop()
+        ends = get_user_period_ends(user_id, board.start, board.today)
+        with _lock:
+            if user_id in board.names:
+                board.set_member(user_id, board.names[user_id], ends)
+
+
+def join(chat_id: int, user_id: int, name: str) -> bool:
+    """Opt a user in to a group's ranking; returns whether they were new."""
+    from database import add_group_member
+
+    new = add_group_member(chat_id, user_id, name)
+    with _lock:
+        for key, board in _boards.items():
+            if key[0] == chat_id:
+                board.names[user_id] = name
+                board.stale.add(user_id)
+                _by_user.setdefault(user_id, set()).add(key)
+    return new
+
+
+def leave(chat_id: int, user_id: int) -> bool:
+    """Opt a user out of a group's ranking; returns whether they were a member."""
+    from database import remove_group_member
+
+    removed = remove_group_member(chat_id, user_id)
+    with _lock:
+        for key in list(_by_user.get(user_id, ())):
+            if key[0] == chat_id:
+                _boards[key].remove_member(user_id)
+                _by_user[user_id].discard(key)
+    return removed
+
+
+def record(user_id: int, date: dt.date, weight: float) -> None:
+    """Apply a user's new weight for ``date`` to their loaded boards."""
+    with _lock:
+        for key in _by_user.get(user_id, ()):
+            _boards[key].update(user_id, date, weight)
+        for writes in _loading.values():
+            writes.append((user_id, date, weight))
+
+
+def refresh_user(user_id: int) -> None:
+    """Re-read a user's entries before their next ranking (after deletes and bulk writes)."""
+    with _lock:
+        for key in _by_user.get(user_id, ()):
+            _boards[key].stale.add(user_id)
+        for writes in _loading.values():
+            writes.append(("stale", user_id))
+
+
+def reset() -> None:
+    """Forget every loaded board."""
+    with _lock:
+        _boards.clear()
+        _by_user.clear()
@@ -0,0 +1,113 @@
+"""Logging configuration: leveled, structured and non-blocking.
+
+Modules log through ``logging.getLogger(__name__)`` and pass structured
+fields with ``extra`` (``user_id``, ``command``, ``duration_ms``...).
+``setup_logging`` routes every record through a queue: the calling code
+only enqueues it, and a background QueueListener thread formats and
+writes it, so slow stdout never blocks the event loop.
+
+LOG_FORMAT=json writes one JSON object per line with the extra fields as
+keys; LOG_FORMAT=text writes a readable line with them appended as
+``key=value``. Debug output is only emitted with LOG_LEVEL=DEBUG.
+"""
+
+import atexit
+import datetime as dt
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from typing import Optional
+
+from config import LOG_LEVEL, LOG_FORMAT
+
+# Attributes every LogRecord has; anything else came from ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS and not k.startswith("_")}
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records with their message resolved but fields kept apart.
+
+    The stock handler folds the traceback into the message; keeping it in
+    ``exc_text`` lets the JSON formatter put it in its own field.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": dt.datetime.fromtimestamp(record.created, dt.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with the extra fields appended as key=value."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT) -> None:
+    """Send all logging through a queue to a formatted stdout handler.
+
+    Safe to call more than once; later calls only change the level.
+    """
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_QueueHandler(log_queue))
+    # Per-request HTTP lines from the Telegram client are noise at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
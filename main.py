@@ -9,22 +9,43 @@ Installation:
 Usage:
     export TELEGRAM_TOKEN="<TU_TOKEN>"
     python main.py
+
+Webhook mode:
+    export BOT_MODE=webhook WEBHOOK_URL="https://<host>" WEBHOOK_SECRET="<secret>"
+    python main.py
 """
 
+import startup  # first, so the import time of everything below is measured
+
+import logging
 import signal
 import sys
 import asyncio
 from telegram.ext import (
     AIORateLimiter,
     ApplicationBuilder,
+    CallbackQueryHandler,
     CommandHandler,
     MessageHandler,
     filters,
     PicklePersistence,
 )
 
-from config import TOKEN, validate_config
-from database import init_db, get_all_user_ids
+from config import (
+    TOKEN,
+    TELEGRAM_API_URL,
+    BOT_MODE,
+    WEBHOOK_URL,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    CONCURRENT_UPDATES,
+    PROFILE_UPDATES,
+    METRICS_PORT,
+    validate_config,
+)
+from database import init_db
 from backup_manager import restore_if_needed, auto_backup
 from handlers import (
     start,
@@ -37,52 +58,78 @@ from handlers import (
     unknown_cmd,
     silenciar_cmd,
     notificar_cmd,
+    importar_cmd,
+    document_listener,
+    exportar_cmd,
+    historial_cmd,
+    tendencia_cmd,
+    objetivo_cmd,
+    racha_cmd,
+    confirm_weight_callback,
+    revisar_cmd,
+    review_callback,
+    stats_cmd,
+    perfil_cmd,
+    global_cmd,
+    unirme_cmd,
+    salir_cmd,
+    ranking_cmd,
 )
-from jobs import register_jobs
+from admission import chart_admission
+from jobs import register_maintenance_jobs, schedule_startup
+from logging_setup import setup_logging
+from metrics import TimedRequest, start_http_server
+import profiling
+from update_processor import PerUserUpdateProcessor
+
+logger = logging.getLogger(__name__)
 
 
 async def shutdown(app):
     """Graceful shutdown function."""
-    print("🛑 Shutting down bot gracefully...")
+    logger.info("Shutting down bot gracefully")
     await app.stop()
     await app.shutdown()
 
 def signal_handler(signum, frame):
     """Handle shutdown signals."""
-    print(f"📡 Received signal {signum}, shutting down...")
+    logger.info("Received signal %s, shutting down", signum)
     sys.exit(0)
 
-def main() -> None:
-    """Initialize and run the Telegram bot."""
-    # Set up signal handlers for graceful shutdown
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-    
-    # Validate configuration
-    validate_config()
-    
-    # Try to restore from backup if database doesn't exist
-    restore_if_needed()
-    
-    # Initialize database
-    init_db()
+def profile_signal_handler(signum, frame):
+    """Profile the next PROFILE_UPDATES updates/jobs (SIGUSR1); the report path is logged."""
+    if not profiling.start(PROFILE_UPDATES):
+        logger.warning("Profiling already running, SIGUSR1 ignored")
 
+def build_application(persistence_path: str = "bot_data.pkl"):
+    """Build the bot application with persistence, rate limiting and concurrent updates."""
     # Set up persistence for jobs and user data
-    persistence = PicklePersistence(filepath="bot_data.pkl")
+    persistence = PicklePersistence(filepath=persistence_path)
 
-    # Build application
-    app = (
+    return (
         ApplicationBuilder()
         .token(TOKEN)
+        .base_url(f"{TELEGRAM_API_URL}/bot")
+        .base_file_url(f"{TELEGRAM_API_URL}/file/bot")
         .persistence(persistence)
         .rate_limiter(AIORateLimiter())
+        # Times every Bot API call by method (sendPhoto, sendMessage...) for /metrics
+        .request(TimedRequest(connection_pool_size=256))
+        .concurrent_updates(PerUserUpdateProcessor(CONCURRENT_UPDATES))
         .build()
     )
 
-    # Register jobs for all users on startup
-    for user_id in get_all_user_ids():
-        register_jobs(app, user_id)
 
+def log_queue_stats(app) -> None:
+    """Log the update and chart queue wait statistics."""
+    processor = app.update_processor
+    if isinstance(processor, PerUserUpdateProcessor):
+        logger.info("Update queue stats", extra={"wait": processor.waits.snapshot(), "dropped": processor.dropped})
+    logger.info("Chart queue stats", extra=chart_admission.snapshot())
+
+
+def add_handlers(app) -> None:
+    """Register every command and message handler."""
     # Add command handlers
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("help", help_cmd))
@@ -90,29 +137,108 @@ def main() -> None:
     app.add_handler(CommandHandler("mensual", mensual_cmd))
     app.add_handler(CommandHandler("semanal", semanal_cmd))
     app.add_handler(CommandHandler("diario", diario_cmd))
+    app.add_handler(CommandHandler("historial", historial_cmd))
+    app.add_handler(CommandHandler("rango", historial_cmd))
+    app.add_handler(CommandHandler("tendencia", tendencia_cmd))
+    app.add_handler(CommandHandler("objetivo", objetivo_cmd))
+    app.add_handler(CommandHandler("racha", racha_cmd))
+    app.add_handler(CommandHandler("revisar", revisar_cmd))
     app.add_handler(CommandHandler("silenciar", silenciar_cmd))
     app.add_handler(CommandHandler("notificar", notificar_cmd))
-
-    # Add message handler for numeric input
-    app.add_handler(MessageHandler(filters.TEXT & (~filters.COMMAND), numeric_listener))
-
-    # Add handler for unknown commands
-    app.add_handler(MessageHandler(filters.COMMAND, unknown_cmd))
-
-    # Start polling with graceful shutdown
-    print("🤖 Bot started. Press Ctrl+C to stop.")
-    try:
+    app.add_handler(CommandHandler("importar", importar_cmd))
+    app.add_handler(CommandHandler("exportar", exportar_cmd))
+    app.add_handler(CommandHandler("stats", stats_cmd))
+    app.add_handler(CommandHandler("perfil", perfil_cmd))
+    app.add_handler(CommandHandler("global", global_cmd))
+
+    # Group chats: opt in to and show the group ranking
+    app.add_handler(CommandHandler("unirme", unirme_cmd))
+    app.add_handler(CommandHandler("salir", salir_cmd))
+    app.add_handler(CommandHandler("ranking", ranking_cmd))
+
+    # Add message handler for numeric input (weights are logged in private chats only)
+    app.add_handler(MessageHandler(filters.ChatType.PRIVATE & filters.TEXT & (~filters.COMMAND), numeric_listener))
+
+    # Inline buttons of the suspicious weight confirmation and of /revisar
+    app.add_handler(CallbackQueryHandler(confirm_weight_callback, pattern=r"^peso:"))
+    app.add_handler(CallbackQueryHandler(review_callback, pattern=r"^revisar:"))
+
+    # Add handler for uploaded history documents (/importar)
+    app.add_handler(MessageHandler(filters.ChatType.PRIVATE & filters.Document.ALL, document_listener))
+
+    # Add handler for unknown commands (in groups they may be meant for other bots)
+    app.add_handler(MessageHandler(filters.ChatType.PRIVATE & filters.COMMAND, unknown_cmd))
+
+
+def run_application(app) -> None:
+    """Receive updates by polling or through the webhook server, per BOT_MODE."""
+    if BOT_MODE == "webhook":
+        logger.info("Webhook server listening on %s:%s/%s", WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH)
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=["message", "callback_query"],
+            drop_pending_updates=True,
+            close_loop=False,
+        )
+    else:
         app.run_polling(
             allowed_updates=["message", "callback_query"],
             drop_pending_updates=True,  # Ignore old messages during startup
             close_loop=False
         )
+
+
+def main() -> None:
+    """Initialize and run the Telegram bot."""
+    startup.mark("imports")
+    setup_logging()
+
+    # Set up signal handlers for graceful shutdown
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, profile_signal_handler)
+    
+    # Validate configuration
+    validate_config()
+    
+    # Try to restore from backup if database doesn't exist
+    restore_if_needed()
+    startup.mark("restore")
+    
+    # Initialize database
+    init_db()
+    startup.mark("init_db")
+
+    start_http_server(METRICS_PORT)
+
+    # Build application
+    app = build_application()
+
+    # Once polling has started: register every user's jobs in batches and
+    # warm the profile and series caches (see jobs.startup_job)
+    schedule_startup(app)
+    # Nightly archival of cold history
+    register_maintenance_jobs(app)
+
+    add_handlers(app)
+    startup.mark("build")
+
+    # Start receiving updates with graceful shutdown
+    logger.info("Bot started. Press Ctrl+C to stop.")
+    try:
+        run_application(app)
     except KeyboardInterrupt:
-        print("🛑 Received interrupt signal, shutting down...")
-    except Exception as e:
-        print(f"❌ Error running bot: {e}")
+        logger.info("Received interrupt signal, shutting down")
+    except Exception:
+        logger.exception("Error running bot")
     finally:
-        print("👋 Bot stopped.")
+        log_queue_stats(app)
+        logger.info("Bot stopped")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,301 @@
+"""In-process metrics: latency histograms and counters with a Prometheus endpoint.
+
+Handlers, jobs, database queries, chart renders, Telegram API calls and
+backup operations are wrapped with ``timed``, which records the duration
+of every call (and counts the ones that raise) under the function's name:
+
+    @timed(DB_SECONDS)
+    def get_weights(...): ...
+
+``render()`` produces the Prometheus text format, served on
+``METRICS_HOST:METRICS_PORT/metrics`` by ``start_http_server`` and
+summarised for admins by ``/stats``.
+"""
+
+import asyncio
+import bisect
+import contextvars
+import functools
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from telegram.request import HTTPXRequest
+
+from config import METRICS_HOST, METRICS_PORT
+import profiling
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from fast SQLite queries to slow uploads
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: List["_Metric"] = []
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()  # renders and queries also run in worker threads
+        _registry.append(self)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def expose(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonic count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}" for labels, value in items]
+
+
+class Gauge(_Metric):
+    """Value read from a callback at scrape time (queue lengths, in-flight jobs)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float]):
+        super().__init__(name, help_text)
+        self._read = read
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {self._read():g}"]
+
+
+class _Series:
+    __slots__ = ("buckets", "count", "sum")
+
+    def __init__(self, size: int):
+        self.buckets = [0] * size
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram(_Metric):
+    """Latency distribution per label set over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.bounds = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], _Series] = {}
+
+    def observe(self, seconds: float, *labels: str) -> None:
+        # The last slot counts observations above the largest bound (+Inf)
+        index = bisect.bisect_left(self.bounds, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = _Series(len(self.bounds) + 1)
+            series.buckets[index] += 1
+            series.count += 1
+            series.sum += seconds
+
+    def summary(self) -> List[Tuple[Tuple[str, ...], int, float, float]]:
+        """(labels, count, total seconds, approximate p95) per label set, slowest total first."""
+        with self._lock:
+            items = [(labels, s.count, s.sum, list(s.buckets)) for labels, s in self._series.items()]
+        result = []
+        for labels, count, total, buckets in items:
+            target, seen, p95 = 0.95 * count, 0, float("inf")
+            for bound, n in zip(self.bounds, buckets):
+                seen += n
+                if seen >= target:
+                    p95 = bound
+                    break
+            result.append((labels, count, total, p95))
+        return sorted(result, key=lambda r: r[2], reverse=True)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((labels, list(s.buckets), s.count, s.sum) for labels, s in self._series.items())
+        lines = []
+        for labels, buckets, count, total in items:
+            cumulative = 0
+            for bound, n in zip(self.bounds, buckets):
+                cumulative += n
+                le = 'le="%g"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+HANDLER_SECONDS = Histogram("bot_handler_seconds", "Time spent in command, message and button handlers", ("handler",))
+JOB_SECONDS = Histogram("bot_job_seconds", "Time spent in scheduled jobs", ("job",))
+DB_SECONDS = Histogram("bot_db_query_seconds", "Time spent in database queries", ("query",))
+RENDER_SECONDS = Histogram("bot_chart_render_seconds", "Time spent rendering charts", ("chart",))
+TELEGRAM_SECONDS = Histogram("bot_telegram_request_seconds", "Duration of Telegram Bot API requests (uploads included)", ("method",))
+BACKUP_SECONDS = Histogram("bot_backup_seconds", "Duration of backup operations", ("operation",))
+UPDATE_WAIT_SECONDS = Histogram("bot_update_wait_seconds", "Time updates wait for their user's previous updates")
+CHART_WAIT_SECONDS = Histogram("bot_chart_wait_seconds", "Time chart jobs wait for a render slot")
+ERRORS = Counter("bot_errors_total", "Exceptions raised by timed calls", ("metric", "name"))
+UPDATES_DROPPED = Counter("bot_updates_dropped_total", "Updates dropped because their user had too many pending")
+CHARTS_COALESCED = Counter("bot_charts_coalesced_total", "Chart requests served by an identical one already in flight")
+
+
+# Histograms with a timed call running in this context (see ``timed``)
+_timing: contextvars.ContextVar = contextvars.ContextVar("timing", default=frozenset())
+
+
+def _enter(histogram: Histogram) -> Optional[contextvars.Token]:
+    """Mark ``histogram`` as timing; None when an outer call already times it."""
+    outer = _timing.get()
+    if histogram.name in outer:
+        return None
+    return _timing.set(outer | {histogram.name})
+
+
+def timed(histogram: Histogram, name: Optional[str] = None):
+    """Decorator recording each call's duration under ``name`` (default: the function name).
+
+    Works on plain and ``async`` functions; calls that raise are also counted
+    in ``bot_errors_total``. Inside a sampled trace each call is also a span,
+    and plain functions run in worker threads are profiled during a profiling
+    session. A call made inside another call timed into the same histogram
+    (``get_weekly_weights`` reading ``get_weights``) still gets its span but
+    is left out of the histogram, so the work is counted once.
+    """
+
+    def decorator(func):
+        label = name or func.__name__
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                token = _enter(histogram)
+                span = tracing.start_span(label, metric=histogram.name)
+                start = time.perf_counter()
+                error = None
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    error = e
+                    if token is not None:
+                        ERRORS.inc(histogram.name, label)
+                    raise
+                finally:
+                    if token is not None:
+                        histogram.observe(time.perf_counter() - start, label)
+                        _timing.reset(token)
+                    tracing.end_span(span, error)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            token = _enter(histogram)
+            span = tracing.start_span(label, metric=histogram.name)
+            start = time.perf_counter()
+            error = None
+            try:
+                return profiling.call(func, *args, **kwargs)
+            except Exception as e:
+                error = e
+                if token is not None:
+                    ERRORS.inc(histogram.name, label)
+                raise
+            finally:
+                if token is not None:
+                    histogram.observe(time.perf_counter() - start, label)
+                    _timing.reset(token)
+                tracing.end_span(span, error)
+        return wrapper
+
+    return decorator
+
+
+class TimedRequest(HTTPXRequest):
+    """Bot API client recording each request's duration by API method (sendPhoto...).
+
+    Rate limiter waits happen before the request, so only the HTTP round
+    trip and upload are measured.
+    """
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        span = tracing.start_span(api_method, metric=TELEGRAM_SECONDS.name)
+        start = time.perf_counter()
+        error = None
+        try:
+            return await super().do_request(url, method, *args, **kwargs)
+        except Exception as e:
+            error = e
+            ERRORS.inc(TELEGRAM_SECONDS.name, api_method)
+            raise
+        finally:
+            TELEGRAM_SECONDS.observe(time.perf_counter() - start, api_method)
+            tracing.end_span(span, error)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(metric.expose() for metric in _registry) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would flood the log
+
+
+def start_http_server(port: int = METRICS_PORT, host: str = METRICS_HOST) -> Optional[ThreadingHTTPServer]:
+    """Serve ``/metrics`` from a daemon thread; does nothing when ``port`` is 0."""
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.warning("Metrics endpoint not started: %s", e, extra={"port": port})
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info("Metrics endpoint listening on %s:%d/metrics", host, port)
+    return server
@@ -0,0 +1,91 @@
+"""Detection of suspicious weight entries (typos like 724 for 72.4).
+
+A value is suspicious when it is further from the median of the user's
+last OUTLIER_WINDOW weights than OUTLIER_THRESHOLD robust standard
+deviations (1.4826 * MAD, floored at OUTLIER_MIN_SPREAD kg), plus an
+allowance of OUTLIER_DAILY_DRIFT kg for every day since the last entry.
+
+The window is kept in the user's trend state (``TrendState.recent``), so
+checking a new entry costs O(OUTLIER_WINDOW) = O(1). ``scan`` applies the
+same rule to a whole history at once with NumPy.
+"""
+
+import datetime as dt
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from config import OUTLIER_WINDOW, OUTLIER_THRESHOLD, OUTLIER_MIN_SPREAD, OUTLIER_DAILY_DRIFT
+from trend import TrendState
+
+MIN_WINDOW = 5  # fewer previous entries than this and nothing is flagged
+MAD_SCALE = 1.4826  # MAD to standard deviation for normal data
+
+
+@dataclass
+class Suspicion:
+    """Why an entry looks wrong, and a likely intended value if there is one."""
+
+    date: dt.date
+    weight: float
+    median: float
+    limit: float
+    suggestion: Optional[float] = None
+
+
+def _limit(spread: float, gap_days: float) -> float:
+    return OUTLIER_THRESHOLD * max(spread, OUTLIER_MIN_SPREAD) + OUTLIER_DAILY_DRIFT * max(gap_days, 0)
+
+
+def _suggest(weight: float, median: float, limit: float) -> Optional[float]:
+    """A misplaced decimal point that brings the value back in range."""
+    for candidate in (weight / 10, weight * 10, weight / 100):
+        if abs(candidate - median) <= limit:
+            return round(candidate, 1)
+    return None
+
+
+def check(state: Optional[TrendState], date: dt.date, weight: float) -> Optional[Suspicion]:
+    """Check a new entry against the user's recent window; None if it looks fine."""
+    if state is None or len(state.recent) < MIN_WINDOW:
+        return None
+    window = np.asarray(state.recent, dtype=float)
+    median = float(np.median(window))
+    spread = MAD_SCALE * float(np.median(np.abs(window - median)))
+    limit = _limit(spread, (date - state.last_date).days)
+    if abs(weight - median) <= limit:
+        return None
+    return Suspicion(date, weight, median, limit, _suggest(weight, median, limit))
+
+
+def scan(dates: Sequence[dt.date], weights: Sequence[float]) -> List[Suspicion]:
+    """Flag every entry of a history (sorted by date) that ``check`` would flag.
+
+    Each entry is compared with the OUTLIER_WINDOW entries before it (at
+    least MIN_WINDOW); all windows are evaluated in one vectorized pass.
+    """
+    n = len(weights)
+    if n <= MIN_WINDOW:
+        return []
+    y = np.asarray(weights, dtype=float)
+    days = np.fromiter((d.toordinal() for d in dates), dtype=float, count=n)
+
+    # Pad the front with NaN so every entry has a full window of previous values;
+    # nanmedian then ignores the padding for the first entries
+    padded = np.concatenate([np.full(OUTLIER_WINDOW, np.nan), y[:-1]])
+    windows = sliding_window_view(padded, OUTLIER_WINDOW)[MIN_WINDOW:]  # the entries before each checked one
+    values = y[MIN_WINDOW:]
+    gaps = (days[1:] - days[:-1])[MIN_WINDOW - 1:]
+
+    medians = np.nanmedian(windows, axis=1)
+    spreads = MAD_SCALE * np.nanmedian(np.abs(windows - medians[:, None]), axis=1)
+    limits = OUTLIER_THRESHOLD * np.maximum(spreads, OUTLIER_MIN_SPREAD) + OUTLIER_DAILY_DRIFT * gaps
+    flagged = np.nonzero(np.abs(values - medians) > limits)[0]
+
+    return [
+        Suspicion(dates[i + MIN_WINDOW], float(values[i]), float(medians[i]), float(limits[i]),
+                  _suggest(float(values[i]), float(medians[i]), float(limits[i])))
+        for i in flagged
+    ]
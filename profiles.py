@@ -0,0 +1,146 @@
+"""In-memory cache of user profiles (language and reminder preferences)."""
+
+import datetime as dt
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+from database import get_user_profiles, save_user_language, save_user_silenced, save_user_activity, save_user_goal
+from lang.strings import get_strings
+
+DEFAULT_LANGUAGE = "es"
+
+
+@dataclass
+class UserProfile:
+    """Cached preferences for one user."""
+
+    user_id: int
+    language_code: str = DEFAULT_LANGUAGE
+    silenced: bool = False
+    last_active: Optional[dt.date] = None
+    goal_weight: Optional[float] = None
+    stored: bool = False  # whether a user_preferences row exists
+
+
+_profiles: Dict[int, UserProfile] = {}
+# Invalidation counter and, per user, its value when their profile was last dropped (see preload)
+_invalidations = 0
+_invalidated: Dict[int, int] = {}
+_cleared = 0
+
+
+def _from_row(row) -> UserProfile:
+    user_id, language_code, silenced, last_active, goal_weight = row
+    return UserProfile(
+        user_id=user_id,
+        language_code=language_code or DEFAULT_LANGUAGE,
+        silenced=bool(silenced),
+        last_active=dt.date.fromisoformat(last_active) if last_active else None,
+        goal_weight=goal_weight,
+        stored=True,
+    )
+
+
+def load_profiles(user_ids: Optional[Iterable[int]] = None) -> int:
+    """Bulk-load profiles into the cache (all of them when ``user_ids`` is None).
+
+    Returns the number of profiles loaded.
+    """
+    rows = get_user_profiles(user_ids)
+    for row in rows:
+        _profiles[row[0]] = _from_row(row)
+    return len(rows)
+
+
+def write_mark() -> int:
+    """Take before reading profiles for ``preload``."""
+    return _invalidations
+
+
+def preload(rows: Iterable[tuple], mark: int) -> int:
+    """Cache profile rows read in the background while updates are being handled.
+
+    Profiles already cached, or changed since ``mark`` (the ``write_mark()``
+    taken before the rows were read), are left alone: the row could be older
+    than the change. Returns the number of profiles added.
+    """
+    added = 0
+    for row in rows:
+        user_id = row[0]
+        if user_id in _profiles or _cleared > mark or _invalidated.get(user_id, 0) > mark:
+            continue
+        _profiles[user_id] = _from_row(row)
+        added += 1
+    return added
+
+
+def get_profile(user_id: int) -> UserProfile:
+    """Return the cached profile, loading it from the database on a miss."""
+    profile = _profiles.get(user_id)
+    if profile is None:
+        rows = get_user_profiles([user_id])
+        # Users without a row get a default profile so misses aren't retried
+        profile = _from_row(rows[0]) if rows else UserProfile(user_id=user_id)
+        _profiles[user_id] = profile
+    return profile
+
+
+def invalidate(user_id: Optional[int] = None) -> None:
+    """Drop one cached profile, or the whole cache."""
+    global _invalidations, _cleared
+    _invalidations += 1
+    if user_id is None:
+        _profiles.clear()
+        _invalidated.clear()
+        _cleared = _invalidations
+    else:
+        _profiles.pop(user_id, None)
+        _invalidated[user_id] = _invalidations
+
+
+def cached_count() -> int:
+    """Number of profiles currently cached."""
+    return len(_profiles)
+
+
+def set_language(user_id: int, language_code: str) -> None:
+    """Store the user's language, writing to the database only when it changes."""
+    profile = get_profile(user_id)
+    if profile.stored and profile.language_code == language_code:
+        return
+    save_user_language(user_id, language_code)
+    invalidate(user_id)
+
+
+def set_silenced(user_id: int, silenced: bool) -> None:
+    """Store whether the user silenced the morning reminder."""
+    save_user_silenced(user_id, silenced)
+    invalidate(user_id)
+
+
+def set_goal(user_id: int, goal_weight: Optional[float]) -> None:
+    """Store the user's goal weight (None clears it)."""
+    save_user_goal(user_id, goal_weight)
+    invalidate(user_id)
+
+
+def touch(user_id: int, today: dt.date) -> None:
+    """Record activity; the database is written at most once per user and day."""
+    profile = get_profile(user_id)
+    if profile.last_active == today:
+        return
+    save_user_activity(user_id, today)
+    invalidate(user_id)
+
+
+def get_user_strings(user_id: int, fallback_code: Optional[str] = None):
+    """Strings in the user's stored language.
+
+    Users without a stored preference get ``fallback_code`` (usually the
+    Telegram client language), which is then saved for later lookups.
+    """
+    profile = get_profile(user_id)
+    if not profile.stored and fallback_code:
+        set_language(user_id, fallback_code)
+        profile = get_profile(user_id)
+    return get_strings(profile.language_code)
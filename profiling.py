@@ -0,0 +1,195 @@
+"""On-demand profiling of the running bot.
+
+``start(count)`` turns on cProfile for the next ``count`` updates or jobs
+and, optionally, tracemalloc. When they are done the session writes to
+PROFILE_DIR:
+
+* ``profile_<ts>.pstats``: the raw stats (``python -m pstats`` or snakeviz);
+* ``profile_<ts>.txt``: the top functions by cumulative and own time,
+  followed by the biggest memory growth between the tracemalloc snapshots
+  taken at the start and the end of the session.
+
+Sessions are deterministic, not sampled: every call made during the next
+``count`` units is recorded, and nothing is measured between sessions.
+The event loop thread is profiled for the whole session, so concurrent
+updates all show up. Timed calls running in worker threads (chart renders,
+backups, queries sent to ``asyncio.to_thread``) are profiled one call at a
+time and merged into the same stats. From Python 3.12 cProfile is built on
+the process-wide ``sys.monitoring``: the event loop's profiler then sees
+every thread, and a second profiler can't be enabled, so worker threads
+get none of their own.
+
+Sessions are started by the admin ``/perfil`` command, which gets the
+report in the chat, or by ``SIGUSR1`` (see main.py), which only logs the
+file paths.
+"""
+
+import asyncio
+import cProfile
+import datetime as dt
+import functools
+import gc
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional
+
+from config import PROFILE_DIR, PROFILE_TOP
+
+logger = logging.getLogger(__name__)
+
+TRACEMALLOC_FRAMES = 10
+# Before 3.12 a profiler only sees the thread that enabled it
+THREAD_PROFILES = sys.version_info < (3, 12)
+
+
+@dataclass
+class ProfileReport:
+    units: int
+    seconds: float
+    stats_path: str
+    summary_path: str
+    summary: str
+
+
+class _Session:
+    def __init__(self, count: int, memory: bool, on_finish: Optional[Callable[[ProfileReport], Awaitable[None]]]):
+        self.remaining = count
+        self.count = count
+        self.memory = memory
+        self.on_finish = on_finish
+        self.loop_thread = threading.get_ident()
+        self.loop_profile = cProfile.Profile()
+        self.thread_profiles: List[cProfile.Profile] = []
+        self.started = dt.datetime.now()
+        self.own_tracemalloc = False
+        self.snapshot = None
+        self.lock = threading.Lock()
+
+    def begin(self) -> None:
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                self.own_tracemalloc = True
+            gc.collect()
+            self.snapshot = tracemalloc.take_snapshot()
+        self.loop_profile.enable()
+
+    def end(self) -> ProfileReport:
+        self.loop_profile.disable()
+        seconds = (dt.datetime.now() - self.started).total_seconds()
+        stats = pstats.Stats(self.loop_profile)
+        with self.lock:
+            for profile in self.thread_profiles:
+                stats.add(profile)
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, f"profile_{self.started.strftime('%Y%m%d_%H%M%S')}")
+        stats.dump_stats(base + ".pstats")
+
+        out = io.StringIO()
+        out.write(f"{self.count - max(self.remaining, 0)} updates/jobs in {seconds:.1f} s\n\n")
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+        stats.sort_stats("tottime").print_stats(PROFILE_TOP)
+        if self.snapshot is not None:
+            gc.collect()
+            diff = tracemalloc.take_snapshot().compare_to(self.snapshot, "lineno")
+            out.write(f"Memory growth (top {PROFILE_TOP} lines):\n")
+            for stat in diff[:PROFILE_TOP]:
+                out.write(f"{stat}\n")
+            if self.own_tracemalloc:
+                tracemalloc.stop()
+        summary = out.getvalue()
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(summary)
+        return ProfileReport(self.count - max(self.remaining, 0), seconds, base + ".pstats", base + ".txt", summary)
+
+
+_session: Optional[_Session] = None
+_in_thread_profile = threading.local()
+
+
+def active() -> bool:
+    return _session is not None
+
+
+def start(count: int, memory: bool = True, on_finish: Optional[Callable[[ProfileReport], Awaitable[None]]] = None) -> bool:
+    """Profile the next ``count`` updates or jobs; False if a session is already running.
+
+    Must be called from the event loop thread. ``on_finish`` is awaited with
+    the report when the session ends.
+    """
+    global _session
+    if _session is not None:
+        return False
+    _session = _Session(count, memory, on_finish)
+    _session.begin()
+    logger.info("Profiling the next %d updates/jobs", count, extra={"memory": memory})
+    return True
+
+
+def stop() -> Optional[ProfileReport]:
+    """End the current session now and write its report."""
+    global _session
+    session, _session = _session, None
+    if session is None:
+        return None
+    report = session.end()
+    logger.info("Profile written", extra={"stats": report.stats_path, "summary": report.summary_path, "units": report.units})
+    if session.on_finish is not None:
+        try:
+            asyncio.get_running_loop().create_task(session.on_finish(report))
+        except RuntimeError:
+            pass  # no loop (e.g. stopped from a script): the files are on disk
+    return report
+
+
+def unit_done() -> None:
+    """Count a finished update or job towards the running session."""
+    session = _session
+    if session is None:
+        return
+    session.remaining -= 1
+    if session.remaining <= 0:
+        stop()
+
+
+def counted(func):
+    """Decorator for job callbacks: each run counts as one unit of a session."""
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            unit_done()
+
+    return wrapper
+
+
+def call(func, *args, **kwargs):
+    """Run ``func``, under its own profiler when a session is running and this is a worker thread."""
+    session = _session
+    if (session is None or not THREAD_PROFILES or threading.get_ident() == session.loop_thread
+            or getattr(_in_thread_profile, "on", False)):
+        return func(*args, **kwargs)
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Another profiler holds the interpreter-wide hook; run unprofiled rather than fail
+        return func(*args, **kwargs)
+    _in_thread_profile.on = True
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profile.disable()
+        _in_thread_profile.on = False
+        with session.lock:
+            session.thread_profiles.append(profile)
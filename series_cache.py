@@ -0,0 +1,125 @@
+"""In-memory cache of the recent daily weights of each user.
+
+Reports only look at the last months, so ``database.get_weights`` keeps
+every user's last ``SERIES_CACHE_DAYS`` days in memory once read (or once
+preloaded by the startup warm-up) and answers ranges inside that window
+without touching SQLite. The write functions of ``database`` keep cached
+series up to date. At most ``SERIES_CACHE_USERS`` users are cached; the
+least recently used are evicted first.
+
+A series read from the database while the same user's weight is being
+written could be stale by the time it is cached, so readers take a
+``write_mark()`` before reading and ``put`` ignores series of users written
+since then.
+"""
+
+import bisect
+import datetime as dt
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import SERIES_CACHE_DAYS, SERIES_CACHE_USERS
+from metrics import Counter, Gauge
+
+
+class _Series:
+    __slots__ = ("since", "dates", "weights")
+
+    def __init__(self, since: dt.date, rows: Sequence[Tuple[dt.date, float]]):
+        self.since = since
+        self.dates = [d for d, _ in rows]
+        self.weights = [w for _, w in rows]
+
+
+_series: "OrderedDict[int, _Series]" = OrderedDict()
+_lock = threading.Lock()
+_writes = 0
+_written: Dict[int, int] = {}  # user_id -> value of _writes at their last write
+_cleared = 0  # value of _writes at the last invalidate()
+
+LOOKUPS = Counter("bot_series_cache_lookups_total", "get_weights calls by series cache result", ("result",))
+Gauge("bot_series_cache_users", "Users whose recent weights are cached", lambda: len(_series))
+
+
+def window_start(today: Optional[dt.date] = None) -> dt.date:
+    """First day of the cached window."""
+    return (today or dt.datetime.now().date()) - dt.timedelta(days=SERIES_CACHE_DAYS)
+
+
+def enabled() -> bool:
+    return SERIES_CACHE_USERS > 0
+
+
+def write_mark() -> int:
+    """Take before reading a series from the database; pass it to ``put``."""
+    return _writes
+
+
+def get(user_id: int, start: dt.date, end: dt.date) -> Optional[List[Tuple[dt.date, float]]]:
+    """Entries between ``start`` and ``end`` (inclusive), or None if they aren't cached."""
+    with _lock:
+        series = _series.get(user_id)
+        if series is None or start < series.since:
+            LOOKUPS.inc("miss")
+            return None
+        _series.move_to_end(user_id)
+        lo = bisect.bisect_left(series.dates, start)
+        hi = bisect.bisect_right(series.dates, end)
+        result = list(zip(series.dates[lo:hi], series.weights[lo:hi]))
+    LOOKUPS.inc("hit")
+    return result
+
+
+def put(user_id: int, since: dt.date, rows: Sequence[Tuple[dt.date, float]], mark: int) -> bool:
+    """Cache a user's entries from ``since`` on, oldest first; returns whether they were stored."""
+    if not enabled():
+        return False
+    with _lock:
+        if _cleared > mark or _written.get(user_id, 0) > mark:
+            return False
+        _series[user_id] = _Series(since, rows)
+        _series.move_to_end(user_id)
+        while len(_series) > SERIES_CACHE_USERS:
+            _series.popitem(last=False)
+    return True
+
+
+def update(user_id: int, date: dt.date, weight: Optional[float]) -> None:
+    """Apply a written day (``weight`` None: the day was deleted)."""
+    global _writes
+    with _lock:
+        _writes += 1
+        _written[user_id] = _writes
+        series = _series.get(user_id)
+        if series is None or date < series.since:
+            return
+        i = bisect.bisect_left(series.dates, date)
+        present = i < len(series.dates) and series.dates[i] == date
+        if weight is None:
+            if present:
+                del series.dates[i]
+                del series.weights[i]
+        elif present:
+            series.weights[i] = weight
+        else:
+            series.dates.insert(i, date)
+            series.weights.insert(i, weight)
+
+
+def invalidate(user_id: Optional[int] = None) -> None:
+    """Drop one user's series (after bulk writes), or every series."""
+    global _writes, _cleared
+    with _lock:
+        _writes += 1
+        if user_id is None:
+            _series.clear()
+            _written.clear()
+            _cleared = _writes
+        else:
+            _series.pop(user_id, None)
+            _written[user_id] = _writes
+
+
+def cached_users() -> int:
+    return len(_series)
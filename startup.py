@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Cold start timing for the Telegram Weight Tracker Bot.
+
+main.py imports this module first and calls ``mark()`` after each startup
+step (imports, restore, database, profiles...); ``log_report()`` logs the
+time of every step once the bot is receiving updates. Run as a script it
+breaks the import step down per module, like ``python -X importtime``
+sorted by cumulative time:
+
+Usage:
+    python startup.py --top 25
+    python startup.py --module cluster --json
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_started = time.perf_counter()
+_last = _started
+_phases: Dict[str, float] = {}
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def mark(phase: str) -> float:
+    """Record the seconds since the previous mark (or since this module was imported) as ``phase``."""
+    global _last
+    now = time.perf_counter()
+    elapsed = now - _last
+    _phases[phase] = _phases.get(phase, 0.0) + elapsed
+    _last = now
+    return elapsed
+
+
+def report() -> dict:
+    """Milliseconds spent in every marked phase, in order, and since startup."""
+    return {
+        "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in _phases.items()},
+        "total_ms": round((_last - _started) * 1000, 1),
+    }
+
+
+def log_report() -> None:
+    result = report()
+    logger.info("Startup finished in %.0f ms", result["total_ms"], extra=result)
+
+
+@dataclass
+class ImportTime:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(text: str) -> List[ImportTime]:
+    """Parse the stderr of ``python -X importtime``; lines that aren't timings are skipped."""
+    entries = []
+    for line in text.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append(ImportTime(module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def measure_imports(module: str = "main") -> List[ImportTime]:
+    """Import ``module`` in a fresh interpreter with ``-X importtime``, slowest (cumulative) first."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.getenv("PYTHONPATH")])))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, cwd=root, check=True,
+    )
+    return sorted(parse_importtime(result.stderr), key=lambda e: e.cumulative_us, reverse=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main", help="module whose imports are measured")
+    parser.add_argument("--top", type=int, default=25, help="modules listed")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    entries = measure_imports(args.module)
+    total = next((e.cumulative_us for e in entries if e.module == args.module), 0)
+    if args.json:
+        print(json.dumps({"module": args.module, "total_us": total,
+                          "imports": [asdict(e) for e in entries[:args.top]]}))
+        return 0
+    print(f"{'cumulative ms':>13} {'self ms':>8}  module")
+    for entry in entries[:args.top]:
+        print(f"{entry.cumulative_us / 1000:>13.1f} {entry.self_us / 1000:>8.1f}  {'  ' * entry.depth}{entry.module}")
+    print(f"\nimport {args.module}: {total / 1000:.1f} ms, {len(entries)} modules")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""Object storage backends used by the backup manager."""
+
+import importlib.util
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import httpx
+
+# supabase is only imported when the backend is created
+SUPABASE_AVAILABLE = importlib.util.find_spec("supabase") is not None
+
+from config import (
+    BACKUP_BACKEND,
+    BACKUP_BUCKET,
+    BACKUP_LOCAL_DIR,
+    BACKUP_DOWNLOAD_WORKERS,
+)
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+def part_name(name: str, index: int) -> str:
+    """Object name of chunk ``index`` of a multipart object."""
+    return f"{name}.part{index:05d}"
+
+
+class StorageBackend(ABC):
+    """Minimal object storage interface.
+
+    Subclasses implement the single-object primitives; chunked uploads and
+    parallel chunk downloads are built on top of them here.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def upload_file(self, name: str, path: str, content_type: str = "application/octet-stream") -> None:
+        """Store the file at ``path`` as object ``name``, replacing it if present."""
+
+    @abstractmethod
+    def download_file(self, name: str, path: str) -> None:
+        """Write object ``name`` to the file at ``path``."""
+
+    @abstractmethod
+    def read_bytes(self, name: str) -> bytes:
+        """Return the content of object ``name``; raises FileNotFoundError if there is none."""
+
+    @abstractmethod
+    def write_bytes(self, name: str, data: bytes, content_type: str = "application/octet-stream") -> None:
+        """Store ``data`` as object ``name``, replacing it if present."""
+
+    @abstractmethod
+    def list_objects(self) -> List[Dict]:
+        """Return ``{"name": ..., "size": ...}`` for every object."""
+
+    @abstractmethod
+    def remove(self, names: List[str]) -> None:
+        """Delete the given objects."""
+
+    def upload_chunked(self, name: str, path: str, chunk_size: int) -> int:
+        """Upload ``path`` as a single object, or as parts if larger than ``chunk_size``.
+
+        Returns the number of parts written (0 for a single object).
+        """
+        if os.path.getsize(path) <= chunk_size:
+            self.upload_file(name, path)
+            return 0
+
+        parts = 0
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                self.write_bytes(part_name(name, parts), chunk)
+                parts += 1
+        return parts
+
+    def download_chunked(self, name: str, path: str, parts: int, chunk_size: int,
+                         workers: int = BACKUP_DOWNLOAD_WORKERS) -> None:
+        """Download an object written by ``upload_chunked`` into ``path``.
+
+        Parts are fetched in parallel and written at their offsets, so memory
+        use is bounded by ``workers * chunk_size``.
+        """
+        if not parts:
+            self.download_file(name, path)
+            return
+
+        with open(path, "wb") as f:
+            f.truncate(0)
+
+        def fetch(index: int) -> None:
+            data = self.read_bytes(part_name(name, index))
+            with open(path, "r+b") as out:
+                out.seek(index * chunk_size)
+                out.write(data)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            # list() re-raises the first failed part
+            list(pool.map(fetch, range(parts)))
+
+    def object_names(self, name: str, parts: int) -> List[str]:
+        """All stored object names that make up ``name``."""
+        if not parts:
+            return [name]
+        return [part_name(name, i) for i in range(parts)]
+
+
+class LocalDirectoryBackend(StorageBackend):
+    """Stores objects as files in a local directory."""
+
+    name = "local"
+
+    def __init__(self, root: str = BACKUP_LOCAL_DIR):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _replace_with(self, name: str, write) -> None:
+        """Write an object through a temp file so readers never see it half-written."""
+        fd, temp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(temp_path, self._path(name))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def upload_file(self, name, path, content_type="application/octet-stream"):
+        with open(path, "rb") as src:
+            self._replace_with(name, lambda f: shutil.copyfileobj(src, f, STREAM_CHUNK_SIZE))
+
+    def download_file(self, name, path):
+        shutil.copyfile(self._path(name), path)
+
+    def read_bytes(self, name):
+        with open(self._path(name), "rb") as f:
+            return f.read()
+
+    def write_bytes(self, name, data, content_type="application/octet-stream"):
+        self._replace_with(name, lambda f: f.write(data))
+
+    def list_objects(self):
+        return [
+            {"name": entry.name, "size": entry.stat().st_size}
+            for entry in os.scandir(self.root)
+            if entry.is_file() and not entry.name.endswith(".tmp")
+        ]
+
+    def remove(self, names):
+        for name in names:
+            try:
+                os.unlink(self._path(name))
+            except FileNotFoundError:
+                pass
+
+
+class SupabaseBackend(StorageBackend):
+    """Stores objects in a Supabase Storage bucket."""
+
+    name = "supabase"
+
+    def __init__(self, url: str, key: str, bucket: str = BACKUP_BUCKET):
+        from supabase import create_client
+
+        self.bucket_name = bucket
+        self.client = create_client(url, key)
+
+    def _bucket(self):
+        return self.client.storage.from_(self.bucket_name)
+
+    def upload_file(self, name, path, content_type="application/octet-stream"):
+        with open(path, "rb") as f:
+            self._bucket().upload(
+                path=name,
+                file=f,
+                file_options={"content-type": content_type, "upsert": "true"},
+            )
+
+    def download_file(self, name, path):
+        # Stream through a short-lived signed URL so the object never sits in memory
+        signed = self._bucket().create_signed_url(name, 300)
+        url = signed.get("signedURL") or signed.get("signedUrl")
+        with httpx.stream("GET", url, timeout=60) as response, open(path, "wb") as f:
+            response.raise_for_status()
+            for chunk in response.iter_bytes(STREAM_CHUNK_SIZE):
+                f.write(chunk)
+
+    def read_bytes(self, name):
+        try:
+            return self._bucket().download(name)
+        except Exception as e:
+            # storage3's StorageApiError; the status is a string in some versions
+            if getattr(e, "code", None) in ("not_found", "NoSuchKey") or str(getattr(e, "status", "")) == "404":
+                raise FileNotFoundError(name) from e
+            raise
+
+    def write_bytes(self, name, data, content_type="application/octet-stream"):
+        self._bucket().upload(
+            path=name,
+            file=data,
+            file_options={"content-type": content_type, "upsert": "true"},
+        )
+
+    def list_objects(self):
+        return [
+            {"name": f["name"], "size": (f.get("metadata") or {}).get("size")}
+            for f in self._bucket().list()
+        ]
+
+    def remove(self, names):
+        if names:
+            self._bucket().remove(list(names))
+
+
+def create_backend() -> Optional[StorageBackend]:
+    """Build the storage backend selected by ``BACKUP_BACKEND``, or None if unavailable."""
+    if BACKUP_BACKEND == "local":
+        return LocalDirectoryBackend(BACKUP_LOCAL_DIR)
+
+    from config import SUPABASE_URL, SUPABASE_ANON_KEY
+    if SUPABASE_AVAILABLE and SUPABASE_URL and SUPABASE_ANON_KEY:
+        return SupabaseBackend(SUPABASE_URL, SUPABASE_ANON_KEY, BACKUP_BUCKET)
+    return None
@@ -0,0 +1,181 @@
+"""Logging consistency: streaks, weekly adherence and missed days.
+
+The consistency of a user is summarised by a small ``StreakState``:
+
+* ``current`` is the number of consecutive days ending at ``last_date``
+  that have an entry, and ``longest`` the longest such run;
+* ``missed`` counts the days without an entry from the first entry up to
+  ``settled``: each new day counts the gap since the previous one, and the
+  daily reminder pass counts the days of users who stopped logging;
+* ``week_days`` / ``prev_week_days`` are the days with an entry in the
+  week (Monday to Sunday) starting on ``week_start`` and in the one before.
+
+``update`` folds a new latest day into a state in O(1) and ``settle``
+counts missed days up to a given day; ``backfill`` builds the states of
+many users at once with NumPy, and ``recompute`` the state of one user,
+for changes to older days. This module only does the math; the state is
+stored by ``database``.
+"""
+
+import datetime as dt
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+
+def week_start(date: dt.date) -> dt.date:
+    """Monday of the week of ``date``."""
+    return date - dt.timedelta(days=date.weekday())
+
+
+@dataclass
+class StreakState:
+    """Consistency of one user as of ``last_date`` (missed days as of ``settled``)."""
+
+    first_date: dt.date
+    last_date: dt.date
+    settled: dt.date
+    current: int = 1
+    longest: int = 1
+    missed: int = 0
+    week_start: Optional[dt.date] = None
+    week_days: int = 1
+    prev_week_days: int = 0
+
+    @classmethod
+    def first(cls, date: dt.date) -> "StreakState":
+        return cls(first_date=date, last_date=date, settled=date, week_start=week_start(date))
+
+    def current_streak(self, today: dt.date) -> int:
+        """The streak as of ``today``: broken when neither today nor yesterday has an entry."""
+        return self.current if self.last_date >= today - dt.timedelta(days=1) else 0
+
+    def missed_days(self, today: dt.date) -> int:
+        """Days without an entry from the first one up to yesterday."""
+        return self.missed + max(0, (today - dt.timedelta(days=1) - self.settled).days)
+
+    def days_logged(self, week: dt.date) -> int:
+        """Days with an entry in the week starting on ``week``."""
+        if week == self.week_start:
+            return self.week_days
+        if week == self.week_start - dt.timedelta(days=7):
+            return self.prev_week_days
+        return 0
+
+    def adherence(self, week: dt.date, today: dt.date) -> float:
+        """Share of the days of a week up to ``today`` (whole week if past) that have an entry."""
+        elapsed = min(7, (today - week).days + 1)
+        return self.days_logged(week) / elapsed if elapsed > 0 else 0.0
+
+
+def update(state: Optional[StreakState], date: dt.date) -> StreakState:
+    """Fold a day with an entry into the state in O(1).
+
+    ``date`` must not be older than ``state.last_date``; the same day again
+    changes nothing.
+    """
+    if state is None:
+        return StreakState.first(date)
+    gap = (date - state.last_date).days
+    if gap < 0:
+        raise ValueError("entry is older than the streak state")
+    if gap == 0:
+        return state
+
+    current = state.current + 1 if gap == 1 else 1
+    if date > state.settled:
+        missed = state.missed + (date - state.settled).days - 1
+    else:
+        # The day was already counted as missed by ``settle``
+        missed = state.missed - 1
+
+    week = week_start(date)
+    if week == state.week_start:
+        week_days, prev_week_days = state.week_days + 1, state.prev_week_days
+    elif week == state.week_start + dt.timedelta(days=7):
+        week_days, prev_week_days = 1, state.week_days
+    else:
+        week_days, prev_week_days = 1, 0
+
+    return replace(
+        state,
+        last_date=date,
+        settled=max(state.settled, date),
+        current=current,
+        longest=max(state.longest, current),
+        missed=missed,
+        week_start=week,
+        week_days=week_days,
+        prev_week_days=prev_week_days,
+    )
+
+
+def settle(state: StreakState, day: dt.date) -> StreakState:
+    """Count the days after the last entry up to ``day`` as missed, in O(1)."""
+    if day <= state.settled:
+        return state
+    return replace(state, missed=state.missed + (day - state.settled).days, settled=day)
+
+
+def backfill(user_ids: np.ndarray, ordinals: np.ndarray) -> Dict[int, StreakState]:
+    """Build the states of many users in one vectorized pass.
+
+    ``user_ids`` and ``ordinals`` (date ordinals of the days with an entry)
+    must be sorted by user and day without repeated days, as in
+    ``analytics.Snapshot``. Gives the same result as calling ``update`` day
+    by day.
+    """
+    n = len(user_ids)
+    if n == 0:
+        return {}
+    new_user = np.ones(n, dtype=bool)
+    new_user[1:] = user_ids[1:] != user_ids[:-1]
+    starts = np.flatnonzero(new_user)
+    ends = np.append(starts[1:], n) - 1
+    counts = ends - starts + 1
+
+    # Runs of consecutive days: the longest one, and the last one is the current streak
+    new_run = new_user.copy()
+    new_run[1:] |= ordinals[1:] != ordinals[:-1] + 1
+    run_starts = np.flatnonzero(new_run)
+    run_lengths = np.diff(np.append(run_starts, n))
+    first_run = np.flatnonzero(new_user[run_starts])
+    longest = np.maximum.reduceat(run_lengths, first_run)
+    current = run_lengths[np.append(first_run[1:], len(run_starts)) - 1]
+
+    first, last = ordinals[starts], ordinals[ends]
+    missed = last - first + 1 - counts
+
+    # Ordinal 1 (January 1st of year 1) is a Monday
+    monday = last - (last - 1) % 7
+    row_monday = np.repeat(monday, counts)
+    group = np.repeat(np.arange(len(starts)), counts)
+    week_days = np.bincount(group, ordinals >= row_monday, minlength=len(starts)).astype(int)
+    prev_week_days = np.bincount(
+        group, (ordinals < row_monday) & (ordinals >= row_monday - 7), minlength=len(starts)
+    ).astype(int)
+
+    states = {}
+    for i, user_id in enumerate(user_ids[starts].tolist()):
+        last_date = dt.date.fromordinal(int(last[i]))
+        states[user_id] = StreakState(
+            first_date=dt.date.fromordinal(int(first[i])),
+            last_date=last_date,
+            settled=last_date,
+            current=int(current[i]),
+            longest=int(longest[i]),
+            missed=int(missed[i]),
+            week_start=dt.date.fromordinal(int(monday[i])),
+            week_days=int(week_days[i]),
+            prev_week_days=int(prev_week_days[i]),
+        )
+    return states
+
+
+def recompute(dates: Sequence[dt.date]) -> Optional[StreakState]:
+    """Build the state of one user from their days with an entry, sorted."""
+    if not len(dates):
+        return None
+    ordinals = np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=len(dates))
+    return backfill(np.zeros(len(dates), dtype=np.int64), ordinals)[0]
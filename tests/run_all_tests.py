@@ -35,7 +35,26 @@ def main():
     test_files = [
         "test_bot.py",
         "test_database.py", 
-        "test_diario.py"
+        "test_diario.py",
+        "test_backup.py",
+        "test_profiles.py",
+        "test_update_processor.py",
+        "test_importer.py",
+        "test_exporter.py",
+        "test_downsample.py",
+        "test_trend.py",
+        "test_outliers.py",
+        "test_logging.py",
+        "test_metrics.py",
+        "test_tracing.py",
+        "test_profiling.py",
+        "test_startup.py",
+        "test_warmup.py",
+        "test_archive.py",
+        "test_analytics.py",
+        "test_leaderboard.py",
+        "test_streaks.py",
+        "test_cluster.py",
     ]
     
     # Filter to only existing files
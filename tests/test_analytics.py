@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""Test script for the columnar analytics snapshot."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datetime as dt
+import random
+import tempfile
+
+import numpy as np
+
+import analytics
+import database
+import series_cache
+
+TODAY = dt.date(2024, 6, 30)
+
+
+def _use_temp_db():
+    old = database.DB_FILE
+    database.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="analytics_test_"), "weights.db")
+    database.init_db()
+    series_cache.invalidate()
+    return old
+
+
+def _random_history(seed=3, users=40):
+    rng = random.Random(seed)
+    history = {}
+    for user_id in range(1000, 1000 + users):
+        day = TODAY - dt.timedelta(days=rng.randint(0, 120))
+        weight = rng.uniform(60, 110)
+        slope = rng.choice((-0.1, 0.0, 0.08))
+        rows = {}
+        while day <= TODAY and len(rows) < rng.randint(1, 200):
+            weight += slope + rng.gauss(0, 0.05)
+            rows[day] = round(weight, 1)
+            day += dt.timedelta(days=rng.choice((1, 1, 1, 2, 4)))
+        history[user_id] = rows
+    return history
+
+
+def _expected(history):
+    """The overview computed user by user, without NumPy."""
+    today = TODAY.toordinal()
+    per_day = [0] * analytics.ACTIVE_DAYS
+    active = streaking = losing = stable = gaining = 0
+    streaks, longest, weekly = [], [], []
+    for rows in history.values():
+        days = sorted(d.toordinal() for d in rows)
+        recent = [d for d in days if d > today - analytics.ACTIVE_DAYS]
+        active += bool(recent)
+        for d in recent:
+            per_day[d - today + analytics.ACTIVE_DAYS - 1] += 1
+        run, best = 1, 1
+        for a, b in zip(days, days[1:]):
+            run = run + 1 if b == a + 1 else 1
+            best = max(best, run)
+        longest.append(best)
+        if days[-1] >= today - 1:
+            streaking += 1
+            streaks.append(run)
+        window = [(d - today, rows[dt.date.fromordinal(d)]) for d in days if d > today - analytics.TREND_DAYS]
+        if len(window) >= analytics.TREND_MIN_ENTRIES:
+            xs, ys = zip(*window)
+            slope = 7 * np.polyfit(xs, ys, 1)[0]
+            weekly.append(slope)
+            if slope < -analytics.STABLE_KG_PER_WEEK:
+                losing += 1
+            elif slope > analytics.STABLE_KG_PER_WEEK:
+                gaining += 1
+            else:
+                stable += 1
+    return analytics.Overview(
+        users=len(history), entries=sum(len(r) for r in history.values()), active_users=active,
+        active_per_day=per_day, streaking=streaking, average_streak=float(np.mean(streaks)),
+        average_longest_streak=float(np.mean(longest)), losing=losing, stable=stable, gaining=gaining,
+        median_weekly_change=float(np.median(weekly)),
+    )
+
+
+def _same(a, b):
+    for field in a.__dataclass_fields__:
+        x, y = getattr(a, field), getattr(b, field)
+        if x != y and not (isinstance(x, float) and abs(x - y) < 1e-6):
+            print(f"✗ {field}: {x} != {y}")
+            return False
+    return True
+
+
+def test_overview():
+    """Vectorized statistics match a plain per-user computation."""
+    print("Testing the global overview...")
+    old = _use_temp_db()
+    try:
+        history = _random_history()
+        for user_id, rows in history.items():
+            database.save_weights_bulk(user_id, rows.items())
+        stats = analytics.overview(analytics.Snapshot.load(batch_size=97), TODAY)
+        if not _same(stats, _expected(history)):
+            return False
+        empty = analytics.overview(analytics.Snapshot(np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0)), TODAY)
+        if empty.users or empty.active_per_day != [0] * analytics.ACTIVE_DAYS:
+            print("✗ Unexpected overview of an empty snapshot")
+            return False
+        print(f"✓ {stats.users} users, {stats.entries} entries, {stats.losing}/{stats.stable}/{stats.gaining}")
+        return True
+    finally:
+        database.DB_FILE = old
+        series_cache.invalidate()
+
+
+def test_incremental_snapshot():
+    """The kept snapshot follows writes and equals a fresh load."""
+    print("\nTesting the kept snapshot...")
+    old = _use_temp_db()
+    old_flag = analytics.ANALYTICS_SNAPSHOT
+    analytics.ANALYTICS_SNAPSHOT = True
+    analytics.reset()
+    try:
+        history = _random_history(seed=8, users=10)
+        for user_id, rows in history.items():
+            database.save_weights_bulk(user_id, rows.items())
+        first = analytics.current()
+        if analytics.current() is not first:
+            print("✗ Snapshot reloaded without writes")
+            return False
+
+        users = sorted(history)
+        database.save_weight(users[0], TODAY, 70.0)
+        database.save_weight(users[1], TODAY - dt.timedelta(days=400), 90.0)
+        database.save_reading(users[2], dt.datetime.combine(TODAY, dt.time(9)), 71.5)
+        database.delete_weight(users[3], min(history[users[3]]))
+        database.save_weight(999, TODAY, 80.0)  # new user
+        database.save_weights_bulk(users[4], [(TODAY - dt.timedelta(days=i), 65.0) for i in range(5)])
+        database.save_weight(users[4], TODAY, 64.0)
+
+        kept = analytics.current()
+        fresh = analytics.Snapshot.load()
+        for name in ("users", "days", "weights"):
+            if not np.array_equal(getattr(kept, name), getattr(fresh, name)):
+                print(f"✗ Kept snapshot differs from a fresh load ({name})")
+                return False
+        print(f"✓ {len(kept)} rows after writes, same as a fresh load")
+        return True
+    finally:
+        analytics.ANALYTICS_SNAPSHOT = old_flag
+        analytics.reset()
+        database.DB_FILE = old
+        series_cache.invalidate()
+
+
+def main():
+    """Run all analytics tests."""
+    print("=== Analytics Tests ===\n")
+
+    tests = [
+        ("Overview", test_overview),
+        ("Kept Snapshot", test_incremental_snapshot),
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        try:
+            if test_func():
+                passed += 1
+                print(f"✓ {test_name} passed")
+            else:
+                print(f"✗ {test_name} failed")
+        except Exception as e:
+            print(f"✗ {test_name} failed with exception: {e}")
+
+    print(f"\n=== Results: {passed}/{total} tests passed ===")
+
+    if passed == total:
+        print("🎉 All analytics tests passed!")
+    else:
+        print("❌ Some analytics tests failed.")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
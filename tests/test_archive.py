@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Test script for the archive of cold weight history."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datetime as dt
+import random
+import sqlite3
+import tempfile
+
+import archive
+import database
+import series_cache
+
+TODAY = dt.datetime.now().date()
+USER = 88801
+
+
+def _use_temp_db():
+    old = database.DB_FILE
+    database.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="archive_test_"), "weights.db")
+    database.init_db()
+    series_cache.invalidate()
+    return old
+
+
+def _hot_rows():
+    with sqlite3.connect(database.DB_FILE) as conn:
+        return conn.execute("SELECT COUNT(*) FROM weights").fetchone()[0]
+
+
+def test_block_roundtrip():
+    """Blocks decode to exactly the stored dates and floats."""
+    print("Testing archive blocks...")
+    rng = random.Random(5)
+    rows = []
+    day = dt.date(2023, 1, 1)
+    weight = 85.0
+    while day.year == 2023:
+        weight += rng.gauss(0, 0.3)
+        rows.append((day, weight if rng.random() < 0.5 else round(weight, 1)))
+        day += dt.timedelta(days=rng.choice((1, 1, 2, 5)))
+    blob = archive.encode_block(2023, rows)
+    if archive.decode_block(2023, blob) != rows:
+        print("✗ Decoded block differs")
+        return False
+    leap = [(dt.date(2024, 1, 1), 70.0), (dt.date(2024, 12, 31), 71.25)]
+    if archive.decode_block(2024, archive.encode_block(2024, leap)) != leap:
+        print("✗ Leap year block differs")
+        return False
+    try:
+        archive.encode_block(2023, [(dt.date(2022, 12, 31), 80.0)])
+        print("✗ Date outside the year accepted")
+        return False
+    except ValueError:
+        pass
+    print(f"✓ {len(rows)} entries in {len(blob)} bytes")
+    return True
+
+
+def test_archive_reads():
+    """Reads are the same before and after archival; writes to archived days still work."""
+    print("\nTesting archived reads and writes...")
+    old = _use_temp_db()
+    try:
+        start = TODAY - dt.timedelta(days=900)
+        entries = [(start + dt.timedelta(days=i), 90.0 - i * 0.01) for i in range(0, 900, 2)]
+        database.save_weights_bulk(USER, entries)
+        database.save_weights_bulk(USER + 1, [(start, 60.0)])  # only cold rows
+        trend_before = database.refresh_trend(USER)
+        cutoff = TODAY - dt.timedelta(days=400)
+        ranges = [(start, TODAY), (cutoff - dt.timedelta(days=30), cutoff + dt.timedelta(days=30)),
+                  (dt.date(start.year, 1, 1), dt.date(start.year + 1, 12, 31))]
+        before = [database.get_weights(USER, a, b) for a, b in ranges]
+        exported = [row for batch in database.iter_weight_rows() for row in batch]
+        hot_before = _hot_rows()
+
+        stats = database.archive_cold_rows(cutoff, batch_users=1)
+        if stats["users"] != 2 or _hot_rows() != hot_before - stats["rows"] or stats["rows"] < 200:
+            print(f"✗ Unexpected archival: {stats}, {_hot_rows()} hot rows left")
+            return False
+        if [database.get_weights(USER, a, b) for a, b in ranges] != before:
+            print("✗ Ranges differ after archival")
+            return False
+        if [row for batch in database.iter_weight_rows(batch_size=7) for row in batch] != exported:
+            print("✗ Export differs after archival")
+            return False
+        if set(database.get_all_user_ids()) != {USER, USER + 1}:
+            print("✗ Fully archived user missing from get_all_user_ids")
+            return False
+        if database.refresh_trend(USER) != trend_before:
+            print("✗ Trend differs after archival")
+            return False
+        print(f"✓ {stats['rows']} rows archived in {stats['blocks']} blocks, reads unchanged")
+
+        # Overwrite and delete archived days, then archive again
+        database.save_weight(USER, start, 95.0)
+        if not database.delete_weight(USER, start + dt.timedelta(days=2)):
+            print("✗ Archived day not deleted")
+            return False
+        if database.delete_weight(USER, start + dt.timedelta(days=3)):
+            print("✗ Missing day reported as deleted")
+            return False
+        window = database.get_weights(USER, start, start + dt.timedelta(days=4))
+        database.archive_cold_rows(cutoff)
+        if database.get_weights(USER, start, start + dt.timedelta(days=4)) != window or window[0] != (start, 95.0):
+            print(f"✗ Unexpected rows after writes to archived days: {window}")
+            return False
+        print("✓ Writes to archived days merged on the next pass")
+        return True
+    finally:
+        database.DB_FILE = old
+        series_cache.invalidate()
+
+
+def main():
+    """Run all archive tests."""
+    print("=== Archive Tests ===\n")
+
+    tests = [
+        ("Block Roundtrip", test_block_roundtrip),
+        ("Archived Reads", test_archive_reads),
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        try:
+            if test_func():
+                passed += 1
+                print(f"✓ {test_name} passed")
+            else:
+                print(f"✗ {test_name} failed")
+        except Exception as e:
+            print(f"✗ {test_name} failed with exception: {e}")
+
+    print(f"\n=== Results: {passed}/{total} tests passed ===")
+
+    if passed == total:
+        print("🎉 All archive tests passed!")
+    else:
+        print("❌ Some archive tests failed.")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
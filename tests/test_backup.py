@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""Test script for backup compression, retention and storage backends."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datetime as dt
+import importlib.util
+import json
+import sqlite3
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+import config
+from backup_manager import BackupManager, apply_retention, compress_file, decompress_file, file_sha256
+from storage_backends import LocalDirectoryBackend
+
+
+def _entries(count, step):
+    """Build manifest entries, newest first, spaced by ``step``."""
+    now = dt.datetime(2025, 6, 30, 12, 0, 0)
+    return [
+        {"name": f"weights_backup_{i}", "created_at": (now - step * i).isoformat()}
+        for i in range(count)
+    ]
+
+
+def test_compression_roundtrip():
+    """Test that gzip and uncompressed backups round-trip byte for byte."""
+    print("Testing compression round trip...")
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "src.db")
+        with open(src, "wb") as f:
+            f.write(os.urandom(4096) + b"\0" * 200000)
+        for method in ("gzip", "none"):
+            packed = os.path.join(tmp, f"packed.{method}")
+            restored = os.path.join(tmp, f"restored.{method}")
+            compress_file(src, packed, method)
+            decompress_file(packed, restored, method)
+            if file_sha256(restored) != file_sha256(src):
+                print(f"✗ {method} round trip changed the content")
+                return False
+            print(f"✓ {method}: {os.path.getsize(src)} -> {os.path.getsize(packed)} bytes")
+    return True
+
+
+def test_retention_recent():
+    """Test that the newest backups are always kept."""
+    print("\nTesting recent retention...")
+    entries = _entries(30, dt.timedelta(minutes=1))
+    kept, pruned = apply_retention(entries, keep_recent=5, keep_daily=0, keep_weekly=0, keep_monthly=0)
+    if [e["name"] for e in kept] != [e["name"] for e in entries[:5]]:
+        print("✗ Expected the 5 newest backups to be kept")
+        return False
+    if len(pruned) != 25:
+        print(f"✗ Expected 25 pruned backups, got {len(pruned)}")
+        return False
+    print("✓ Newest backups kept")
+    return True
+
+
+def test_retention_tiers():
+    """Test daily, weekly and monthly retention tiers."""
+    print("\nTesting tiered retention...")
+    # Four backups a day for 120 days
+    entries = _entries(480, dt.timedelta(hours=6))
+    kept, pruned = apply_retention(entries, keep_recent=2, keep_daily=7, keep_weekly=4, keep_monthly=3)
+    days = {dt.datetime.fromisoformat(e["created_at"]).date() for e in kept}
+    if len(kept) + len(pruned) != len(entries):
+        print("✗ Kept and pruned do not cover every entry")
+        return False
+    if len(days) < 7 or len(kept) > 2 + 7 + 4 + 3:
+        print(f"✗ Unexpected retention result: {len(kept)} kept over {len(days)} days")
+        return False
+    if entries[0] not in kept:
+        print("✗ Latest backup was pruned")
+        return False
+    print(f"✓ Kept {len(kept)} of {len(entries)} backups")
+    return True
+
+
+def _make_db(path, rows):
+    """Create a small weights database with ``rows`` entries."""
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute("CREATE TABLE weights (user_id INTEGER, date TEXT, weight REAL, PRIMARY KEY (user_id, date))")
+        start = dt.date(2020, 1, 1)
+        conn.executemany(
+            "INSERT INTO weights VALUES (?,?,?)",
+            ((i % 50, (start + dt.timedelta(days=i // 50)).isoformat(), 70 + (i % 17) * 0.1) for i in range(rows)),
+        )
+        conn.commit()
+
+
+def test_local_backup_restore():
+    """Test backup, deduplication and chunked restore against a local directory."""
+    print("\nTesting local backend backup and restore...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "weights.db")
+        _make_db(db_path, 20000)
+        manager = BackupManager(LocalDirectoryBackend(os.path.join(tmp, "store")), db_file=db_path)
+        manager.chunk_size = 16 * 1024  # force a multipart upload
+
+        name = manager.create_backup()
+        if not name:
+            print("✗ Backup was not created")
+            return False
+        if manager.create_backup() is not None:
+            print("✗ Unchanged database was uploaded again")
+            return False
+        print("✓ Unchanged database skipped")
+
+        restored = BackupManager(manager.backend, db_file=os.path.join(tmp, "restored", "weights.db"))
+        restored.chunk_size = manager.chunk_size
+        if not restored.restore_latest_backup():
+            print("✗ Restore failed")
+            return False
+        with closing(sqlite3.connect(restored.db_file)) as conn:
+            count = conn.execute("SELECT COUNT(*) FROM weights").fetchone()[0]
+        if count != 20000:
+            print(f"✗ Expected 20000 rows after restore, got {count}")
+            return False
+        print(f"✓ Restored {count} rows from {name}")
+    return True
+
+
+def test_manifest_read_error():
+    """Test that a failed manifest read stops the backup instead of rebuilding the manifest."""
+    print("\nTesting manifest read errors...")
+
+    class FlakyBackend(LocalDirectoryBackend):
+        failing = False
+
+        def read_bytes(self, name):
+            if self.failing:
+                raise ConnectionError("storage unavailable")
+            return super().read_bytes(name)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "weights.db")
+        _make_db(db_path, 5000)
+        backend = FlakyBackend(os.path.join(tmp, "store"))
+        manager = BackupManager(backend, db_file=db_path)
+        manager.chunk_size = 16 * 1024
+        if not manager.create_backup():
+            print("✗ First backup was not created")
+            return False
+        manifest = backend.read_bytes("manifest.json")
+
+        with closing(sqlite3.connect(db_path)) as conn:
+            conn.execute("INSERT INTO weights VALUES (99, '2030-01-01', 80.0)")
+            conn.commit()
+        backend.failing = True
+        if manager.create_backup() is not None:
+            print("✗ Backup created without reading the manifest")
+            return False
+        backend.failing = False
+        if backend.read_bytes("manifest.json") != manifest:
+            print("✗ Manifest replaced after a read error")
+            return False
+        print("✓ Read error left the manifest alone")
+    return True
+
+
+def test_concurrent_backups():
+    """Test that backups started together run one at a time under distinct names."""
+    print("\nTesting concurrent backups...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "weights.db")
+        _make_db(db_path, 5000)
+        backend = LocalDirectoryBackend(os.path.join(tmp, "store"))
+        managers = [BackupManager(backend, db_file=db_path) for _ in range(4)]
+        for manager in managers:
+            manager.chunk_size = 16 * 1024
+        with ThreadPoolExecutor(4) as pool:
+            names = [n for n in pool.map(lambda m: m.create_backup(), managers) if n]
+        if len(names) != 1:
+            print(f"✗ Expected one backup of an unchanged database, got {names}")
+            return False
+
+        with closing(sqlite3.connect(db_path)) as conn:
+            conn.execute("INSERT INTO weights VALUES (99, '2030-01-01', 80.0)")
+            conn.commit()
+        second = managers[0].create_backup()
+        manifest = json.loads(backend.read_bytes("manifest.json"))
+        if not second or second == names[0] or [e["name"] for e in manifest["backups"]] != [second, names[0]]:
+            print(f"✗ Unexpected backups: {[e['name'] for e in manifest['backups']]}")
+            return False
+        restored = BackupManager(backend, db_file=os.path.join(tmp, "restored", "weights.db"))
+        if not restored.restore_latest_backup():
+            print("✗ Restore failed")
+            return False
+        print("✓ One backup per change, each under its own name")
+    return True
+
+
+def test_corrupt_restore_keeps_database():
+    """Test that a backup failing the integrity check never replaces the database."""
+    print("\nTesting verified restore...")
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = LocalDirectoryBackend(os.path.join(tmp, "store"))
+        name = "weights_backup_20250101_000000.db"
+        backend.write_bytes(name, b"not a database" * 1000)
+
+        db_path = os.path.join(tmp, "weights.db")
+        _make_db(db_path, 10)
+        before = file_sha256(db_path)
+        if BackupManager(backend, db_file=db_path).restore_latest_backup():
+            print("✗ Corrupt backup was restored")
+            return False
+        if file_sha256(db_path) != before:
+            print("✗ Existing database was modified")
+            return False
+        leftovers = [f for f in os.listdir(tmp) if f.endswith((".download", ".restore"))]
+        if leftovers:
+            print(f"✗ Temporary files left behind: {leftovers}")
+            return False
+        print("✓ Corrupt backup rejected, database untouched")
+    return True
+
+
+def test_compression_validation():
+    """Test that an unknown or unavailable compression method stops the bot at startup."""
+    print("\nTesting compression validation...")
+    old = config.TOKEN, config.BACKUP_COMPRESSION
+    config.TOKEN = "test-token"
+    try:
+        expected = {"gzip": True, "none": True, "brotli": False,
+                    "zstd": importlib.util.find_spec("zstandard") is not None}
+        for method, valid in expected.items():
+            config.BACKUP_COMPRESSION = method
+            try:
+                config.validate_config()
+                accepted = True
+            except RuntimeError:
+                accepted = False
+            if accepted != valid:
+                print(f"✗ BACKUP_COMPRESSION={method} {'accepted' if accepted else 'rejected'}")
+                return False
+        print("✓ Only available compression methods accepted")
+        return True
+    finally:
+        config.TOKEN, config.BACKUP_COMPRESSION = old
+
+
+def main():
+    """Run all backup tests."""
+    print("=== Backup Test Suite ===\n")
+
+    tests = [
+        ("Compression Round Trip", test_compression_roundtrip),
+        ("Compression Validation", test_compression_validation),
+        ("Recent Retention", test_retention_recent),
+        ("Tiered Retention", test_retention_tiers),
+        ("Local Backup and Restore", test_local_backup_restore),
+        ("Manifest Read Error", test_manifest_read_error),
+        ("Concurrent Backups", test_concurrent_backups),
+        ("Verified Restore", test_corrupt_restore_keeps_database),
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        try:
+            if test_func():
+                passed += 1
+                print(f"✓ {test_name} passed")
+            else:
+                print(f"✗ {test_name} failed")
+        except Exception as e:
+            print(f"✗ {test_name} failed with exception: {e}")
+
+    print(f"\n=== Results: {passed}/{total} tests passed ===")
+
+    if passed == total:
+        print("🎉 All backup tests passed!")
+    else:
+        print("❌ Some backup tests failed.")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
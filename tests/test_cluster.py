@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Test script for routing updates to cluster workers."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import queue
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop
+
+import cluster
+
+WORKERS = 4
+
+
+def _update(update_id, user_id=None, chat_id=None):
+    """Build a text message from ``user_id`` in ``chat_id``, or a poll update with neither."""
+    if user_id is None and chat_id is None:
+        return Update.de_json({
+            "update_id": update_id,
+            "poll": {"id": "1", "question": "?", "options": [], "total_voter_count": 0, "is_closed": True,
+                     "is_anonymous": True, "type": "regular", "allows_multiple_answers": False},
+        }, None)
+    message = {
+        "message_id": update_id,
+        "date": 0,
+        "chat": {"id": chat_id or user_id, "type": "private" if chat_id is None else "supergroup"},
+        "text": "/diario",
+    }
+    if user_id is not None:
+        message["from"] = {"id": user_id, "is_bot": False, "first_name": "Test"}
+    return Update.de_json({"update_id": update_id, "message": message}, None)
+
+
+def _route(updates):
+    """Run updates through the ingress handler; returns the update ids each inbox received."""
+    inboxes = [queue.Queue() for _ in range(WORKERS)]
+    old_token = cluster.TOKEN
+    cluster.TOKEN = "123456:TEST"
+    try:
+        route = cluster.build_ingress(inboxes).handlers[0][0].callback
+    finally:
+        cluster.TOKEN = old_token
+
+    async def send():
+        for update in updates:
+            try:
+                await route(update, None)
+            except ApplicationHandlerStop:
+                pass
+            else:
+                raise AssertionError("route did not stop other handlers")
+
+    asyncio.run(send())
+    received = []
+    for inbox in inboxes:
+        ids = []
+        while not inbox.empty():
+            ids.append(inbox.get_nowait()["update"]["update_id"])
+        received.append(ids)
+    return received
+
+
+def test_routing_stability():
+    """Every update of a user or chat goes to the same worker, in arrival order."""
+    print("Testing routing stability...")
+    if [cluster.worker_for(key, WORKERS) for key in (0, 5, 7, 1234567, -1001234567)] != [0, 1, 3, 3, 1]:
+        print("✗ Unexpected worker for a key")
+        return False
+
+    users = [1001, 1002, 1003, 1004, 1005, 1006, 1007, 1008]
+    updates = [_update(i, user_id=users[i % len(users)]) for i in range(40)]
+    # Anonymous group admins have no user; the chat decides
+    updates += [_update(40 + i, chat_id=-1001234567) for i in range(3)]
+    received = _route(updates)
+
+    for update in updates:
+        key = update.effective_user.id if update.effective_user else update.effective_chat.id
+        worker = cluster.worker_for(key, WORKERS)
+        if update.update_id not in received[worker]:
+            print(f"✗ Update {update.update_id} of {key} not sent to worker {worker}")
+            return False
+    if any(ids != sorted(ids) for ids in received) or sum(map(len, received)) != len(updates):
+        print(f"✗ Updates reordered or duplicated: {received}")
+        return False
+    if not all(received):
+        print("✗ Some worker got no updates")
+        return False
+    print(f"✓ {len(updates)} updates routed by owner: {[len(ids) for ids in received]}")
+    return True
+
+
+def test_keyless_updates():
+    """Updates with neither a user nor a chat go to worker 0."""
+    print("\nTesting keyless updates...")
+    received = _route([_update(1), _update(2, user_id=1001), _update(3)])
+    if received[0] != [1, 3] or received[cluster.worker_for(1001, WORKERS)] != [2]:
+        print(f"✗ Unexpected routing: {received}")
+        return False
+    print("✓ Keyless updates sent to worker 0")
+    return True
+
+
+def main():
+    """Run all cluster tests."""
+    print("=== Cluster Tests ===\n")
+
+    tests = [
+        ("Routing Stability", test_routing_stability),
+        ("Keyless Updates", test_keyless_updates),
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        try:
+            if test_func():
+                passed += 1
+                print(f"✓ {test_name} passed")
+            else:
+                print(f"✗ {test_name} failed")
+        except Exception as e:
+            print(f"✗ {test_name} failed with exception: {e}")
+
+    print(f"\n=== Results: {passed}/{total} tests passed ===")
+
+    if passed == total:
+        print("🎉 All cluster tests passed!")
+    else:
+        print("❌ Some cluster tests failed.")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
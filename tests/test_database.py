@@ -6,9 +6,15 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import datetime as dt
+import sqlite3
+import tempfile
+import database
 from database import (
     init_db, 
     save_weight, 
+    save_reading,
+    get_readings,
+    get_trend,
     get_weights, 
     get_monthly_weights, 
     get_weekly_weights, 
@@ -103,6 +109,58 @@ def test_aggregate_functions():
     
     return True
 
+def test_multiple_readings():
+    """Test several readings on one day and the daily value."""
+    print("\nTesting multiple readings per day...")
+    init_db()
+
+    user_id = 66666
+    day = dt.date.today() - dt.timedelta(days=1)
+    save_weight(user_id, day - dt.timedelta(days=1), 71.0)
+    save_weight(user_id, day, 70.0)  # replaced by the readings below
+    morning = dt.datetime.combine(day, dt.time(7, 30))
+    save_reading(user_id, morning, 70.4)
+    daily, count = save_reading(user_id, morning + dt.timedelta(hours=12), 71.2)
+
+    if count != 3 or len(get_readings(user_id, day)) != 3:
+        print(f"✗ Expected 3 readings, got {count}")
+        return False
+    weights = get_weights(user_id, day, day)
+    if weights != [(day, 71.2)] or daily != 71.2:
+        print(f"✗ Expected the last reading as daily value, got {weights}")
+        return False
+    if get_trend(user_id).last_weight != 71.2:
+        print("✗ Trend was not updated with the daily value")
+        return False
+    print(f"✓ {count} readings, daily value {daily} kg")
+    return True
+
+def test_readings_migration():
+    """Test migrating a pre-readings database and changing the aggregation policy."""
+    print("\nTesting readings migration...")
+    old_file, old_policy = database.DB_FILE, database.DAILY_AGGREGATION
+    database.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="readings_test_"), "weights.db")
+    try:
+        with sqlite3.connect(database.DB_FILE) as conn:
+            conn.execute("CREATE TABLE weights (user_id INTEGER, date TEXT, weight REAL, PRIMARY KEY (user_id, date))")
+            conn.execute("INSERT INTO weights VALUES (1, '2024-01-01', 80.0), (1, '2024-01-02', 79.5)")
+        init_db()
+        if len(get_readings(1, dt.date(2024, 1, 2))) != 1:
+            print("✗ Existing weights were not migrated to readings")
+            return False
+
+        save_reading(1, dt.datetime(2024, 1, 2, 20, 0), 80.5)
+        database.DAILY_AGGREGATION = "mean"
+        init_db()  # rebuilds the daily values for the new policy
+        weights = get_weights(1, dt.date(2024, 1, 1), dt.date(2024, 1, 2))
+        if weights != [(dt.date(2024, 1, 1), 80.0), (dt.date(2024, 1, 2), 80.0)]:
+            print(f"✗ Unexpected daily means: {weights}")
+            return False
+        print("✓ Migrated and rebuilt daily means")
+        return True
+    finally:
+        database.DB_FILE, database.DAILY_AGGREGATION = old_file, old_policy
+
 def main():
     """Run all database tests."""
     print("=== Database Test Suite ===\n")
@@ -111,6 +169,8 @@ def main():
         ("Basic Operations", test_basic_operations),
         ("Multiple Weights", test_multiple_weights),
         ("Aggregate Functions", test_aggregate_functions),
+        ("Multiple Readings", test_multiple_readings),
+        ("Readings Migration", test_readings_migration),
     ]
     
     passed = 0
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Test script for the LTTB chart downsampling."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from downsample import lttb
+
+
+def test_short_series_untouched():
+    """Test that series shorter than the target are returned as is."""
+    print("Testing short series...")
+    x, y = lttb([1, 2, 3], [70.0, 71.0, 70.5], 300)
+    if list(x) != [1, 2, 3] or list(y) != [70.0, 71.0, 70.5]:
+        print(f"✗ Short series was modified: {list(x)}, {list(y)}")
+        return False
+    print("✓ Short series untouched")
+    return True
+
+
+def test_output_size_and_order():
+    """Test output length, endpoints and ordering on a long series."""
+    print("Testing long series...")
+    x = np.arange(10000, dtype=float)
+    y = 80 + np.sin(x / 50)
+    dx, dy = lttb(x, y, 300)
+    if len(dx) != 300 or len(dy) != 300:
+        print(f"✗ Expected 300 points, got {len(dx)}")
+        return False
+    if dx[0] != x[0] or dx[-1] != x[-1]:
+        print("✗ First and last points were not kept")
+        return False
+    if not np.all(np.diff(dx) > 0):
+        print("✗ Output is not strictly increasing")
+        return False
+    print("✓ 10000 points reduced to 300, endpoints kept, in order")
+    return True
+
+
+def test_spike_preserved():
+    """Test that a single outlier survives downsampling."""
+    print("Testing spike preservation...")
+    x = np.arange(5000, dtype=float)
+    y = np.full(5000, 75.0)
+    y[2345] = 90.0
+    dx, dy = lttb(x, y, 100)
+    if dy.max() != 90.0 or 2345.0 not in dx:
+        print("✗ Spike was dropped")
+        return False
+    print("✓ Spike kept")
+    return True
+
+
+def main():
+    """Run all downsampling tests."""
+    print("=== Downsampling Tests ===\n")
+
+    tests = [
+        ("Short Series", test_short_series_untouched),
+        ("Output Size And Order", test_output_size_and_order),
+        ("Spike Preserved", test_spike_preserved),
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        try:
+            if test_func():
+                passed += 1
+                print(f"✓ {test_name} passed")
+            else:
+                print(f"✗ {test_name} failed")
+        except Exception as e:
+            print(f"✗ {test_name} failed with exception: {e}")
+
+    print(f"\n=== Results: {passed}/{total} tests passed ===")
+
+    if passed == total:
+        print("🎉 All downsampling tests passed!")
+    else:
+        print("❌ Some downsampling tests failed.")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Test script for the streaming history export."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import csv
+import datetime as dt
+import gzip
+import tempfile
+
+from database import init_db, save_weights_bulk, iter_weight_rows
+import exporter
+
+
+def _seed(user_id, days):
+    start = dt.date(2020, 1, 1)
+    save_weights_bulk(user_id, [(start + dt.timedelta(days=i), 70 + i % 7 * 0.5) for i in range(days)])
+
+
+def test_batched_cursor():
+    """Test that rows come back ordered, in bounded batches."""
+    print("Testing batched cursor...")
+    init_db()
+    _seed(77701, 1234)
+    batches = list(iter_weight_rows(77701, batch_size=500))
+    if [len(b) for b in batches] != [500, 500, 234]:
+        print(f"✗ Unexpected batch sizes: {[len(b) for b in batches]}")
+        return False
+    dates = [row[1] for batch in batches for row in batch]
+    if dates != sorted(dates):
+        print("✗ Rows are not ordered by date")
+        return False
+    print("✓ 1234 rows in 3 ordered batches")
+    return True
+
+
+def test_csv_export():
+    """Test CSV export of one user."""
+    print("\nTesting CSV export...")
+    init_db()
+    _seed(77702, 40)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.csv")
+        rows = exporter.export_history(path, "csv", 77702, batch_size=16)
+        with open(path, newline="") as f:
+            lines = list(csv.reader(f))
+    if rows != 40 or lines[0] != ["user_id", "date", "weight"] or len(lines) != 41:
+        print(f"✗ Unexpected export: {rows} rows, {len(lines)} lines")
+        return False
+    if lines[1] != ["77702", "2020-01-01", "70.0"]:
+        print(f"✗ Unexpected first row: {lines[1]}")
+        return False
+    print("✓ CSV export matches the stored history")
+    return True
+
+
+def test_columnar_fallback():
+    """Test the gzip CSV fallback used when pyarrow is not installed."""
+    print("\nTesting columnar fallback...")
+    init_db()
+    _seed(77703, 25)
+    available = exporter.PYARROW_AVAILABLE
+    exporter.PYARROW_AVAILABLE = False
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "history" + exporter.columnar_extension())
+            rows = exporter.export_history(path, "columnar", 77703)
+            with gzip.open(path, "rt") as f:
+                lines = f.read().splitlines()
+    finally:
+        exporter.PYARROW_AVAILABLE = available
+    if not path.endswith(".csv.gz") or rows != 25 or len(lines) != 26:
+        print(f"✗ Unexpected fallback export: {path}, {rows} rows")
+        return False
+    print("✓ Fallback writes gzip CSV")
+    return True
+
+
+def main():
+    """Run all export tests."""
+    print("=== Export Test Suite ===\n")
+
+    tests = [
+        ("Batched Cursor", test_batched_cursor),
+        ("CSV Export", test_csv_export),
+        ("Columnar Fallback", test_columnar_fallback),
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        try:
+            if test_func():
+                passed += 1
+                print(f"✓ {test_name} passed")
+            else:
+                print(f"✗ {test_name} failed")
+        except Exception as e:
+            print(f"✗ {test_name} failed with exception: {e}")
+
+    print(f"\n=== Results: {passed}/{total} tests passed ===")
+
+    if passed == total:
+        print("🎉 All export tests passed!")
+    else:
+        print("❌ Some export tests failed.")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
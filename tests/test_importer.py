@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Test script for the bulk history import."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datetime as dt
+import json
+import tempfile
+
+from database import init_db, get_weights
+import importer
+
+TODAY = dt.date(2025, 3, 10)
+
+
+def _write(tmp, name, content):
+    path = os.path.join(tmp, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return path
+
+
+def test_csv_import():
+    """Test CSV import with a header, a semicolon delimiter and bad rows."""
+    print("Testing CSV import...")
+    init_db()
+    user_id = 66601
+    with tempfile.TemporaryDirectory() as tmp:
+        path = _write(tmp, "history.csv", "fecha;peso\n2025-03-01;80,1\n02/03/2025;79.8\nayer;79\n2025-03-03;900\n2030-01-01;70\n")
+        result = importer.import_weights(user_id, importer.iter_rows(path, "csv"), today=TODAY, chunk_size=1)
+    if result.imported != 2 or result.skipped != 3:
+        print(f"✗ Unexpected result: {result}")
+        return False
+    if [reason for _, reason, _ in result.errors] != ["date", "weight", "date"]:
+        print(f"✗ Unexpected errors: {result.errors}")
+        return False
+    weights = get_weights(user_id, dt.date(2025, 3, 1), dt.date(2025, 3, 2))
+    if weights != [(dt.date(2025, 3, 1), 80.1), (dt.date(2025, 3, 2), 79.8)]:
+        print(f"✗ Unexpected stored weights: {weights}")
+        return False
+    print("✓ Valid rows stored, invalid rows reported")
+    return True
+
+
+def test_json_streaming():
+    """Test that a JSON array larger than the read buffer is parsed item by item."""
+    print("\nTesting streaming JSON import...")
+    init_db()
+    user_id = 66602
+    start = TODAY - dt.timedelta(days=2999)
+    records = [{"date": (start + dt.timedelta(days=i)).isoformat(), "weight": 70 + i % 10} for i in range(3000)]
+    records.append(["2025-03-10", "71,5"])
+    with tempfile.TemporaryDirectory() as tmp:
+        path = _write(tmp, "history.json", json.dumps(records, indent=1))
+        if os.path.getsize(path) <= importer.READ_SIZE:
+            print("✗ Test document should be larger than the read buffer")
+            return False
+        progress_calls = []
+        result = importer.import_weights(
+            user_id, importer.iter_rows(path, importer.detect_format(path)),
+            today=TODAY, chunk_size=500, progress=progress_calls.append,
+        )
+    if result.imported != 3001 or result.skipped != 0:
+        print(f"✗ Unexpected result: {result}")
+        return False
+    if len(progress_calls) != 7:
+        print(f"✗ Expected 7 progress reports, got {len(progress_calls)}")
+        return False
+    if get_weights(user_id, TODAY, TODAY) != [(TODAY, 71.5)]:
+        print("✗ Pair record not imported")
+        return False
+    print(f"✓ Imported {result.imported} rows in {len(progress_calls)} chunks")
+    return True
+
+
+def test_repeated_dates():
+    """Test that several readings of one day in a file keep the last one."""
+    print("\nTesting repeated dates...")
+    init_db()
+    user_id = 66603
+    with tempfile.TemporaryDirectory() as tmp:
+        path = _write(tmp, "history.csv", "date,weight\n2025-03-01T07:00,80.4\n2025-03-01T20:00,81.0\n2025-03-02,80.2\n")
+        result = importer.import_weights(user_id, importer.iter_rows(path, "csv"), today=TODAY)
+    if result.imported != 2 or result.skipped != 0:
+        print(f"✗ Unexpected result: {result}")
+        return False
+    weights = get_weights(user_id, dt.date(2025, 3, 1), dt.date(2025, 3, 2))
+    if weights != [(dt.date(2025, 3, 1), 81.0), (dt.date(2025, 3, 2), 80.2)]:
+        print(f"✗ Unexpected stored weights: {weights}")
+        return False
+    print("✓ Last reading of a repeated day stored")
+    return True
+
+
+def test_format_detection():
+    """Test format detection by file name."""
+    print("\nTesting format detection...")
+    if [importer.detect_format(n) for n in ("a.csv", "b.JSON", "c.jsonl")] != ["csv", "json", "jsonl"]:
+        print("✗ Wrong formats detected")
+        return False
+    try:
+        importer.detect_format("photo.png")
+    except importer.ImportFormatError:
+        print("✓ Unsupported files rejected")
+        return True
+    print("✗ PNG accepted as a history document")
+    return False
+
+
+def main():
+    """Run all import tests."""
+    print("=== Import Test Suite ===\n")
+
+    tests = [
+        ("CSV Import", test_csv_import),
+        ("Streaming JSON Import", test_json_streaming),
+        ("Repeated Dates", test_repeated_dates),
+        ("Format Detection", test_format_detection),
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        try:
+            if test_func():
+                passed += 1
+                print(f"✓ {test_name} passed")
+            else:
+                print(f"✗ {test_name} failed")
+        except Exception as e:
+            print(f"✗ {test_name} failed with exception: {e}")
+
+    print(f"\n=== Results: {passed}/{total} tests passed ===")
+
+    if passed == total:
+        print("🎉 All import tests passed!")
+    else:
+        print("❌ Some import tests failed.")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
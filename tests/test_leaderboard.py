@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Test script for the group rankings."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datetime as dt
+import random
+import tempfile
+
+import database
+import leaderboard
+import series_cache
+
+TODAY = dt.date(2024, 6, 30)
+GROUP = -100123
+
+
+def _use_temp_db():
+    old = database.DB_FILE
+    database.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="leaderboard_test_"), "weights.db")
+    database.init_db()
+    series_cache.invalidate()
+    leaderboard.reset()
+    return old
+
+
+def _expected(members, days, top=10):
+    """The ranking computed from each member's full history."""
+    start = TODAY - dt.timedelta(days=days - 1)
+    rows = []
+    for user_id, name in members.items():
+        weights = database._query_weights(user_id, start, TODAY)
+        if len(weights) >= 2:
+            rows.append(((weights[-1][1] - weights[0][1]) / weights[0][1], user_id, name))
+    return [(uid, name, change) for change, uid, name in sorted(rows)[:top]]
+
+
+def _same(got, expected):
+    return len(got) == len(expected) and all(
+        a[:2] == b[:2] and abs(a[2] - b[2]) < 1e-12 for a, b in zip(got, expected)
+    )
+
+
+def test_ranking():
+    """Rankings follow every kind of write without reloading the board."""
+    print("Testing group rankings...")
+    old = _use_temp_db()
+    rng = random.Random(11)
+    real_load = database.get_period_ends
+    try:
+        members = {}
+        for user_id in range(500, 530):
+            database.save_weights_bulk(user_id, [
+                (TODAY - dt.timedelta(days=i), round(rng.uniform(60, 100), 1))
+                for i in range(60) if rng.random() < 0.3
+            ])
+            if user_id % 3:
+                members[user_id] = f"user{user_id}"
+                if not leaderboard.join(GROUP, user_id, members[user_id]):
+                    print("✗ New member reported as existing")
+                    return False
+        if leaderboard.join(GROUP, 502, "user502"):
+            print("✗ Existing member reported as new")
+            return False
+
+        for days in (7, 30):
+            if not _same(leaderboard.ranking(GROUP, days, TODAY), _expected(members, days)):
+                print(f"✗ Ranking over {days} days differs after loading")
+                return False
+
+        # From here on the boards must not be loaded again
+        def no_reload(*args):
+            raise AssertionError("board reloaded")
+        database.get_period_ends = no_reload
+
+        users = sorted(members)
+        for _ in range(200):
+            user_id = rng.choice(users + [529])
+            day = TODAY - dt.timedelta(days=rng.randint(0, 40))
+            action = rng.random()
+            if action < 0.6:
+                database.save_weight(user_id, day, round(rng.uniform(60, 100), 1))
+            elif action < 0.75:
+                database.save_reading(user_id, dt.datetime.combine(day, dt.time(rng.randint(0, 23))), 80.0)
+            elif action < 0.9:
+                database.delete_weight(user_id, day)
+            else:
+                database.save_weights_bulk(user_id, [(day, 70.0), (day - dt.timedelta(days=1), 71.0)])
+        leaderboard.leave(GROUP, users[0])
+        del members[users[0]]
+        leaderboard.join(GROUP, 529, "late")
+        members[529] = "late"
+
+        for days in (7, 30):
+            got = leaderboard.ranking(GROUP, days, TODAY)
+            if not _same(got, _expected(members, days)):
+                print(f"✗ Ranking over {days} days differs after writes: {got[:3]}")
+                return False
+        print(f"✓ Rankings of {len(members)} members up to date after 200 writes")
+        return True
+    finally:
+        database.get_period_ends = real_load
+        database.DB_FILE = old
+        series_cache.invalidate()
+        leaderboard.reset()
+
+
+def test_board_reload():
+    """A board is loaded again on a new day and members without two entries are left out."""
+    print("\nTesting board reloads...")
+    old = _use_temp_db()
+    try:
+        leaderboard.join(GROUP, 1, "ana")
+        leaderboard.join(GROUP, 2, "bea")
+        database.save_weights_bulk(1, [(TODAY - dt.timedelta(days=3), 80.0), (TODAY, 78.0)])
+        database.save_weight(2, TODAY, 70.0)
+        if [row[:2] for row in leaderboard.ranking(GROUP, 7, TODAY)] != [(1, "ana")]:
+            print("✗ Unexpected ranking")
+            return False
+        tomorrow = TODAY + dt.timedelta(days=1)
+        database.save_weight(2, tomorrow, 69.0)
+        if [row[:2] for row in leaderboard.ranking(GROUP, 7, tomorrow)] != [(1, "ana"), (2, "bea")]:
+            print("✗ Board not reloaded on a new day")
+            return False
+        if leaderboard.ranking(GROUP, 1, tomorrow) or not leaderboard.leave(GROUP, 1) or leaderboard.leave(GROUP, 1):
+            print("✗ Unexpected one-day ranking or leave result")
+            return False
+        print("✓ Boards follow the calendar")
+        return True
+    finally:
+        database.DB_FILE = old
+        series_cache.invalidate()
+        leaderboard.reset()
+
+
+def main():
+    """Run all leaderboard tests."""
+    print("=== Leaderboard Tests ===\n")
+
+    tests = [
+        ("Ranking", test_ranking),
+        ("Board Reload", test_board_reload),
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        try:
+            if test_func():
+                passed += 1
+                print(f"✓ {test_name} passed")
+            else:
+                print(f"✗ {test_name} failed")
+        except Exception as e:
+            print(f"✗ {test_name} failed with exception: {e}")
+
+    print(f"\n=== Results: {passed}/{total} tests passed ===")
+
+    if passed == total:
+        print("🎉 All leaderboard tests passed!")
+    else:
+        print("❌ Some leaderboard tests failed.")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
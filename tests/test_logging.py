@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Test script for the structured, queue-based logging setup."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+import json
+import logging
+
+import logging_setup
+
+
+def _capture(level, fmt):
+    """Set up logging into a buffer instead of stdout."""
+    logging_setup.stop_logging()
+    buf = io.StringIO()
+    stdout, sys.stdout = sys.stdout, buf
+    try:
+        logging_setup.setup_logging(level, fmt)
+    finally:
+        sys.stdout = stdout
+    return buf
+
+
+def test_json_fields():
+    """Test that extra fields and tracebacks end up as JSON keys."""
+    print("Testing JSON output...")
+    buf = _capture("INFO", "json")
+    log = logging.getLogger("test.json")
+    log.info("Update handled", extra={"user_id": 42, "command": "/diario", "duration_ms": 12.5})
+    try:
+        raise ValueError("bad")
+    except ValueError:
+        log.exception("Failed", extra={"user_id": 42})
+    logging_setup.stop_logging()
+
+    entries = [json.loads(line) for line in buf.getvalue().splitlines()]
+    if len(entries) != 2:
+        print(f"✗ Expected 2 lines, got {buf.getvalue()!r}")
+        return False
+    first, second = entries
+    if (first["msg"], first["user_id"], first["command"], first["duration_ms"]) != ("Update handled", 42, "/diario", 12.5):
+        print(f"✗ Unexpected fields: {first}")
+        return False
+    if second["level"] != "ERROR" or "ValueError: bad" not in second.get("exc", ""):
+        print(f"✗ Traceback missing: {second}")
+        return False
+    print("✓ Fields and traceback are separate JSON keys")
+    return True
+
+
+def test_debug_off_by_default():
+    """Test that debug records are dropped at the default level."""
+    print("Testing default level...")
+    buf = _capture(logging_setup.LOG_LEVEL, "text")
+    log = logging.getLogger("test.level")
+    log.debug("hidden %s", "detail")
+    log.info("shown", extra={"user_id": 7})
+    logging_setup.stop_logging()
+
+    output = buf.getvalue()
+    if "hidden" in output or "shown user_id=7" not in output:
+        print(f"✗ Unexpected output: {output!r}")
+        return False
+    print("✓ Debug records dropped, extra fields appended in text format")
+    return True
+
+
+def main():
+    """Run all logging tests."""
+    print("=== Logging Tests ===\n")
+
+    tests = [
+        ("JSON Fields", test_json_fields),
+        ("Debug Off By Default", test_debug_off_by_default),
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        try:
+            if test_func():
+                passed += 1
+                print(f"✓ {test_name} passed")
+            else:
+                print(f"✗ {test_name} failed")
+        except Exception as e:
+            print(f"✗ {test_name} failed with exception: {e}")
+
+    print(f"\n=== Results: {passed}/{total} tests passed ===")
+
+    if passed == total:
+        print("🎉 All logging tests passed!")
+    else:
+        print("❌ Some logging tests failed.")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Test script for the latency histograms and the metrics endpoint."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import urllib.request
+
+import metrics
+
+
+def test_timed_decorator():
+    """Test that sync and async calls are timed and failures counted."""
+    print("Testing timed decorator...")
+    histogram = metrics.Histogram("test_timed_seconds", "Test", ("name",))
+
+    @metrics.timed(histogram)
+    def query(x):
+        return x * 2
+
+    @metrics.timed(histogram, name="send")
+    async def send():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upload failed")
+
+    if query(2) != 4 or query.__name__ != "query":
+        print("✗ Wrapped function changed")
+        return False
+    try:
+        asyncio.run(send())
+        print("✗ Exception swallowed")
+        return False
+    except RuntimeError:
+        pass
+
+    summary = {labels[0]: (count, total) for labels, count, total, _ in histogram.summary()}
+    if summary.get("query", (0,))[0] != 1 or summary.get("send", (0, 0))[1] < 0.01:
+        print(f"✗ Unexpected observations: {summary}")
+        return False
+    if metrics.ERRORS.value("test_timed_seconds", "send") != 1 or metrics.ERRORS.value("test_timed_seconds", "query"):
+        print("✗ Errors not counted per name")
+        return False
+    print(f"✓ Observed {summary}")
+    return True
+
+
+def test_nested_timed_calls():
+    """Test that a timed call inside another one of the same histogram is counted once."""
+    print("\nTesting nested timed calls...")
+    histogram = metrics.Histogram("test_nested_seconds", "Test", ("name",))
+    other = metrics.Histogram("test_nested_other_seconds", "Test", ("name",))
+
+    @metrics.timed(histogram)
+    def leaf():
+        return 1
+
+    @metrics.timed(other)
+    def render():
+        return leaf()
+
+    @metrics.timed(histogram)
+    def weekly():
+        return sum(leaf() for _ in range(4)) + render()
+
+    @metrics.timed(histogram)
+    async def handler():
+        return await asyncio.to_thread(weekly)
+
+    if weekly() != 5 or asyncio.run(handler()) != 5 or leaf() != 1:
+        print("✗ Wrapped functions changed")
+        return False
+    counts = {labels[0]: count for labels, count, _, _ in histogram.summary()}
+    if counts != {"weekly": 1, "handler": 1, "leaf": 1}:
+        print(f"✗ Nested calls counted: {counts}")
+        return False
+    if [count for _, count, _, _ in other.summary()] != [2]:
+        print("✗ Calls into another histogram not counted")
+        return False
+    print(f"✓ Outer calls counted once: {counts}")
+    return True
+
+
+def test_exposition():
+    """Test the Prometheus text format and the p95 estimate."""
+    print("Testing exposition format...")
+    histogram = metrics.Histogram("test_expose_seconds", "Test", ("query",), buckets=(0.01, 0.1, 1.0))
+    for _ in range(90):
+        histogram.observe(0.005, "fast")
+    for _ in range(10):
+        histogram.observe(0.5, "fast")
+    histogram.observe(3.0, "slow")
+
+    text = metrics.render()
+    expected = [
+        "# TYPE test_expose_seconds histogram",
+        'test_expose_seconds_bucket{query="fast",le="0.01"} 90',
+        'test_expose_seconds_bucket{query="fast",le="1"} 100',
+        'test_expose_seconds_bucket{query="slow",le="1"} 0',
+        'test_expose_seconds_bucket{query="slow",le="+Inf"} 1',
+        'test_expose_seconds_count{query="fast"} 100',
+    ]
+    missing = [line for line in expected if line not in text]
+    if missing:
+        print(f"✗ Missing lines: {missing}")
+        return False
+    p95 = {labels[0]: p95 for labels, _, _, p95 in histogram.summary()}
+    if p95 != {"fast": 1.0, "slow": float("inf")}:
+        print(f"✗ Unexpected p95: {p95}")
+        return False
+    print("✓ Cumulative buckets, sums and counts exposed")
+    return True
+
+
+def test_http_endpoint():
+    """Test that /metrics is served over HTTP."""
+    print("Testing HTTP endpoint...")
+    server = metrics.start_http_server(19465)
+    if server is None:
+        print("✗ Server not started")
+        return False
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics", timeout=5) as resp:
+            body = resp.read().decode()
+    finally:
+        server.shutdown()
+    if "# TYPE bot_handler_seconds histogram" not in body:
+        print("✗ Handler histogram missing from the endpoint")
+        return False
+    print("✓ Endpoint served the metrics")
+    return True
+
+
+def main():
+    """Run all metrics tests."""
+    print("=== Metrics Tests ===\n")
+
+    tests = [
+        ("Timed Decorator", test_timed_decorator),
+        ("Nested Timed Calls", test_nested_timed_calls),
+        ("Exposition", test_exposition),
+        ("HTTP Endpoint", test_http_endpoint),
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        try:
+            if test_func():
+                passed += 1
+                print(f"✓ {test_name} passed")
+            else:
+                print(f"✗ {test_name} failed")
+        except Exception as e:
+            print(f"✗ {test_name} failed with exception: {e}")
+
+    print(f"\n=== Results: {passed}/{total} tests passed ===")
+
+    if passed == total:
+        print("🎉 All metrics tests passed!")
+    else:
+        print("❌ Some metrics tests failed.")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Test script for suspicious weight detection."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datetime as dt
+import random
+
+import outliers
+import trend
+
+
+def _history(days, start=dt.date(2023, 1, 1)):
+    rng = random.Random(7)
+    dates = [start + dt.timedelta(days=i) for i in range(days)]
+    weights = [round(75 - i * 0.02 + rng.uniform(-0.5, 0.5), 1) for i in range(days)]
+    return dates, weights
+
+
+def test_entry_check():
+    """Test the per-entry check on a typo and a normal value."""
+    print("Testing entry check...")
+    dates, weights = _history(30)
+    state = trend.recompute(dates, weights)
+    next_day = dates[-1] + dt.timedelta(days=1)
+
+    if outliers.check(state, next_day, weights[-1] + 0.4) is not None:
+        print("✗ A normal value was flagged")
+        return False
+    typo = round(weights[-1] * 10, 1)
+    suspicion = outliers.check(state, next_day, typo)
+    if suspicion is None or suspicion.suggestion != weights[-1]:
+        print(f"✗ Typo {typo} not flagged with the right suggestion: {suspicion}")
+        return False
+    print(f"✓ {typo} flagged, suggested {suspicion.suggestion}")
+    return True
+
+
+def test_short_history_not_checked():
+    """Test that nothing is flagged without enough previous entries."""
+    print("Testing short history...")
+    dates, weights = _history(3)
+    state = trend.recompute(dates, weights)
+    if outliers.check(state, dates[-1] + dt.timedelta(days=1), 150.0) is not None:
+        print("✗ Flagged with only 3 previous entries")
+        return False
+    print("✓ Short history not checked")
+    return True
+
+
+def test_scan_matches_check():
+    """Test that the batch scan flags exactly the entries the entry check would."""
+    print("Testing batch scan...")
+    dates, weights = _history(400)
+    weights[50] = 7.5
+    weights[200] = 751.0
+    weights[333] = weights[332] + 6
+
+    found = {s.date for s in outliers.scan(dates, weights)}
+
+    expected = set()
+    state = None
+    for date, weight in zip(dates, weights):
+        if outliers.check(state, date, weight) is not None:
+            expected.add(date)
+        state = trend.update(state, date, weight)
+
+    if found != expected:
+        print(f"✗ Scan {sorted(found)} differs from checks {sorted(expected)}")
+        return False
+    if not {dates[50], dates[200], dates[333]} <= found:
+        print(f"✗ Injected outliers missing from {sorted(found)}")
+        return False
+    print(f"✓ Scan flagged {len(found)} entries, same as the entry check")
+    return True
+
+
+def main():
+    """Run all outlier tests."""
+    print("=== Outlier Tests ===\n")
+
+    tests = [
+        ("Entry Check", test_entry_check),
+        ("Short History", test_short_history_not_checked),
+        ("Scan Matches Check", test_scan_matches_check),
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        try:
+            if test_func():
+                passed += 1
+                print(f"✓ {test_name} passed")
+            else:
+                print(f"✗ {test_name} failed")
+        except Exception as e:
+            print(f"✗ {test_name} failed with exception: {e}")
+
+    print(f"\n=== Results: {passed}/{total} tests passed ===")
+
+    if passed == total:
+        print("🎉 All outlier tests passed!")
+    else:
+        print("❌ Some outlier tests failed.")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
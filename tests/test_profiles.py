@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Test script for the cached user profiles."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datetime as dt
+import tempfile
+import types
+
+import database
+from database import init_db, get_user_language, save_user_language
+import handlers
+import profiles
+
+
+def test_language_cache():
+    """Test that language writes invalidate the cache and keep other columns."""
+    print("Testing cached language...")
+    init_db()
+    user_id = 55501
+    profiles.set_silenced(user_id, True)
+    profiles.set_language(user_id, "en")
+    profile = profiles.get_profile(user_id)
+    if profile.language_code != "en" or not profile.silenced:
+        print(f"✗ Unexpected profile: {profile}")
+        return False
+    print("✓ Language saved without clearing the silence flag")
+
+    profiles.set_language(user_id, "es")
+    if profiles.get_user_strings(user_id)["no_data"] != "sin datos":
+        print("✗ Strings not refreshed after language change")
+        return False
+    if get_user_language(user_id) != "es":
+        print("✗ Language not written to the database")
+        return False
+    print("✓ Cache invalidated on write")
+    return True
+
+
+def test_fallback_language():
+    """Test that users without a profile get and keep the fallback language."""
+    print("\nTesting fallback language...")
+    init_db()
+    user_id = 55502
+    profiles.invalidate(user_id)
+    save_user_language(user_id, "es")  # make sure a stale row doesn't leak in
+    profiles.invalidate()
+    if profiles.get_user_strings(user_id, "en")["no_data"] != "sin datos":
+        print("✗ Stored language should win over the fallback")
+        return False
+
+    user_id = 55503
+    profiles.get_profile(user_id)  # cached as a default profile
+    strings = profiles.get_user_strings(user_id, "en")
+    if strings["no_data"] != "no data" or get_user_language(user_id) != "en":
+        print("✗ Fallback language was not stored")
+        return False
+    print("✓ Fallback language stored for new users")
+    return True
+
+
+def test_activity_and_bulk_load():
+    """Test last-activity tracking and bulk loading."""
+    print("\nTesting activity and bulk load...")
+    init_db()
+    user_id = 55504
+    today = dt.date.today()
+    profiles.touch(user_id, today)
+    profiles.invalidate()
+    loaded = profiles.load_profiles()
+    if loaded < 1 or profiles.get_profile(user_id).last_active != today:
+        print("✗ Last activity not persisted")
+        return False
+    print(f"✓ Bulk loaded {loaded} profiles")
+    return True
+
+
+def test_first_command_language():
+    """Test that a first command other than /start answers in the Telegram language."""
+    print("\nTesting first command language...")
+    old = database.DB_FILE
+    database.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="profiles_test_"), "weights.db")
+    database.init_db()
+    profiles.invalidate()
+    try:
+        update = types.SimpleNamespace(effective_user=types.SimpleNamespace(id=55505, language_code="en"))
+        strings = handlers._user_strings(update)
+        profiles.invalidate()
+        if strings["no_data"] != "no data" or profiles.get_user_strings(55505)["no_data"] != "no data":
+            print("✗ First command answered or stored in the default language")
+            return False
+        if profiles.get_profile(55505).last_active is None:
+            print("✗ Activity not recorded")
+            return False
+        print("✓ Telegram language kept after the first command")
+        return True
+    finally:
+        database.DB_FILE = old
+        profiles.invalidate()
+
+
+def main():
+    """Run all profile tests."""
+    print("=== Profile Test Suite ===\n")
+
+    tests = [
+        ("Language Cache", test_language_cache),
+        ("Fallback Language", test_fallback_language),
+        ("Activity and Bulk Load", test_activity_and_bulk_load),
+        ("First Command Language", test_first_command_language),
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        try:
+            if test_func():
+                passed += 1
+                print(f"✓ {test_name} passed")
+            else:
+                print(f"✗ {test_name} failed")
+        except Exception as e:
+            print(f"✗ {test_name} failed with exception: {e}")
+
+    print(f"\n=== Results: {passed}/{total} tests passed ===")
+
+    if passed == total:
+        print("🎉 All profile tests passed!")
+    else:
+        print("❌ Some profile tests failed.")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Test script for on-demand profiling sessions."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import pstats
+import tempfile
+import types
+
+from telegram import Update
+
+import profiling
+from metrics import Histogram, timed
+from update_processor import PerUserUpdateProcessor
+
+TEST_SECONDS = Histogram("test_profiling_seconds", "Test", ("name",))
+_retained = []
+
+
+def _update(update_id, user_id):
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": "/mensual",
+        },
+    }, None)
+
+
+@timed(TEST_SECONDS)
+def render_in_thread():
+    return sum(i * i for i in range(20000))
+
+
+async def handler():
+    await asyncio.to_thread(render_in_thread)
+    # Memory that outlives the update, like a leaked figure
+    _retained.append(bytearray(512 * 1024))
+
+
+def test_profile_session():
+    """Test that a session profiles N updates, worker threads included, then stops."""
+    print("Testing profiling session...")
+    reports = []
+
+    async def deliver(report):
+        reports.append(report)
+
+    async def run():
+        processor = PerUserUpdateProcessor(8)
+        if not profiling.start(3, on_finish=deliver) or profiling.start(1):
+            return
+        for i in range(5):
+            await processor.process_update(_update(i, 900 + i), handler())
+        await asyncio.sleep(0)  # let the delivery task run
+
+    with tempfile.TemporaryDirectory() as tmp:
+        saved = profiling.PROFILE_DIR
+        profiling.PROFILE_DIR = tmp
+        try:
+            asyncio.run(run())
+        finally:
+            profiling.PROFILE_DIR = saved
+
+        if len(reports) != 1 or profiling.active():
+            print(f"✗ Expected one finished session, got {reports}")
+            return False
+        report = reports[0]
+        if report.units != 3:
+            print(f"✗ Session covered {report.units} units instead of 3")
+            return False
+        stats = pstats.Stats(report.stats_path)
+        functions = {name for _, _, name in stats.stats}
+        if "render_in_thread" not in functions or "handler" not in functions:
+            print("✗ Event loop or worker thread functions missing from the stats")
+            return False
+        calls = next(v[1] for k, v in stats.stats.items() if k[2] == "render_in_thread")
+        if calls != 3:
+            print(f"✗ render_in_thread profiled {calls} times, expected 3")
+            return False
+        if "Memory growth" not in report.summary or "test_profiling.py" not in report.summary.split("Memory growth")[1]:
+            print("✗ Memory growth not reported")
+            return False
+    print("✓ 3 updates profiled with worker threads and memory growth")
+    return True
+
+
+def test_profiler_conflict():
+    """Test that worker calls still run when their profiler can't be enabled (Python 3.12+)."""
+    print("\nTesting profiler conflicts...")
+
+    class BusyProfile:
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+
+    async def run():
+        profiling.start(1, memory=False)
+        profiling.cProfile = types.SimpleNamespace(Profile=BusyProfile)
+        try:
+            return await asyncio.to_thread(profiling.call, lambda x: x * 2, 21)
+        finally:
+            profiling.cProfile = cprofile
+            profiling.stop()
+
+    cprofile = profiling.cProfile
+    with tempfile.TemporaryDirectory() as tmp:
+        saved = profiling.PROFILE_DIR
+        profiling.PROFILE_DIR = tmp
+        try:
+            result = asyncio.run(run())
+        finally:
+            profiling.PROFILE_DIR = saved
+    if result != 42:
+        print(f"✗ Unexpected result {result}")
+        return False
+    print("✓ Call ran unprofiled")
+    return True
+
+
+def main():
+    """Run all profiling tests."""
+    print("=== Profiling Tests ===\n")
+
+    tests = [
+        ("Profile Session", test_profile_session),
+        ("Profiler Conflict", test_profiler_conflict),
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        try:
+            if test_func():
+                passed += 1
+                print(f"✓ {test_name} passed")
+            else:
+                print(f"✗ {test_name} failed")
+        except Exception as e:
+            print(f"✗ {test_name} failed with exception: {e}")
+
+    print(f"\n=== Results: {passed}/{total} tests passed ===")
+
+    if passed == total:
+        print("🎉 All profiling tests passed!")
+    else:
+        print("❌ Some profiling tests failed.")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
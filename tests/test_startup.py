@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Test script for the fast cold start: lazy imports, batched job registration and the startup report."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import subprocess
+import warnings
+
+from telegram.ext import ApplicationBuilder
+
+import startup
+from jobs import register_all_jobs, register_jobs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("matplotlib", "supabase", "pyarrow", "numpy")
+
+
+def test_lazy_imports():
+    """Importing main must not load matplotlib, supabase, pyarrow or numpy."""
+    code = "import sys, main; print(','.join(m for m in %r if m in sys.modules))" % (HEAVY_MODULES,)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT,
+                            env=dict(os.environ, PYTHONPATH=ROOT), timeout=120)
+    if result.returncode != 0:
+        print(f"✗ import main failed: {result.stderr[-500:]}")
+        return False
+    loaded = result.stdout.strip()
+    if loaded:
+        print(f"✗ Heavy modules imported at startup: {loaded}")
+        return False
+    print("✓ main imports without matplotlib, supabase, pyarrow or numpy")
+    return True
+
+
+def test_charts_render_after_lazy_load():
+    """The first render loads matplotlib by itself."""
+    import datetime as dt
+    import charts
+
+    buf = charts.render_month_chart([dt.date(2024, 1, d) for d in range(1, 6)], [80, 79.5, 79.8, 79.2, 79.0], "T")
+    if not buf.getvalue().startswith(b"\x89PNG") or charts.Figure is None:
+        print("✗ Chart not rendered after lazy load")
+        return False
+    print("✓ Chart rendered after lazy load")
+    return True
+
+
+def test_register_all_jobs():
+    """Batched registration schedules every job once, also for users already registered."""
+    warnings.simplefilter("ignore")  # PTB's note on run_daily(days=...)
+    app = ApplicationBuilder().token("123456:TEST").build()
+    register_jobs(app, 7)  # e.g. /start during startup
+
+    count = asyncio.run(register_all_jobs(app, range(1, 26), batch_size=10))
+    names = [job.name for job in app.job_queue.jobs() if not job.removed]
+    if count != 25:
+        print(f"✗ Expected 25 users registered, got {count}")
+        return False
+    if len(names) != 75 or len(set(names)) != 75:
+        print(f"✗ Expected 75 distinct jobs, got {len(names)} ({len(set(names))} distinct)")
+        return False
+    print("✓ 25 users registered in batches without duplicate jobs")
+    return True
+
+
+def test_startup_report():
+    """Phases are reported in order and the importtime output is parsed."""
+    startup.mark("test_phase")
+    result = startup.report()
+    if "test_phase" not in result["phases_ms"] or result["total_ms"] < result["phases_ms"]["test_phase"]:
+        print(f"✗ Unexpected report: {result}")
+        return False
+
+    sample = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     _io\n"
+        "import time:       300 |       2500 |   json\n"
+        "import time:      1000 |       9000 | main\n"
+    )
+    entries = startup.parse_importtime(sample)
+    if [(e.module, e.cumulative_us, e.depth) for e in entries] != [("_io", 120, 2), ("json", 2500, 1), ("main", 9000, 0)]:
+        print(f"✗ Unexpected importtime parse: {entries}")
+        return False
+    print("✓ Startup phases and importtime output reported")
+    return True
+
+
+def main():
+    """Run all startup tests."""
+    print("=== Startup Tests ===\n")
+
+    tests = [
+        ("Lazy Imports", test_lazy_imports),
+        ("Charts After Lazy Load", test_charts_render_after_lazy_load),
+        ("Batched Job Registration", test_register_all_jobs),
+        ("Startup Report", test_startup_report),
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        try:
+            if test_func():
+                passed += 1
+                print(f"✓ {test_name} passed")
+            else:
+                print(f"✗ {test_name} failed")
+        except Exception as e:
+            print(f"✗ {test_name} failed with exception: {e}")
+
+    print(f"\n=== Results: {passed}/{total} tests passed ===")
+
+    if passed == total:
+        print("🎉 All startup tests passed!")
+    else:
+        print("❌ Some startup tests failed.")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
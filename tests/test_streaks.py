@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""Test script for logging streaks and weekly adherence."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import datetime as dt
+import random
+import sqlite3
+import tempfile
+import types
+
+import numpy as np
+
+import database
+import jobs
+import profiles
+import series_cache
+import streaks
+
+TODAY = dt.date(2024, 6, 30)  # a Sunday
+
+
+def _random_days(rng, count=80):
+    day = TODAY - dt.timedelta(days=200)
+    days = []
+    while len(days) < count:
+        days.append(day)
+        day += dt.timedelta(days=rng.choice((1, 1, 1, 1, 2, 3, 9)))
+    return days
+
+
+def test_incremental_matches_backfill():
+    """Folding days one by one, with settles in between, gives the vectorized result."""
+    print("Testing incremental updates...")
+    rng = random.Random(4)
+    users, ordinals, expected = [], [], {}
+    for user_id in range(20):
+        days = _random_days(rng, rng.randint(1, 80))
+        state = None
+        for day in days:
+            if state is not None and rng.random() < 0.3:
+                # The reminder pass may have counted some of the gap already
+                state = streaks.settle(state, day - dt.timedelta(days=rng.randint(0, 3)))
+            state = streaks.update(state, day)
+        expected[user_id] = state
+        users += [user_id] * len(days)
+        ordinals += [d.toordinal() for d in days]
+
+    states = streaks.backfill(np.array(users), np.array(ordinals))
+    for user_id, state in expected.items():
+        got = states[user_id]
+        if got.missed_days(TODAY) != state.missed_days(TODAY) or streaks.settle(got, state.settled) != state:
+            print(f"✗ User {user_id}: {got} != {state}")
+            return False
+    if streaks.update(state, state.last_date) is not state:
+        print("✗ Same day changed the state")
+        return False
+    print(f"✓ {len(expected)} users match")
+    return True
+
+
+def test_adherence():
+    """Streak, adherence and missed days as seen on a given day."""
+    print("\nTesting adherence...")
+    monday = streaks.week_start(TODAY)
+    days = [monday - dt.timedelta(days=7), monday - dt.timedelta(days=5), monday, monday + dt.timedelta(days=1),
+            monday + dt.timedelta(days=2)]
+    state = streaks.recompute(days)
+    wednesday = monday + dt.timedelta(days=2)
+    checks = [
+        (state.current_streak(wednesday), 3),
+        (state.current_streak(wednesday + dt.timedelta(days=2)), 0),
+        (state.longest, 3),
+        (state.days_logged(monday), 3),
+        (state.days_logged(monday - dt.timedelta(days=7)), 2),
+        (round(state.adherence(monday, wednesday), 3), 1.0),
+        (round(state.adherence(monday - dt.timedelta(days=7), wednesday), 3), round(2 / 7, 3)),
+        (state.missed_days(wednesday), 5),
+        (state.missed_days(TODAY), 8),
+    ]
+    for got, expected in checks:
+        if got != expected:
+            print(f"✗ Got {got}, expected {expected}")
+            return False
+    print("✓ Streak, adherence and missed days as expected")
+    return True
+
+
+def test_stored_streaks():
+    """Stored counters follow writes, deletes and bulk imports; the table is backfilled when created."""
+    print("\nTesting stored streaks...")
+    old = database.DB_FILE
+    database.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="streaks_test_"), "weights.db")
+    database.init_db()
+    series_cache.invalidate()
+    try:
+        rng = random.Random(9)
+        user_id = 4401
+        days = _random_days(rng, 40)
+        for day in days:
+            database.save_weight(user_id, day, 80.0)
+        database.settle_streak(user_id, days[-1] + dt.timedelta(days=2))
+        database.save_reading(user_id, dt.datetime.combine(days[-1] + dt.timedelta(days=1), dt.time(9)), 79.0)
+        database.delete_weight(user_id, days[10])
+        database.save_weight(user_id, days[0] - dt.timedelta(days=1), 81.0)
+        database.save_weights_bulk(4402, [(d, 70.0) for d in days[:20]])
+
+        stored = {uid: database.get_streak(uid) for uid in (user_id, 4402)}
+        fresh = {uid: streaks.recompute([d for d, _ in database.get_weights(uid, dt.date.min, dt.date.max)])
+                 for uid in stored}
+        for uid in stored:
+            if stored[uid].missed_days(TODAY) != fresh[uid].missed_days(TODAY) or \
+                    streaks.settle(fresh[uid], stored[uid].settled) != stored[uid]:
+                print(f"✗ Stored streak of {uid} differs: {stored[uid]} != {fresh[uid]}")
+                return False
+
+        with sqlite3.connect(database.DB_FILE) as conn:
+            conn.execute("DROP TABLE user_streaks")
+        database.init_db()
+        if database.get_streak(4402) != fresh[4402] or database.get_streak(4403) is not None:
+            print("✗ Table not backfilled when created")
+            return False
+        print("✓ Stored counters match a recompute")
+        return True
+    finally:
+        database.DB_FILE = old
+        series_cache.invalidate()
+
+
+def test_weekly_summary_on_monday():
+    """The Monday summary compares the week that ended with the one before and includes adherence."""
+    print("\nTesting the Monday weekly summary...")
+    monday = TODAY + dt.timedelta(days=1)
+
+    class Now(dt.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls.combine(monday, dt.time(8, 10), tz)
+
+    sent = []
+
+    async def send_message(chat_id, text):
+        sent.append((chat_id, text))
+
+    old_db, old_dt = database.DB_FILE, jobs.dt
+    database.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="streaks_test_"), "weights.db")
+    database.init_db()
+    series_cache.invalidate()
+    profiles.invalidate()
+    jobs.dt = types.SimpleNamespace(datetime=Now, date=dt.date, timedelta=dt.timedelta)
+    try:
+        user_id = 4501
+        database.save_weights_bulk(user_id, [(TODAY - dt.timedelta(days=i), 80.0) for i in (13, 11, 9)])
+        database.save_weights_bulk(user_id, [(TODAY - dt.timedelta(days=i), 79.0) for i in (6, 4, 2, 1, 0)])
+        database.refresh_streak(user_id)
+        context = types.SimpleNamespace(job=types.SimpleNamespace(data={"user_id": user_id}),
+                                        bot=types.SimpleNamespace(send_message=send_message))
+        asyncio.run(jobs.weekly_summary_job(context))
+        strings = profiles.get_user_strings(user_id)
+        if len(sent) != 1:
+            print("✗ No summary sent on Monday")
+            return False
+        text = sent[0][1]
+        expected = [
+            strings["weekly_summary_format"].format(
+                current=79.0, previous=80.0, change=strings["weekly_decrease"].format(diff=1.0)),
+            strings["weekly_streak"].format(adherence=5 / 7 * 100, missed=2, current=3, longest=3),
+        ]
+        if text.split("\n")[1:] != expected:
+            print(f"✗ Unexpected summary: {text}")
+            return False
+        print("✓ Last week's averages and adherence sent")
+        return True
+    finally:
+        jobs.dt = old_dt
+        database.DB_FILE = old_db
+        series_cache.invalidate()
+        profiles.invalidate()
+
+
+def main():
+    """Run all streak tests."""
+    print("=== Streak Tests ===\n")
+
+    tests = [
+        ("Incremental Updates", test_incremental_matches_backfill),
+        ("Adherence", test_adherence),
+        ("Stored Streaks", test_stored_streaks),
+        ("Monday Weekly Summary", test_weekly_summary_on_monday),
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        try:
+            if test_func():
+                passed += 1
+                print(f"✓ {test_name} passed")
+            else:
+                print(f"✗ {test_name} failed")
+        except Exception as e:
+            print(f"✗ {test_name} failed with exception: {e}")
+
+    print(f"\n=== Results: {passed}/{total} tests passed ===")
+
+    if passed == total:
+        print("🎉 All streak tests passed!")
+    else:
+        print("❌ Some streak tests failed.")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Test script for per-update tracing spans."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import json
+import tempfile
+
+from telegram import Update
+
+import tracing
+from metrics import Histogram, timed
+from update_processor import PerUserUpdateProcessor
+
+TEST_SECONDS = Histogram("test_tracing_seconds", "Test", ("name",))
+
+
+def _update(update_id, user_id):
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": "/peso 72.5",
+        },
+    }, None)
+
+
+@timed(TEST_SECONDS)
+def save(weight):
+    return weight
+
+
+@timed(TEST_SECONDS)
+def render(weight):
+    return b"png"
+
+
+@timed(TEST_SECONDS)
+async def handler(weight):
+    save(weight)
+    await asyncio.to_thread(render, weight)
+    with tracing.span("send"):
+        await asyncio.sleep(0.01)
+
+
+def _export(updates, sample_rate, parents=None):
+    """Process ``updates`` with the given sample rate; return the exported spans."""
+    fd, path = tempfile.mkstemp(suffix=".jsonl")
+    os.close(fd)
+    saved_rate, saved_path = tracing.TRACE_SAMPLE_RATE, tracing._exporter.path
+    tracing.TRACE_SAMPLE_RATE, tracing._exporter.path = sample_rate, path
+    try:
+        for update_id, traceparent in (parents or {}).items():
+            tracing.set_remote_parent(update_id, traceparent)
+        processor = PerUserUpdateProcessor(8)
+
+        async def run():
+            await asyncio.gather(*(processor.process_update(u, handler(72.5)) for u in updates))
+
+        asyncio.run(run())
+        tracing.flush()
+        with open(path) as f:
+            return [json.loads(line) for line in f]
+    finally:
+        tracing.TRACE_SAMPLE_RATE, tracing._exporter.path = saved_rate, saved_path
+        os.unlink(path)
+
+
+def test_span_tree():
+    """Test that a sampled update gets a root span with one child per stage."""
+    print("Testing span tree...")
+    spans = _export([_update(1, 500)], 1.0)
+    by_name = {s["name"]: s for s in spans}
+    if set(by_name) != {"update", "handler", "save", "render", "send"}:
+        print(f"✗ Unexpected spans: {sorted(by_name)}")
+        return False
+    root = by_name["update"]
+    if root["parent_id"] is not None or root["attrs"]["user_id"] != 500 or root["attrs"]["command"] != "/peso":
+        print(f"✗ Bad root span: {root}")
+        return False
+    if by_name["handler"]["parent_id"] != root["span_id"]:
+        print("✗ Handler span is not a child of the update")
+        return False
+    # render ran in a worker thread: the context must have followed it
+    for name in ("save", "render", "send"):
+        if by_name[name]["parent_id"] != by_name["handler"]["span_id"]:
+            print(f"✗ {name} span is not a child of the handler")
+            return False
+    if len({s["trace_id"] for s in spans}) != 1:
+        print("✗ Spans belong to different traces")
+        return False
+    print(f"✓ {len(spans)} spans in one trace, including the worker thread")
+    return True
+
+
+def test_sampling():
+    """Test that unsampled updates record nothing and sampling is per update."""
+    print("Testing sampling...")
+    if _export([_update(i, 600 + i) for i in range(5)], 0.0):
+        print("✗ Spans exported with sampling disabled")
+        return False
+    spans = _export([_update(i, 700 + i) for i in range(200)], 0.25)
+    traces = {s["trace_id"] for s in spans}
+    if not 20 <= len(traces) <= 80:
+        print(f"✗ {len(traces)} of 200 updates traced at a 25% rate")
+        return False
+    print(f"✓ {len(traces)} of 200 updates traced at a 25% rate")
+    return True
+
+
+def test_remote_parent():
+    """Test that an update continues the ingress trace, and keeps its sampling decision."""
+    print("Testing remote parent...")
+    trace_id, ingress_span = "ab" * 16, "cd" * 8
+    spans = _export(
+        [_update(1, 800), _update(2, 801)], 0.0,
+        parents={1: f"00-{trace_id}-{ingress_span}-01", 2: tracing.NOT_SAMPLED},
+    )
+    roots = [s for s in spans if s["name"] == "update"]
+    if len(roots) != 1 or roots[0]["trace_id"] != trace_id or roots[0]["parent_id"] != ingress_span:
+        print(f"✗ Remote parent not continued: {roots}")
+        return False
+    if any(s["attrs"].get("user_id") == 801 for s in roots):
+        print("✗ An update not sampled by the ingress was traced")
+        return False
+    print("✓ Worker spans join the ingress trace")
+    return True
+
+
+def main():
+    """Run all tracing tests."""
+    print("=== Tracing Tests ===\n")
+
+    tests = [
+        ("Span Tree", test_span_tree),
+        ("Sampling", test_sampling),
+        ("Remote Parent", test_remote_parent),
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        try:
+            if test_func():
+                passed += 1
+                print(f"✓ {test_name} passed")
+            else:
+                print(f"✗ {test_name} failed")
+        except Exception as e:
+            print(f"✗ {test_name} failed with exception: {e}")
+
+    print(f"\n=== Results: {passed}/{total} tests passed ===")
+
+    if passed == total:
+        print("🎉 All tracing tests passed!")
+    else:
+        print("❌ Some tracing tests failed.")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
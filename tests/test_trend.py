@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Test script for the incremental weight trend."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datetime as dt
+import math
+import random
+
+import trend
+from database import init_db, save_weight, save_weights_bulk, get_trend
+
+
+def _history(days, start=dt.date(2023, 1, 1), skip_every=4):
+    """A slowly decreasing history with gaps and noise."""
+    rng = random.Random(42)
+    entries = []
+    for i in range(days):
+        if i % skip_every == 3:
+            continue
+        entries.append((start + dt.timedelta(days=i), 90 - i * 0.05 + rng.uniform(-0.6, 0.6)))
+    return entries
+
+
+def _close(a, b, tol=1e-6):
+    return math.isclose(a, b, rel_tol=tol, abs_tol=tol)
+
+
+def test_incremental_matches_recompute():
+    """Test that O(1) updates (including same-day replacements) match the recompute."""
+    print("Testing incremental vs recompute...")
+    entries = _history(2000)
+    state = None
+    for i, (date, weight) in enumerate(entries):
+        if i % 5 == 0:
+            # A second reading of the same day replaces the first
+            state = trend.update(state, date, weight + 2.0)
+        state = trend.update(state, date, weight)
+    full = trend.recompute([d for d, _ in entries], [w for _, w in entries])
+    for name in ("trend", "s0", "s1", "s2", "sy", "sty"):
+        if not _close(getattr(state, name), getattr(full, name)):
+            print(f"✗ {name} differs: {getattr(state, name)} vs {getattr(full, name)}")
+            return False
+    if state.count != full.count or state.last_date != full.last_date:
+        print("✗ Count or last date differs")
+        return False
+    print(f"✓ Same state after {len(entries)} entries")
+    return True
+
+
+def test_rate_and_projection():
+    """Test the weekly rate on a linear series and the goal projection."""
+    print("Testing rate and projection...")
+    start = dt.date(2024, 1, 1)
+    dates = [start + dt.timedelta(days=i) for i in range(60)]
+    state = trend.recompute(dates, [80 - i * 0.1 for i in range(60)])
+    if not _close(state.weekly_rate, -0.7, tol=1e-6):
+        print(f"✗ Expected -0.7 kg/week, got {state.weekly_rate}")
+        return False
+    eta = trend.projection(state, state.trend - 1.0)
+    if eta is None or not 0 < (eta - state.last_date).days <= 11:
+        print(f"✗ Unexpected projection: {eta}")
+        return False
+    if trend.projection(state, state.trend + 5) is not None:
+        print("✗ A goal above a falling trend should not be projected")
+        return False
+    print(f"✓ Rate {state.weekly_rate:+.2f} kg/week, 1 kg less by {eta}")
+    return True
+
+
+def test_stored_trend():
+    """Test that save_weight keeps the stored trend in sync, including corrections."""
+    print("Testing stored trend...")
+    init_db()
+    user_id = 88801
+    entries = _history(120, start=dt.date(2022, 1, 1))
+    save_weights_bulk(user_id, entries[:-10])
+    for date, weight in entries[-10:]:
+        save_weight(user_id, date, weight)
+    # Correct an older day: falls back to a recompute
+    save_weight(user_id, entries[5][0], entries[5][1] + 1.0)
+    entries[5] = (entries[5][0], entries[5][1] + 1.0)
+
+    stored = get_trend(user_id)
+    expected = trend.recompute([d for d, _ in entries], [w for _, w in entries])
+    if not (_close(stored.trend, expected.trend) and _close(stored.weekly_rate, expected.weekly_rate)):
+        print(f"✗ Stored trend {stored} differs from {expected}")
+        return False
+    print(f"✓ Stored trend {stored.trend:.2f} kg, {stored.weekly_rate:+.2f} kg/week")
+    return True
+
+
+def main():
+    """Run all trend tests."""
+    print("=== Trend Tests ===\n")
+
+    tests = [
+        ("Incremental Matches Recompute", test_incremental_matches_recompute),
+        ("Rate And Projection", test_rate_and_projection),
+        ("Stored Trend", test_stored_trend),
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        try:
+            if test_func():
+                passed += 1
+                print(f"✓ {test_name} passed")
+            else:
+                print(f"✗ {test_name} failed")
+        except Exception as e:
+            print(f"✗ {test_name} failed with exception: {e}")
+
+    print(f"\n=== Results: {passed}/{total} tests passed ===")
+
+    if passed == total:
+        print("🎉 All trend tests passed!")
+    else:
+        print("❌ Some trend tests failed.")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
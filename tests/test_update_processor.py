@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Test script for concurrent update processing with per-user ordering."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+from telegram import Update
+
+from admission import Admission
+from update_processor import PerUserUpdateProcessor
+
+
+def _update(update_id, user_id, text="/diario"):
+    """Build a minimal text message update from ``user_id``."""
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }, None)
+
+
+async def _run_updates(processor, updates, delays, log):
+    async def handle(update, delay):
+        await asyncio.sleep(delay)
+        log.append((update.effective_user.id, update.update_id))
+
+    # Like PTB, start one task per update in arrival order
+    tasks = [
+        asyncio.create_task(processor.process_update(u, handle(u, d)))
+        for u, d in zip(updates, delays)
+    ]
+    await asyncio.gather(*tasks)
+
+
+def test_per_user_ordering():
+    """Test that a slow user doesn't block others and keeps their own order."""
+    print("Testing per-user ordering...")
+    processor = PerUserUpdateProcessor(16)
+    updates = [_update(1, 100), _update(2, 100), _update(3, 200), _update(4, 200)]
+    delays = [0.2, 0.0, 0.05, 0.0]
+    log = []
+    asyncio.run(_run_updates(processor, updates, delays, log))
+
+    if [uid for uid, _ in log[:2]] != [200, 200]:
+        print(f"✗ Fast user was held up by the slow one: {log}")
+        return False
+    print("✓ Other users are not blocked by a slow update")
+    if [i for uid, i in log if uid == 100] != [1, 2] or [i for uid, i in log if uid == 200] != [3, 4]:
+        print(f"✗ Updates ran out of order: {log}")
+        return False
+    print("✓ Each user's updates ran in arrival order")
+    if processor.pending(100) or processor.pending(200):
+        print("✗ Idle per-user locks were not released")
+        return False
+    return True
+
+
+def test_bounded_pending():
+    """Test that a flooding user's extra updates are dropped, others are not."""
+    print("Testing bounded per-user pending updates...")
+    processor = PerUserUpdateProcessor(16, max_pending_per_user=3)
+    updates = [_update(i, 100) for i in range(1, 7)] + [_update(7, 200)]
+    log = []
+    asyncio.run(_run_updates(processor, updates, [0.01] * len(updates), log))
+
+    if [i for uid, i in log if uid == 100] != [1, 2, 3] or processor.dropped != 3:
+        print(f"✗ Expected updates 1-3 kept and 3 dropped: {log}, dropped={processor.dropped}")
+        return False
+    if (200, 7) not in log:
+        print("✗ Another user's update was dropped")
+        return False
+    if processor.waits.count != 4:
+        print(f"✗ Expected 4 recorded waits, got {processor.waits.count}")
+        return False
+    print(f"✓ 3 updates dropped, max wait {processor.waits.snapshot()['max'] * 1000:.0f} ms")
+
+    # Weights and command arguments are kept past the cap
+    processor = PerUserUpdateProcessor(16, max_pending_per_user=2)
+    texts = ["/diario", "/semanal", "/mensual", "80.5", "/peso 80,4", "/stats"]
+    updates = [_update(i, 100, text) for i, text in enumerate(texts, 1)]
+    log = []
+    asyncio.run(_run_updates(processor, updates, [0.01] * len(updates), log))
+    if [i for _, i in log] != [1, 2, 4, 5] or processor.dropped != 2:
+        print(f"✗ Expected the weight entries kept: {log}, dropped={processor.dropped}")
+        return False
+    print("✓ Weight entries kept past the cap")
+    return True
+
+
+def test_backlog_holds_no_slots():
+    """Test that updates waiting behind their user don't take the slots other users need."""
+    print("Testing global slots with a user backlog...")
+    processor = PerUserUpdateProcessor(2, max_pending_per_user=10)
+    updates = [_update(i, 100) for i in range(1, 11)] + [_update(11, 200)]
+    log = []
+    asyncio.run(_run_updates(processor, updates, [0.05] * 10 + [0.0], log))
+
+    if log.index((200, 11)) != 0:
+        print(f"✗ Other user waited for the backlog: {log}")
+        return False
+    if [i for uid, i in log if uid == 100] != list(range(1, 11)):
+        print(f"✗ Backlog ran out of order: {log}")
+        return False
+    print("✓ Another user's update ran before the 10-update backlog")
+    return True
+
+
+def test_chart_admission():
+    """Test single-flight coalescing and the concurrency cap of the admission layer."""
+    print("Testing chart admission...")
+    admission = Admission(2)
+    calls = []
+    active = []
+
+    async def render(key):
+        calls.append(key)
+        active.append(admission.running)
+        await asyncio.sleep(0.02)
+        return f"png-{key}"
+
+    async def run():
+        tasks = [admission.submit(("user", 1), lambda: render(1)) for _ in range(5)]
+        tasks += [admission.submit(("user", k), lambda k=k: render(k)) for k in range(2, 6)]
+        return await asyncio.gather(*tasks)
+
+    results = asyncio.run(run())
+    if results[:5] != ["png-1"] * 5 or calls.count(1) != 1 or admission.coalesced != 4:
+        print(f"✗ Duplicate requests were not coalesced: {calls}")
+        return False
+    print("✓ 5 identical requests shared one render")
+    if max(active) > 2:
+        print(f"✗ More than 2 renders ran at once: {active}")
+        return False
+    if admission.in_flight() or admission.waits.snapshot()["max"] < 0.015:
+        print("✗ Unexpected in-flight jobs or wait times")
+        return False
+    print(f"✓ At most 2 renders at once, p95 wait {admission.waits.snapshot()['p95'] * 1000:.0f} ms")
+    return True
+
+
+def main():
+    """Run all update processor tests."""
+    print("=== Update Processor Test Suite ===\n")
+
+    tests = [
+        ("Per-User Ordering", test_per_user_ordering),
+        ("Bounded Pending", test_bounded_pending),
+        ("Backlog Holds No Slots", test_backlog_holds_no_slots),
+        ("Chart Admission", test_chart_admission),
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        try:
+            if test_func():
+                passed += 1
+                print(f"✓ {test_name} passed")
+            else:
+                print(f"✗ {test_name} failed")
+        except Exception as e:
+            print(f"✗ {test_name} failed with exception: {e}")
+
+    print(f"\n=== Results: {passed}/{total} tests passed ===")
+
+    if passed == total:
+        print("🎉 All update processor tests passed!")
+    else:
+        print("❌ Some update processor tests failed.")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
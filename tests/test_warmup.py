@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Test script for the recent series cache and the startup warm-up."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datetime as dt
+import tempfile
+import time
+
+import database
+import profiles
+import series_cache
+import warmup
+
+TODAY = dt.datetime.now().date()
+
+
+def _use_temp_db():
+    old = database.DB_FILE
+    database.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="warmup_test_"), "weights.db")
+    database.init_db()
+    series_cache.invalidate()
+    return old
+
+
+def test_series_cache():
+    """Recent ranges are served from memory and follow every write."""
+    print("Testing the series cache...")
+    old = _use_temp_db()
+    try:
+        user_id = 66601
+        days = [TODAY - dt.timedelta(days=i) for i in range(10, 0, -1)]
+        database.save_weights_bulk(user_id, [(d, 80.0 + i / 10) for i, d in enumerate(days)])
+        expected = database._query_weights(user_id, days[3], days[7])
+
+        hits = series_cache.LOOKUPS.value("hit")
+        if database.get_weights(user_id, days[3], days[7]) != expected:
+            print("✗ Wrong rows on a cache miss")
+            return False
+        if database.get_weights(user_id, days[3], days[7]) != expected or series_cache.LOOKUPS.value("hit") != hits + 1:
+            print("✗ Second read not served from the cache")
+            return False
+
+        database.save_weight(user_id, TODAY, 79.0)
+        database.save_reading(user_id, dt.datetime.combine(days[5], dt.time(20)), 81.5)
+        database.delete_weight(user_id, days[0])
+        cached = database.get_weights(user_id, days[0], TODAY)
+        if cached != database._query_weights(user_id, days[0], TODAY):
+            print(f"✗ Cache out of date after writes: {cached}")
+            return False
+
+        # A series read before a write must not be cached after it
+        mark = series_cache.write_mark()
+        stale = database._query_weights(user_id, series_cache.window_start(), dt.date.max)
+        database.save_weights_bulk(user_id, [(TODAY, 78.0)])
+        if series_cache.put(user_id, series_cache.window_start(), stale, mark):
+            print("✗ Stale series cached")
+            return False
+        if database.get_weights(user_id, TODAY, TODAY) != [(TODAY, 78.0)]:
+            print("✗ Bulk write not visible")
+            return False
+        print("✓ Cache hits, writes applied and stale reads rejected")
+        return True
+    finally:
+        database.DB_FILE = old
+        series_cache.invalidate()
+
+
+def test_warm_up():
+    """Recently active users get their profile and series preloaded, at a bounded rate."""
+    print("\nTesting the warm-up...")
+    old = _use_temp_db()
+    profiles.invalidate()
+    try:
+        active, inactive = [66611, 66612, 66613], 66614
+        for user_id in active + [inactive]:
+            database.save_weights_bulk(user_id, [(TODAY - dt.timedelta(days=i), 70.0 + i) for i in range(1, 6)])
+            database.save_user_language(user_id, "en")
+        for user_id in active:
+            database.save_user_activity(user_id, TODAY - dt.timedelta(days=1))
+        database.save_user_activity(inactive, TODAY - dt.timedelta(days=60))
+        database.save_user_silenced(active[0], True)
+
+        t0 = time.monotonic()
+        result = warmup.warm_up(owns=lambda uid: uid != active[2], active_days=14, users_per_second=20)
+        elapsed = time.monotonic() - t0
+        if result["users"] != 2 or result["rows"] != 10:
+            print(f"✗ Unexpected warm-up result: {result}")
+            return False
+        if elapsed < 0.09:
+            print(f"✗ Rate limit not applied ({elapsed:.3f}s for 2 users at 20/s)")
+            return False
+        if not profiles.get_profile(active[0]).silenced or result["other_profiles"] != 1:
+            print("✗ Profiles not preloaded")
+            return False
+
+        hits = series_cache.LOOKUPS.value("hit")
+        database.get_weights(active[1], TODAY - dt.timedelta(days=7), TODAY)
+        database.get_weights(inactive, TODAY - dt.timedelta(days=7), TODAY)
+        if series_cache.LOOKUPS.value("hit") != hits + 1:
+            print("✗ Only the warmed user should hit the cache")
+            return False
+        print(f"✓ {result['users']} users warmed in {elapsed:.2f}s")
+        return True
+    finally:
+        database.DB_FILE = old
+        series_cache.invalidate()
+        profiles.invalidate()
+
+
+def main():
+    """Run all warm-up tests."""
+    print("=== Warm-up Tests ===\n")
+
+    tests = [
+        ("Series Cache", test_series_cache),
+        ("Warm-up", test_warm_up),
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        try:
+            if test_func():
+                passed += 1
+                print(f"✓ {test_name} passed")
+            else:
+                print(f"✗ {test_name} failed")
+        except Exception as e:
+            print(f"✗ {test_name} failed with exception: {e}")
+
+    print(f"\n=== Results: {passed}/{total} tests passed ===")
+
+    if passed == total:
+        print("🎉 All warm-up tests passed!")
+    else:
+        print("❌ Some warm-up tests failed.")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+"""Lightweight per-update tracing.
+
+A sampled update gets a root span (opened by the update processor) and a
+child span for every ``metrics.timed`` call made while handling it:
+handler, database queries, chart render, Bot API requests, backups. The
+current span lives in a ContextVar, so it follows ``await`` chains,
+background tasks (``asyncio.create_task`` copies the context) and
+``asyncio.to_thread``; use ``wrap`` for other executors. Between cluster
+processes the span travels as a W3C ``traceparent`` string.
+
+When an update is not sampled nothing is recorded and every span call
+returns after one ContextVar lookup. Finished spans are queued and written
+by a background thread, either as JSON lines (TRACE_EXPORTER=file) or as
+OTLP/HTTP JSON to a collector (TRACE_EXPORTER=otlp).
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import TRACE_SAMPLE_RATE, TRACE_EXPORTER, TRACE_FILE, TRACE_OTLP_ENDPOINT
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "weightlogsbot"
+EXPORT_BATCH = 512  # spans written or posted at once
+EXPORT_INTERVAL_SECONDS = 2.0
+MAX_REMOTE_PARENTS = 10000  # updates received from the ingress but not processed yet
+# Remote parent of updates the ingress chose not to trace
+NOT_SAMPLED = f"00-{'0' * 32}-{'0' * 16}-00"
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    attrs: Dict[str, Any] = field(default_factory=dict)
+    end_ns: Optional[int] = None
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        entry = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+        }
+        if self.attrs:
+            entry["attrs"] = self.attrs
+        if self.error:
+            entry["error"] = self.error
+        return entry
+
+
+SpanHandle = Tuple[Span, contextvars.Token]
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("trace_span", default=None)
+_remote_parents: "OrderedDict[Any, str]" = OrderedDict()
+_remote_lock = threading.Lock()
+
+
+def _new_id(nbytes: int) -> str:
+    return random.getrandbits(nbytes * 8).to_bytes(nbytes, "big").hex()
+
+
+def _parse_traceparent(value: str) -> Optional[Tuple[str, str, bool]]:
+    """(trace id, parent span id, sampled) from ``00-<trace>-<span>-<flags>``."""
+    try:
+        _, trace_id, span_id, flags = value.split("-")
+        return trace_id, span_id, bool(int(flags, 16) & 1)
+    except (AttributeError, ValueError):
+        return None
+
+
+def start_trace(name: str, parent: Optional[str] = None, sample_rate: Optional[float] = None, **attrs) -> Optional[SpanHandle]:
+    """Open a root span, or continue the trace of a remote ``traceparent``.
+
+    Returns None (and records nothing) when the trace isn't sampled. A remote
+    parent's sampling decision is kept so traces are never cut in half.
+    """
+    remote = _parse_traceparent(parent) if parent else None
+    if remote is not None:
+        trace_id, parent_id, sampled = remote
+    else:
+        trace_id, parent_id = None, None
+        rate = TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+        sampled = rate > 0 and random.random() < rate
+    if not sampled:
+        return None
+    span = Span(name, trace_id or _new_id(16), _new_id(8), parent_id, time.time_ns(), attrs)
+    return span, _current.set(span)
+
+
+def start_span(name: str, **attrs) -> Optional[SpanHandle]:
+    """Open a child of the current span; None when there is no sampled trace."""
+    parent = _current.get()
+    if parent is None:
+        return None
+    span = Span(name, parent.trace_id, _new_id(8), parent.span_id, time.time_ns(), attrs)
+    return span, _current.set(span)
+
+
+def end_span(handle: Optional[SpanHandle], error: Optional[BaseException] = None) -> None:
+    """Close a span opened by ``start_trace``/``start_span`` and queue it for export."""
+    if handle is None:
+        return
+    span, token = handle
+    span.end_ns = time.time_ns()
+    if error is not None:
+        span.error = f"{type(error).__name__}: {error}"
+    try:
+        _current.reset(token)
+    except ValueError:
+        # Closed from another context (e.g. a callback); the original context keeps its value
+        pass
+    _exporter.submit(span)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Optional[Span]]:
+    """Context manager around ``start_span``/``end_span``."""
+    handle = start_span(name, **attrs)
+    try:
+        yield handle[0] if handle else None
+    except BaseException as e:
+        end_span(handle, e)
+        handle = None
+        raise
+    finally:
+        end_span(handle)
+
+
+def set_attribute(key: str, value: Any) -> None:
+    """Set an attribute on the current span, if any."""
+    current = _current.get()
+    if current is not None:
+        current.attrs[key] = value
+
+
+def current_traceparent() -> Optional[str]:
+    """The current span as a W3C traceparent, to continue the trace in another process."""
+    current = _current.get()
+    if current is None:
+        return None
+    return f"00-{current.trace_id}-{current.span_id}-01"
+
+
+def set_remote_parent(key: Any, traceparent: Optional[str]) -> None:
+    """Remember the traceparent an update arrived with until it is processed."""
+    if not traceparent:
+        return
+    with _remote_lock:
+        _remote_parents[key] = traceparent
+        while len(_remote_parents) > MAX_REMOTE_PARENTS:
+            _remote_parents.popitem(last=False)
+
+
+def pop_remote_parent(key: Any) -> Optional[str]:
+    if not _remote_parents:
+        return None
+    with _remote_lock:
+        return _remote_parents.pop(key, None)
+
+
+def wrap(func: Callable) -> Callable:
+    """Bind ``func`` to the current context, for executors that don't copy it."""
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(func, *args, **kwargs)
+
+
+def _otlp_payload(spans: List[Span]) -> Dict[str, Any]:
+    def attr(key: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    otlp_spans = []
+    for s in spans:
+        entry = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 1,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [attr(k, v) for k, v in s.attrs.items()],
+            "status": {"code": 2, "message": s.error} if s.error else {},
+        }
+        if s.parent_id:
+            entry["parentSpanId"] = s.parent_id
+        otlp_spans.append(entry)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [attr("service.name", SERVICE_NAME), attr("process.pid", os.getpid())]},
+        "scopeSpans": [{"scope": {"name": SERVICE_NAME}, "spans": otlp_spans}],
+    }]}
+
+
+class _Exporter:
+    """Background thread writing finished spans in batches."""
+
+    def __init__(self):
+        self._queue: "queue.SimpleQueue[Optional[Span]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.exporter = TRACE_EXPORTER
+        self.path = TRACE_FILE
+        self.endpoint = TRACE_OTLP_ENDPOINT
+
+    def submit(self, span: Span) -> None:
+        if self._thread is None:
+            self._start()
+        self._queue.put(span)
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self) -> None:
+        client = None
+        if self.exporter == "otlp":
+            import httpx
+            client = httpx.Client(timeout=5.0)
+        batch: List[Span] = []
+        stop = False
+        while not stop:
+            deadline = time.monotonic() + EXPORT_INTERVAL_SECONDS
+            while len(batch) < EXPORT_BATCH:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            if batch:
+                try:
+                    self._write(batch, client)
+                except Exception as e:
+                    logger.warning("Dropped %d spans: %s", len(batch), e)
+                batch = []
+
+    def _write(self, batch: List[Span], client) -> None:
+        if client is not None:
+            client.post(self.endpoint, json=_otlp_payload(batch)).raise_for_status()
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(s.to_dict(), default=str) + "\n" for s in batch)
+
+    def flush(self) -> None:
+        """Write everything queued and stop the thread (it restarts on the next span)."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout=10)
+
+
+_exporter = _Exporter()
+
+
+def flush() -> None:
+    """Export all finished spans now."""
+    _exporter.flush()
@@ -0,0 +1,178 @@
+"""Weight trend: smoothed weight, weekly rate of change and goal projection.
+
+The trend of a user is summarised by a small ``TrendState``:
+
+* ``trend`` is an exponential moving average of the weights (Hacker's Diet
+  style, TREND_SMOOTHING per day), adjusted for gaps between entries.
+* ``s0 .. sty`` are the sums of an exponentially weighted least-squares fit
+  of weight against day (half-life TREND_HALF_LIFE_DAYS). Times are kept
+  relative to the last entry, so the sums stay small however long the
+  history is. Their slope is the current rate of change.
+
+The state also keeps the last OUTLIER_WINDOW weights (``recent``), used
+by ``outliers`` to check new entries.
+
+``update`` folds one newer entry into a state, or replaces the value of
+the last day, in O(1); ``recompute`` builds the same state from a whole
+history with NumPy, for backfills and for changes to older days. This module only does the math; the
+state is stored by ``database``.
+"""
+
+import datetime as dt
+import math
+from dataclasses import dataclass, replace
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import TREND_SMOOTHING, TREND_HALF_LIFE_DAYS, OUTLIER_WINDOW
+
+MIN_RATE_ENTRIES = 2
+MAX_PROJECTION_DAYS = 5 * 365
+GOAL_TOLERANCE = 0.1  # kg
+
+
+@dataclass
+class TrendState:
+    """Trend of one user as of ``last_date``."""
+
+    last_date: dt.date
+    last_weight: float
+    trend: float
+    count: int = 1
+    s0: float = 1.0  # sum of w
+    s1: float = 0.0  # sum of w*t
+    s2: float = 0.0  # sum of w*t^2
+    sy: float = 0.0  # sum of w*y
+    sty: float = 0.0  # sum of w*t*y
+    recent: Tuple[float, ...] = ()  # last OUTLIER_WINDOW weights, oldest first
+    last_step: float = 1.0  # EMA weight of the last entry, to replace it in O(1)
+
+    @classmethod
+    def first(cls, date: dt.date, weight: float) -> "TrendState":
+        return cls(last_date=date, last_weight=weight, trend=weight, sy=weight, recent=(weight,))
+
+    @property
+    def daily_rate(self) -> Optional[float]:
+        """Slope of the weighted fit in kg/day, or None without enough data."""
+        if self.count < MIN_RATE_ENTRIES:
+            return None
+        denom = self.s0 * self.s2 - self.s1 * self.s1
+        if denom <= 1e-9:
+            return None
+        return (self.s0 * self.sty - self.s1 * self.sy) / denom
+
+    @property
+    def weekly_rate(self) -> Optional[float]:
+        rate = self.daily_rate
+        return None if rate is None else rate * 7
+
+
+def _ema_decay(days):
+    return (1.0 - TREND_SMOOTHING) ** days
+
+
+def _fit_decay(days):
+    return 0.5 ** (days / TREND_HALF_LIFE_DAYS)
+
+
+def update(state: Optional[TrendState], date: dt.date, weight: float) -> TrendState:
+    """Fold an entry into the state in O(1).
+
+    ``date`` must not be older than ``state.last_date``; an entry for the
+    same day replaces that day's weight.
+    """
+    if state is None:
+        return TrendState.first(date, weight)
+    gap = (date - state.last_date).days
+    if gap < 0:
+        raise ValueError("entry is older than the trend state")
+    if gap == 0:
+        # The last entry sits at t=0 with fit weight 1, so only the y sums change
+        delta = weight - state.last_weight
+        return replace(
+            state,
+            last_weight=weight,
+            trend=state.trend + state.last_step * delta,
+            sy=state.sy + delta,
+            recent=state.recent[:-1] + (weight,),
+        )
+
+    step = 1.0 - _ema_decay(gap)
+    trend = state.trend + step * (weight - state.trend)
+
+    # Move the time origin to the new entry (every t becomes t - gap),
+    # then age the old entries by the decay of ``gap`` days
+    decay = _fit_decay(gap)
+    s0, s1, s2, sy, sty = state.s0, state.s1, state.s2, state.sy, state.sty
+    s2 = s2 - 2 * gap * s1 + gap * gap * s0
+    s1 = s1 - gap * s0
+    sty = sty - gap * sy
+
+    return TrendState(
+        last_date=date,
+        last_weight=weight,
+        trend=trend,
+        count=state.count + 1,
+        s0=s0 * decay + 1.0,
+        s1=s1 * decay,
+        s2=s2 * decay,
+        sy=sy * decay + weight,
+        sty=sty * decay,
+        recent=(state.recent + (weight,))[-OUTLIER_WINDOW:],
+        last_step=step,
+    )
+
+
+def recompute(dates: Sequence[dt.date], weights: Sequence[float]) -> Optional[TrendState]:
+    """Build the state of a whole history (sorted by date) in one vectorized pass.
+
+    Gives the same result as calling ``update`` entry by entry.
+    """
+    if not len(dates):
+        return None
+    days = np.fromiter((d.toordinal() for d in dates), dtype=float, count=len(dates))
+    y = np.asarray(weights, dtype=float)
+    age = days[-1] - days  # days before the last entry, >= 0
+
+    # Unrolled EMA: every entry contributes its step weight times the decay
+    # accumulated since; the first entry seeds the average with weight 1
+    step = np.empty_like(y)
+    step[0] = 1.0
+    step[1:] = 1.0 - _ema_decay(np.diff(days))
+    trend = float(np.sum(step * y * _ema_decay(age)))
+
+    w = _fit_decay(age)
+    t = -age
+    return TrendState(
+        last_date=dates[-1],
+        last_weight=float(y[-1]),
+        trend=trend,
+        count=len(y),
+        s0=float(w.sum()),
+        s1=float((w * t).sum()),
+        s2=float((w * t * t).sum()),
+        sy=float((w * y).sum()),
+        sty=float((w * t * y).sum()),
+        recent=tuple(float(v) for v in y[-OUTLIER_WINDOW:]),
+        last_step=float(step[-1]),
+    )
+
+
+def projection(state: TrendState, goal: float) -> Optional[dt.date]:
+    """Date the trend reaches ``goal`` at the current rate.
+
+    Returns ``state.last_date`` when the goal is already reached, and None
+    when the trend is flat, moving away from the goal, or too slow to get
+    there within MAX_PROJECTION_DAYS.
+    """
+    remaining = goal - state.trend
+    if abs(remaining) <= GOAL_TOLERANCE:
+        return state.last_date
+    rate = state.daily_rate
+    if not rate or (remaining > 0) != (rate > 0):
+        return None
+    days = remaining / rate
+    if days > MAX_PROJECTION_DAYS:
+        return None
+    return state.last_date + dt.timedelta(days=math.ceil(days))
@@ -0,0 +1,154 @@
+"""Concurrent update processing with per-user ordering."""
+
+import asyncio
+import logging
+import sys
+import time
+from typing import Any, Awaitable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from admission import WaitStats
+from config import USER_MAX_PENDING, SLOW_UPDATE_SECONDS
+from metrics import UPDATE_WAIT_SECONDS, UPDATES_DROPPED
+import profiling
+import tracing
+
+logger = logging.getLogger(__name__)
+
+
+def update_user_key(update: object) -> Optional[int]:
+    """The id updates are serialized on: the sender, or the chat for anonymous updates."""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user:
+        return update.effective_user.id
+    if update.effective_chat:
+        return update.effective_chat.id
+    return None
+
+
+def update_kind(update: object) -> str:
+    """Short label for logs: the command name, or the kind of update."""
+    if not isinstance(update, Update):
+        return "other"
+    if update.callback_query:
+        return "callback:" + (update.callback_query.data or "").split(":", 1)[0]
+    message = update.effective_message
+    if message is None:
+        return "other"
+    if message.text and message.text.startswith("/"):
+        return message.text.split()[0].split("@")[0]
+    if message.document:
+        return "document"
+    return "message"
+
+
+def update_droppable(update: object) -> bool:
+    """Whether an update may be dropped when its user has too many pending.
+
+    Only commands without arguments, which the user can simply send again;
+    weights, documents, command arguments and button presses carry data and
+    are always kept.
+    """
+    if not isinstance(update, Update) or update.callback_query:
+        return False
+    message = update.effective_message
+    text = message.text if message else None
+    return bool(text) and text.startswith("/") and len(text.split()) == 1
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Process updates from different users concurrently, one user at a time.
+
+    Updates for the same user wait on a per-user lock. asyncio locks wake
+    waiters in FIFO order and PTB starts one task per update in arrival
+    order, so each user's updates are handled in the order they came in,
+    while a slow chart render for one user doesn't hold up anyone else.
+
+    At most ``max_concurrent_updates`` updates run at once; the slot is
+    taken after the user's lock: PTB's own semaphore is acquired before
+    ``do_process_update``, so updates queued behind their user's lock would
+    hold slots while waiting and a few flooding users could stall everyone.
+    It is therefore made unbounded and this class keeps its own.
+
+    Once a user has ``max_pending_per_user`` updates running or waiting,
+    further commands without arguments are dropped, so a user flooding the
+    bot with chart requests can't pile up unbounded work; updates carrying
+    data (see ``update_droppable``) are always kept. The time updates wait
+    for their user's lock and a slot is recorded in ``waits``.
+    """
+
+    def __init__(self, max_concurrent_updates: int, max_pending_per_user: int = USER_MAX_PENDING):
+        if max_concurrent_updates < 1:
+            raise ValueError("`max_concurrent_updates` must be a positive integer!")
+        super().__init__(sys.maxsize)
+        self._slots = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self.max_pending_per_user = max_pending_per_user
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._pending: Dict[int, int] = {}
+        self.waits = WaitStats(histogram=UPDATE_WAIT_SECONDS)
+        self.dropped = 0
+
+    async def do_process_update(self, update: object, coroutine: "Awaitable[Any]") -> None:
+        key = update_user_key(update)
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        remote_parent = tracing.pop_remote_parent(update.update_id)
+        if self._pending.get(key, 0) >= self.max_pending_per_user and update_droppable(update):
+            self.dropped += 1
+            UPDATES_DROPPED.inc()
+            coroutine.close()
+            logger.warning("Dropped an update: %d already pending", self.max_pending_per_user,
+                           extra={"user_id": key, "command": update_kind(update)})
+            return
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._pending[key] = self._pending.get(key, 0) + 1
+        # Root span of the update; continues the ingress trace in cluster mode
+        span = tracing.start_trace("update", parent=remote_parent, user_id=key, command=update_kind(update))
+        queued = time.monotonic()
+        error = None
+        try:
+            async with lock, self._slots:
+                started = time.monotonic()
+                self.waits.record(started - queued)
+                tracing.set_attribute("wait_ms", round((started - queued) * 1000, 1))
+                await coroutine
+            self._log_update(update, key, started - queued, time.monotonic() - started)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            tracing.end_span(span, error)
+            profiling.unit_done()
+            self._pending[key] -= 1
+            # Drop idle locks so the dicts don't grow with every user ever seen
+            if not self._pending[key]:
+                del self._pending[key]
+                del self._locks[key]
+
+    @staticmethod
+    def _log_update(update: object, key: int, wait: float, duration: float) -> None:
+        level = logging.WARNING if duration >= SLOW_UPDATE_SECONDS else logging.DEBUG
+        if logger.isEnabledFor(level):
+            logger.log(level, "Update handled", extra={
+                "user_id": key,
+                "command": update_kind(update),
+                "wait_ms": round(wait * 1000, 1),
+                "duration_ms": round(duration * 1000, 1),
+            })
+
+    def pending(self, key: int) -> int:
+        """Number of updates for ``key`` that are running or waiting."""
+        return self._pending.get(key, 0)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
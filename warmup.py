@@ -0,0 +1,66 @@
+"""Background cache warm-up after a restart.
+
+Right after a deploy every cache is empty and the database pages are cold,
+so the first command of each user used to be the slowest of the day. Once
+the bot is receiving updates, ``warm_up`` reads the users active in the last
+WARMUP_ACTIVE_DAYS days in one ordered scan and fills the profile cache and
+the recent series cache (``series_cache``) with their preferences and recent
+weights, at most WARMUP_USERS_PER_SECOND users per second so that handlers
+keep their share of the database and the GIL. The profiles of everyone else
+follow in one query.
+
+It runs in a worker thread (see ``jobs.startup_job``).
+"""
+
+import datetime as dt
+import logging
+import time
+from typing import Callable, Optional
+
+from config import WARMUP_ACTIVE_DAYS, WARMUP_USERS_PER_SECOND
+from database import get_user_profiles, iter_recent_users
+import profiles
+import series_cache
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up(owns: Optional[Callable[[int], bool]] = None, active_days: int = WARMUP_ACTIVE_DAYS,
+            users_per_second: float = WARMUP_USERS_PER_SECOND, today: Optional[dt.date] = None) -> dict:
+    """Preload recently active users; ``owns`` limits it to some users (cluster workers).
+
+    Returns and logs how many users, rows and profiles were loaded.
+    """
+    today = today or dt.datetime.now().date()
+    since = series_cache.window_start(today)
+    profile_mark = profiles.write_mark()
+    series_mark = series_cache.write_mark()
+    t0 = time.monotonic()
+    users = rows = 0
+
+    for profile_row, series in iter_recent_users(today - dt.timedelta(days=active_days), since):
+        user_id = profile_row[0]
+        if owns is not None and not owns(user_id):
+            continue
+        profiles.preload([profile_row], profile_mark)
+        series_cache.put(user_id, since, series, series_mark)
+        users += 1
+        rows += len(series)
+        if users_per_second > 0:
+            ahead = users / users_per_second - (time.monotonic() - t0)
+            if ahead > 0:
+                time.sleep(ahead)
+
+    others = profiles.preload(
+        (row for row in get_user_profiles() if owns is None or owns(row[0])), profile_mark
+    )
+    result = {
+        "users": users,
+        "rows": rows,
+        "other_profiles": others,
+        "seconds": round(time.monotonic() - t0, 3),
+        "series_cached": series_cache.cached_users(),
+        "profiles_cached": profiles.cached_count(),
+    }
+    logger.info("Cache warm-up finished", extra=result)
+    return result